@@ -0,0 +1 @@
+"""Benchmarks for fabric-to-espanso. Run the modules with `python -m benchmarks.<name>` from the project root."""
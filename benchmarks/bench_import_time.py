@@ -0,0 +1,77 @@
+"""Measure how long importing the query entry points takes.
+
+Usage:
+    python -m benchmarks.bench_import_time [--modules src.search_qdrant.database_query ...] [--repeat 5] [--top 10]
+
+Every import runs in a fresh interpreter with `python -X importtime`, so
+nothing is cached in sys.modules. The median total time of each module is
+reported, with the slowest imports it pulls in (cumulative time).
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_MODULES = [
+    'src.search_qdrant.database_query',
+    'gradio_app_query_only',
+    'streamlit_app_query_only',
+    'src.fabrics_processor.database',
+]
+
+def measure_import(module: str) -> Dict[str, int]:
+    """Import a module in a new interpreter. An empty name imports nothing, which gives the interpreter startup.
+
+    Returns:
+        Cumulative import time in microseconds per imported module
+
+    Raises:
+        RuntimeError: If the module can't be imported
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}' if module else 'pass'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'
+        raise RuntimeError(last_line)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # The same module can't be imported twice, the indentation shows the nesting only
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the query entry points")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of imports per module, the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to show per module")
+    args = parser.parse_args()
+
+    # Modules imported by the interpreter itself, like site, are left out of the slowest imports
+    startup = set(measure_import(''))
+    for module in args.modules:
+        runs: List[Dict[str, int]] = []
+        try:
+            for _ in range(args.repeat):
+                runs.append(measure_import(module))
+        except RuntimeError as e:
+            print(f"{module}: could not be imported ({e})\n")
+            continue
+
+        total = statistics.median(run.get(module, 0) for run in runs) / 1000
+        print(f"{module}: {total:.1f} ms (median of {args.repeat})")
+        slowest: List[Tuple[str, float]] = sorted(
+            ((name, statistics.median(run.get(name, 0) for run in runs) / 1000) for name in runs[0] if name != module and name not in startup),
+            key=lambda item: item[1], reverse=True
+        )[:args.top]
+        for name, cumulative in slowest:
+            print(f"    {name:<50} {cumulative:>9.1f} ms")
+        print()
+
+if __name__ == '__main__':
+    main()
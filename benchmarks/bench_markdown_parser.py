@@ -0,0 +1,89 @@
+"""Benchmark the line based section extractor against the section regex.
+
+Usage:
+    python -m benchmarks.bench_markdown_parser [--sizes 10 100 1000] [--repeat 5]
+
+The sizes are the number of sections in each synthetic document. Besides
+fabric style documents, documents with long heading lines are measured,
+which make the section regex backtrack.
+"""
+import argparse
+import random
+import time
+
+from src.fabrics_processor.config import config
+from src.fabrics_processor.markdown_parser import create_section_pattern, extract_sections
+
+HEADINGS = ['IDENTITY and PURPOSE', 'STEPS', 'OUTPUT INSTRUCTIONS', 'GOAL', 'TASK', 'EXAMPLE', 'INPUT']
+
+def make_document(num_sections: int, lines_per_section: int = 20, seed: int = 0) -> str:
+    """Create a fabric style markdown document with the given number of sections."""
+    rng = random.Random(seed)
+    words = ['analyze', 'purpose', 'text', 'extract', 'the', 'ideas', 'wisdom', 'summary', 'list', 'output']
+    parts = []
+    for _ in range(num_sections):
+        parts.append(f"# {rng.choice(HEADINGS)}\n\n")
+        for _ in range(lines_per_section):
+            if rng.random() < 0.02:
+                parts.append(f"## {rng.choice(words).title()}\n")
+            else:
+                parts.append('- ' + ' '.join(rng.choice(words) for _ in range(12)) + '\n')
+        parts.append('\n')
+    return ''.join(parts)
+
+def make_long_heading_document(num_sections: int, line_length: int = 500) -> str:
+    """Create a document with long heading lines that don't contain a keyword."""
+    parts = ["# PURPOSE\n\nExtract the ideas.\n\n"]
+    for _ in range(num_sections):
+        parts.append('#' + ' ' * line_length + 'steps ' * (line_length // 6) + '\n')
+        parts.append('- ' + 'text ' * 20 + '\n\n')
+    return ''.join(parts)
+
+# Documents where the extractor deliberately differs from the section regex: (document, sections the extractor gives).
+# The regex let the whitespace after '#' run over a newline, so a bare '#' line followed by a line with a
+# keyword started a section. The extractor only accepts headings on one line
+DELIBERATE_DIFFERENCES = [
+    ("#\nPurpose of the text\n\nBody\n", []),
+    ("# IDENTITY\n\nYou are\n#\nGoal to reach\n", ["# IDENTITY\n\nYou are\n"]),
+]
+
+def check_deliberate_differences(keywords: set) -> None:
+    """Check the extractor still differs from the regex where that was decided."""
+    for document, expected in DELIBERATE_DIFFERENCES:
+        if extract_sections(document, keywords) != expected:
+            raise AssertionError(f"Extractor gives unexpected sections for {document!r}")
+        if create_section_pattern(keywords).findall(document) == expected:
+            raise AssertionError(f"Extractor and regex no longer differ for {document!r}, update DELIBERATE_DIFFERENCES")
+
+def best_time(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark markdown section extraction")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Number of sections per document")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    keywords = set(config.base_words)
+    check_deliberate_differences(keywords)
+    documents = [(f"fabric style, {size} sections", make_document(size)) for size in args.sizes]
+    documents += [(f"long headings, {size} sections", make_long_heading_document(size)) for size in args.sizes]
+
+    print(f"{'document':<30} {'size (KB)':>10} {'regex (ms)':>12} {'extractor (ms)':>15} {'speedup':>8}")
+    for name, document in documents:
+        # The regex is compiled for every file in the old parser, so include compiling in its timing
+        old = lambda: create_section_pattern(keywords).findall(document)
+        new = lambda: extract_sections(document, keywords)
+        if old() != new():
+            raise AssertionError(f"Extractor and regex give different sections for {name}")
+        old_time = best_time(old, args.repeat)
+        new_time = best_time(new, args.repeat)
+        print(f"{name:<30} {len(document) / 1024:>10.0f} {old_time * 1000:>12.2f} {new_time * 1000:>15.2f} {old_time / new_time:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""Benchmark every stage of the pipeline on synthetic fabric pattern folders.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sizes 1000 10000 100000] [--embedding random|model]
+                                        [--qdrant-path PATH] [--queries 200] [--trace-memory]
+                                        [--output results.json]
+
+For every size a pattern folder is generated (see benchmarks.synthetic_corpus)
+and these stages are timed against an in-process Qdrant database (the memory or local vector store backend):
+find_markdown_files, parse_markdown_file, detect_file_changes (without and
+with a scan manifest), embedding, upsert, generate_yaml_file,
+generate_markdown_files and query.
+
+The results are written as JSON, so runs can be compared: seconds,
+throughput and, for stages that handle items one by one, latency percentiles
+per stage, and the peak memory of the process. With --trace-memory the peak
+Python memory of every stage is measured as well, which slows the stages down.
+
+The random embedding gives every text a reproducible random unit vector, so
+the other stages can be measured without the cost of the embedding model.
+Use --embedding model to include the model.
+"""
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import hashlib
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from benchmarks.synthetic_corpus import generate_pattern_tree
+from src.fabrics_processor.batch_upserter import BatchUpserter
+from src.fabrics_processor.config import config
+from src.fabrics_processor.database import create_database_connection
+from src.fabrics_processor.embedding import embed_texts
+from src.fabrics_processor.file_change_detector import compare_files, get_stored_files
+from src.fabrics_processor.file_processor import find_markdown_files, process_markdown_files
+from src.fabrics_processor.markdown_parser import parse_markdown_file
+from src.fabrics_processor.output_files_generator import generate_markdown_files, generate_yaml_file
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+COLLECTION_NAME = 'benchmark_patterns'
+QUERIES = [
+    'summarize a scientific paper', 'extract the most important ideas', 'find security threats in logs',
+    'improve the writing of an essay', 'explain code step by step', 'rate the quality of content',
+]
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds."""
+    ordered = sorted(latencies)
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+    return {
+        'p50': at(0.50), 'p90': at(0.90), 'p99': at(0.99),
+        'max': ordered[-1] * 1000, 'mean': statistics.fmean(ordered) * 1000,
+    }
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of the process in MB, None where it can't be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def random_embedding(texts: List[str]) -> List[List[float]]:
+    """Reproducible random unit vectors, seeded by the text."""
+    vectors = []
+    for text in texts:
+        rng = np.random.default_rng(list(hashlib.sha256(text.encode('utf-8')).digest()))
+        vector = rng.standard_normal(config.embedding.vector_size)
+        vectors.append((vector / np.linalg.norm(vector)).tolist())
+    return vectors
+
+def model_embedding(texts: List[str]) -> List[List[float]]:
+    return embed_texts(texts, use_cache=False)
+
+class StageTimer:
+    """Time the stages of one run and collect the results."""
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def run(self, name: str, items: int, function: Callable[[], Any], latencies: Optional[List[float]] = None) -> Any:
+        """Run a stage once and record its time and throughput.
+
+        Args:
+            name: Name of the stage
+            items: Number of items (files, points, queries) the stage handles
+            function: The stage
+            latencies: Filled by the stage with the seconds per item, to report percentiles
+        """
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        stage = {
+            'seconds': seconds,
+            'items': items,
+            'throughput': items / seconds if seconds else None,
+        }
+        if latencies:
+            stage['latency_ms'] = percentiles(latencies)
+        if self.trace_memory:
+            stage['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        self.stages[name] = stage
+        print(f"  {name:<30} {seconds:>9.3f} s {stage['throughput'] or 0:>12.1f} items/s", file=sys.stderr)
+        return result
+
+def create_client(qdrant_path: Optional[str]) -> QdrantClient:
+    """Create an in-process database with an empty benchmark collection."""
+    config.database.backend = 'local' if qdrant_path else 'memory'
+    config.database.local_path = qdrant_path
+    client = create_database_connection()
+    if client.collection_exists(COLLECTION_NAME):
+        client.delete_collection(COLLECTION_NAME)
+    client.create_collection(
+        collection_name=COLLECTION_NAME,
+        vectors_config={client.get_vector_field_name(): VectorParams(size=config.embedding.vector_size, distance=Distance.COSINE)}
+    )
+    return client
+
+def detect_changes(client: QdrantClient, root: Path, manifest_path: Optional[Path]):
+    """The steps of detect_file_changes, with the scan manifest passed explicitly.
+
+    detect_file_changes uses the scan manifest of the configuration, which
+    the benchmark must not fill with its temporary files.
+    """
+    current_files = process_markdown_files(root, manifest_path=manifest_path, workers=config.parse_workers)
+    stored_files = get_stored_files(client, COLLECTION_NAME)
+    return compare_files(current_files, stored_files)
+
+def run_size(size: int, args: argparse.Namespace, workdir: Path) -> Dict[str, Any]:
+    """Run all stages on a generated folder with the given number of patterns."""
+    print(f"{size} patterns:", file=sys.stderr)
+    root = workdir / f"patterns_{size}"
+    generate_pattern_tree(root, size, seed=args.seed)
+    timer = StageTimer(args.trace_memory)
+    embed = model_embedding if args.embedding == 'model' else random_embedding
+    qdrant_path = str(Path(args.qdrant_path) / str(size)) if args.qdrant_path else None
+    client = create_client(qdrant_path)
+    try:
+        files = timer.run('find_markdown_files', size, lambda: find_markdown_files(root))
+
+        parse_latencies: List[float] = []
+        def parse_all() -> None:
+            for file in files:
+                start = time.perf_counter()
+                parse_markdown_file(file)
+                parse_latencies.append(time.perf_counter() - start)
+        timer.run('parse_markdown_file', len(files), parse_all, parse_latencies)
+
+        manifest_path = workdir / f"scan_manifest_{size}.sqlite3"
+        new_files, _, _ = timer.run('detect_file_changes', len(files), lambda: detect_changes(client, root, manifest_path))
+
+        purposes = [file['purpose'] for file in new_files]
+        vectors = timer.run('embedding', len(purposes), lambda: embed(purposes))
+
+        def upsert() -> None:
+            with BatchUpserter(client, COLLECTION_NAME) as upserter:
+                for index, (file, vector) in enumerate(zip(new_files, vectors)):
+                    upserter.add(PointStruct(
+                        id=index,
+                        vector={client.get_vector_field_name(): vector},
+                        payload={
+                            'filename': file['filename'],
+                            'content': file['content'],
+                            'purpose': file['purpose'],
+                            'content_hash': file['content_hash'],
+                            'purpose_hash': file['purpose_hash'],
+                            'date': file['last_modified'].isoformat(),
+                            'filesize': file['filesize'],
+                            'trigger': file['trigger'],
+                        }
+                    ))
+        timer.run('upsert', len(new_files), upsert)
+
+        # With a filled database and scan manifest, like a run where nothing changed
+        timer.run('detect_file_changes_unchanged', len(files), lambda: detect_changes(client, root, manifest_path))
+
+        yaml_folder = workdir / f"yaml_{size}"
+        markdown_folder = workdir / f"markdown_{size}"
+        yaml_folder.mkdir()
+        markdown_folder.mkdir()
+        timer.run('generate_yaml_file', len(new_files), lambda: generate_yaml_file(client, COLLECTION_NAME, str(yaml_folder)))
+        timer.run('generate_markdown_files', len(new_files), lambda: generate_markdown_files(client, COLLECTION_NAME, str(markdown_folder)))
+
+        queries = [QUERIES[index % len(QUERIES)] + f" {index}" for index in range(args.queries)]
+        query_vectors = embed(queries)
+        query_latencies: List[float] = []
+        def query_all() -> None:
+            for vector in query_vectors:
+                start = time.perf_counter()
+                client.query_points(
+                    collection_name=COLLECTION_NAME,
+                    query=vector,
+                    using=client.get_vector_field_name(),
+                    limit=5,
+                    with_payload=True
+                )
+                query_latencies.append(time.perf_counter() - start)
+        timer.run('query', len(queries), query_all, query_latencies)
+    finally:
+        client.close()
+
+    return {'size': size, 'stages': timer.stages, 'peak_rss_mb': peak_rss_mb()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic pattern folders")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Number of patterns per run")
+    parser.add_argument("--embedding", choices=["random", "model"], default="random", help="Random vectors, or the configured embedding model")
+    parser.add_argument("--qdrant-path", type=str, default=None, help="Folder for a local database on disk. If not given, the database is kept in memory")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries in the query stage")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the pattern generator")
+    parser.add_argument("--trace-memory", action="store_true", help="Measure the peak Python memory of every stage")
+    parser.add_argument("--output", type=str, default=None, help="File to write the JSON results to. If not given, prints them")
+    args = parser.parse_args()
+
+    logging.getLogger('fabric_to_espanso').setLevel(logging.WARNING)
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'embedding': args.embedding,
+        'database': 'local path' if args.qdrant_path else 'memory',
+        'runs': [],
+    }
+    with tempfile.TemporaryDirectory(prefix='fabric_benchmark_') as workdir:
+        for size in args.sizes:
+            results['runs'].append(run_size(size, args, Path(workdir)))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
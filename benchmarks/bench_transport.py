@@ -0,0 +1,139 @@
+"""Compare the REST and gRPC transports of the Qdrant client.
+
+Usage:
+    python -m benchmarks.bench_transport [--url http://localhost:6333] [--points 2000] [--scrolls 5]
+                                         [--queries 500] [--threads 8] [--output results.json]
+
+Needs a running Qdrant server that listens for REST and gRPC (see
+QDRANT_GRPC_PORT). The API key is read from the QDRANT_API_KEY environment
+variable. A temporary collection is filled with synthetic patterns and
+removed afterwards.
+
+For each transport two workloads run on one shared client:
+- scroll: full scrolls of the collection with the markdown content, like
+  the change detection and the output files do
+- query: searches with random vectors, one at a time and from several
+  threads at the same time, like the query apps do
+
+The results are written as JSON: seconds, throughput and latency percentiles.
+"""
+from typing import Any, Dict, List
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from benchmarks.bench_pipeline import percentiles, random_embedding
+from benchmarks.synthetic_corpus import make_pattern
+from src.fabrics_processor.batch_upserter import BatchUpserter
+from src.fabrics_processor.config import config
+from src.fabrics_processor.database import create_database_connection, scroll_points
+
+VECTOR_NAME = 'fast-bge-small-en'
+
+def fill_collection(client: Any, collection_name: str, num_points: int) -> None:
+    """Create the benchmark collection with synthetic patterns."""
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config={VECTOR_NAME: VectorParams(size=config.embedding.vector_size, distance=Distance.COSINE)}
+    )
+    rng = random.Random(0)
+    contents = [make_pattern(rng) for _ in range(num_points)]
+    vectors = random_embedding(contents)
+    with BatchUpserter(client, collection_name) as upserter:
+        for index, (content, vector) in enumerate(zip(contents, vectors)):
+            upserter.add(PointStruct(
+                id=index,
+                vector={VECTOR_NAME: vector},
+                payload={'filename': f"pattern_{index}", 'content': content, 'purpose': content, 'trigger': ';;fab'}
+            ))
+
+def run_transport(args: argparse.Namespace, collection_name: str, prefer_grpc: bool, query_vectors: List[List[float]]) -> Dict[str, Any]:
+    """Run the workloads with one transport."""
+    config.database.prefer_grpc = prefer_grpc
+    client = create_database_connection(url=args.url, api_key=os.environ.get("QDRANT_API_KEY"))
+    name = 'grpc' if prefer_grpc else 'rest'
+    print(f"{name}:", file=sys.stderr)
+    results: Dict[str, Any] = {}
+    try:
+        scroll_latencies = []
+        start = time.perf_counter()
+        for _ in range(args.scrolls):
+            scroll_start = time.perf_counter()
+            points = sum(1 for _ in scroll_points(client, collection_name, payload_fields=['filename', 'content', 'purpose']))
+            scroll_latencies.append(time.perf_counter() - scroll_start)
+        seconds = time.perf_counter() - start
+        results['scroll'] = {
+            'seconds': seconds,
+            'points_per_second': points * args.scrolls / seconds,
+            'latency_ms': percentiles(scroll_latencies),
+        }
+
+        def search(vector: List[float]) -> float:
+            search_start = time.perf_counter()
+            client.query_points(collection_name=collection_name, query=vector, using=VECTOR_NAME, limit=5, with_payload=True)
+            return time.perf_counter() - search_start
+
+        for workload, threads in [('query', 1), ('query_concurrent', args.threads)]:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                latencies = list(pool.map(search, query_vectors))
+            seconds = time.perf_counter() - start
+            results[workload] = {
+                'seconds': seconds,
+                'threads': threads,
+                'queries_per_second': len(query_vectors) / seconds,
+                'latency_ms': percentiles(latencies),
+            }
+    finally:
+        client.close()
+
+    for workload, result in results.items():
+        print(f"  {workload:<20} {result['seconds']:>9.3f} s   p50 {result['latency_ms']['p50']:>8.2f} ms", file=sys.stderr)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the REST and gRPC transports on a Qdrant server")
+    parser.add_argument("--url", type=str, default=config.database.url, help="URL of the Qdrant server (REST port)")
+    parser.add_argument("--points", type=int, default=2000, help="Number of points in the benchmark collection")
+    parser.add_argument("--scrolls", type=int, default=5, help="Number of full scrolls per transport")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries per workload")
+    parser.add_argument("--threads", type=int, default=8, help="Threads in the concurrent query workload")
+    parser.add_argument("--output", type=str, default=None, help="File to write the JSON results to. If not given, prints them")
+    args = parser.parse_args()
+
+    config.database.backend = 'remote'
+    collection_name = f"benchmark_transport_{uuid.uuid4().hex[:8]}"
+    client = create_database_connection(url=args.url, api_key=os.environ.get("QDRANT_API_KEY"))
+    try:
+        fill_collection(client, collection_name, args.points)
+        query_vectors = random_embedding([f"query {index}" for index in range(args.queries)])
+        results = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'points': args.points,
+            'pool_size': config.database.pool_size,
+            'transports': {
+                'rest': run_transport(args, collection_name, False, query_vectors),
+                'grpc': run_transport(args, collection_name, True, query_vectors),
+            },
+        }
+    finally:
+        client.delete_collection(collection_name)
+        client.close()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Generate synthetic fabric pattern folders for the benchmarks.
+
+Usage:
+    python -m benchmarks.synthetic_corpus <folder> [--patterns 1000] [--seed 0]
+
+Every pattern is a folder with a system.md that has the sections of real
+fabric patterns (IDENTITY and PURPOSE, STEPS, OUTPUT INSTRUCTIONS, ...) of
+varying length, and some patterns have a user.md like in fabric.
+"""
+from pathlib import Path
+from typing import List
+import argparse
+import random
+
+VERBS = ['analyze', 'extract', 'summarize', 'create', 'improve', 'explain', 'rate', 'find', 'write', 'label', 'compare', 'convert']
+NOUNS = ['wisdom', 'paper', 'prompt', 'claims', 'essay', 'code', 'threat_report', 'presentation', 'logs', 'answers', 'ideas', 'recipe']
+WORDS = [
+    'the', 'input', 'content', 'you', 'extract', 'ideas', 'most', 'important', 'output', 'each', 'bullet',
+    'words', 'section', 'take', 'step', 'back', 'think', 'deeply', 'about', 'how', 'achieve', 'best',
+    'possible', 'results', 'markdown', 'list', 'insights', 'summary', 'author', 'argument', 'quality',
+    'expert', 'purpose', 'goal', 'carefully', 'consider', 'every', 'part', 'write', 'only', 'human',
+]
+# (heading, minimum lines, maximum lines, chance the section is in a pattern)
+SECTIONS = [
+    ('IDENTITY and PURPOSE', 2, 8, 1.0),
+    ('STEPS', 3, 15, 0.9),
+    ('OUTPUT SECTIONS', 2, 10, 0.4),
+    ('OUTPUT INSTRUCTIONS', 3, 12, 0.9),
+    ('EXAMPLE', 3, 20, 0.2),
+]
+
+def _sentence(rng: random.Random, min_words: int = 8, max_words: int = 30) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return ' '.join(words).capitalize() + '.'
+
+def make_pattern(rng: random.Random) -> str:
+    """Create the system.md text of a fabric style pattern."""
+    parts: List[str] = []
+    for heading, min_lines, max_lines, chance in SECTIONS:
+        if rng.random() > chance:
+            continue
+        parts.append(f"# {heading}\n\n")
+        for _ in range(rng.randint(min_lines, max_lines)):
+            # Purpose sections are prose, the others are mostly bullet lists
+            prefix = '' if heading == 'IDENTITY and PURPOSE' else '- '
+            parts.append(prefix + _sentence(rng) + '\n')
+            if heading == 'IDENTITY and PURPOSE':
+                parts.append('\n')
+        parts.append('\n')
+    parts.append("# INPUT\n\nINPUT:\n")
+    return ''.join(parts)
+
+def generate_pattern_tree(root: Path | str, num_patterns: int, seed: int = 0) -> List[Path]:
+    """Write a fabric patterns folder with synthetic patterns.
+
+    Args:
+        root: Folder to create the pattern folders in
+        num_patterns: Number of patterns to create
+        seed: Seed of the random generator, the same seed gives the same patterns
+
+    Returns:
+        Paths of the created system.md files
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    files = []
+    for index in range(num_patterns):
+        folder = root / f"{rng.choice(VERBS)}_{rng.choice(NOUNS)}_{index}"
+        folder.mkdir(parents=True, exist_ok=True)
+        system_file = folder / 'system.md'
+        system_file.write_text(make_pattern(rng), encoding='utf-8')
+        if rng.random() < 0.2:
+            (folder / 'user.md').write_text('CONTENT:\n', encoding='utf-8')
+        files.append(system_file)
+    return files
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic fabric patterns folder")
+    parser.add_argument("folder", type=str, help="Folder to create the patterns in")
+    parser.add_argument("--patterns", type=int, default=1000, help="Number of patterns")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator")
+    args = parser.parse_args()
+    files = generate_pattern_tree(args.folder, args.patterns, args.seed)
+    print(f"Created {len(files)} patterns in {args.folder}")
+
+if __name__ == '__main__':
+    main()
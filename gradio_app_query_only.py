@@ -1,13 +1,11 @@
 import gradio as gr
 import pyperclip
-from src.fabrics_processor.database import initialize_qdrant_database
-from src.search_qdrant.database_query import query_qdrant_database
+from src.search_qdrant.database_query import query_qdrant_database_async, warm_up
 from src.fabrics_processor.logger import setup_logger
 import logging
-import atexit
 from src.fabrics_processor.config import config
-import time
 import os
+import asyncio
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -16,21 +14,23 @@ load_dotenv()
 # Configure logging
 logger = setup_logger()
 
-# Initialize the database client
+# One asynchronous database client, its connection pool is shared by all users
 client = None
-def init_client():
+client_lock = asyncio.Lock()
+async def init_client():
     global client
-    if client is None:
-        client = initialize_qdrant_database(api_key=os.environ.get("QDRANT_API_KEY"))
-        # Register cleanup function
-        atexit.register(lambda: client.close() if hasattr(client, '_transport') else None)
+    async with client_lock:
+        if client is None:
+            # Imported here, so the interface starts without waiting for qdrant_client
+            from src.fabrics_processor.database import create_async_database_connection
+            client = await create_async_database_connection(api_key=os.environ.get("QDRANT_API_KEY"))
     return client
 
-def search_prompts(query):
+async def search_prompts(query):
     """Search for prompts based on the query."""
     try:
-        client = init_client()
-        results = query_qdrant_database(
+        client = await init_client()
+        results = await query_qdrant_database_async(
             query=query,
             client=client,
             num_results=5,
@@ -115,4 +115,6 @@ def create_ui():
 
 if __name__ == "__main__":
     demo = create_ui()
+    # Load the search dependencies while the interface starts
+    warm_up()
     demo.launch(pwa=True)
@@ -1,14 +1,17 @@
 """Main entry point for the Fabric to Espanso conversion process."""
-from typing import Optional
+from pathlib import Path
+from typing import Iterable, Optional, Set
+import argparse
 import sys
 import signal
-import logging
 from contextlib import contextmanager
 
-from src.fabrics_processor.database import initialize_qdrant_database
-from src.fabrics_processor.file_change_detector import detect_file_changes
-from src.fabrics_processor.database_updater import update_qdrant_database
-from src.fabrics_processor.yaml_file_generator import generate_yaml_file
+from src.fabrics_processor.database import get_shared_client, close_shared_client, has_sparse_vector
+from src.fabrics_processor.update_plan import create_update_plan, create_update_plan_for_patterns, apply_update_plan
+from src.fabrics_processor.output_files_generator import generate_output_files
+from src.fabrics_processor.embedding import create_embedding_model, create_sparse_embedding_model
+from src.fabrics_processor.obsidian2fabric import sync_folders
+from src.fabrics_processor.watcher import FolderWatcher
 from src.fabrics_processor.logger import setup_logger
 from src.fabrics_processor.config import config
 from src.fabrics_processor.exceptions import (
@@ -33,42 +36,42 @@ def managed_qdrant_client():
     """Context manager for handling Qdrant client lifecycle."""
     client = None
     try:
-        client = initialize_qdrant_database()
+        client = get_shared_client()
         yield client
     finally:
         if client:
             logger.info("Closing Qdrant client connection...")
-            client.close()
+            close_shared_client()
             logger.info("Qdrant client connection closed")
 
-def process_changes(client) -> bool:
+def process_changes(client, dry_run: bool = False) -> bool:
     """Process file changes and update database and YAML files.
     
     Args:
         client: Initialized Qdrant client
+        dry_run: Only print the update plan, don't change the database or output files
         
     Returns:
         bool: True if processing was successful, False otherwise
     """
     try:
-        # Detect file changes
-        new_files, modified_files, deleted_files = detect_file_changes(client, config.fabric_patterns_folder)
-
-        # Log the results
-        if new_files:
-            logger.info(f"New files: {[file['filename'] for file in new_files]}")
-        if modified_files:
-            logger.info(f"Modified files: {[file['filename'] for file in modified_files]}")
-        if deleted_files:
-            logger.info(f"Deleted files: {deleted_files}")
+        collection_name = config.embedding.collection_name
+
+        # Compare the fabric patterns folder with the database
+        plan = create_update_plan(client, config.fabric_patterns_folder, collection_name)
+        logger.info(plan.summary())
+
+        if dry_run:
+            print(plan.summary())
+            return True
             
         # Update database if there are changes
-        if any([new_files, modified_files, deleted_files]):
+        if not plan.is_empty:
             logger.info("Changes detected. Updating database...")
-            update_qdrant_database(client, new_files, modified_files, deleted_files)
+            apply_update_plan(client, plan)
             
         # Always generate output files to ensure consistency
-        generate_yaml_file(client, config.yaml_output_folder)
+        generate_output_files(client, collection_name)
 
         return True
         
@@ -76,12 +79,93 @@ def process_changes(client) -> bool:
         logger.error(f"Error processing changes: {str(e)}", exc_info=True)
         return False
 
+def get_changed_patterns(changed_paths: Iterable[Path], fabric_patterns_folder: str) -> Set[str]:
+    """Get the names of the pattern directories that contain the changed paths."""
+    root = Path(fabric_patterns_folder)
+    pattern_names = set()
+    for path in changed_paths:
+        try:
+            parts = path.relative_to(root).parts
+        except ValueError:
+            continue
+        # Files directly in the fabric patterns folder are not patterns
+        if len(parts) > 1 or (len(parts) == 1 and not path.is_file()):
+            pattern_names.add(parts[0])
+    return pattern_names
+
+def process_changed_paths(client, changed_paths: Set[Path], embedding_model, sparse_model=None) -> bool:
+    """Update the database and output files for a batch of changed paths.
+    
+    Args:
+        client: Initialized Qdrant client
+        changed_paths: Paths that changed in the watched folders
+        embedding_model: Loaded embedding model
+        sparse_model: Loaded sparse embedding model, None when the collection has no sparse vector
+        
+    Returns:
+        bool: True if processing was successful, False otherwise
+    """
+    try:
+        collection_name = config.embedding.collection_name
+
+        pattern_names = get_changed_patterns(changed_paths, config.fabric_patterns_folder)
+
+        # Copy changed personal prompts from Obsidian to the fabric patterns folder,
+        # and process the pattern directories the sync changed in this batch
+        obsidian_root = Path(config.obsidian_input_folder)
+        if any(obsidian_root in path.parents for path in changed_paths):
+            pattern_names |= sync_folders(source_dir=obsidian_root, target_dir=Path(config.fabric_patterns_folder))
+
+        if not pattern_names:
+            return True
+
+        plan = create_update_plan_for_patterns(client, config.fabric_patterns_folder, pattern_names, collection_name)
+        logger.info(plan.summary())
+        if plan.is_empty:
+            return True
+
+        apply_update_plan(client, plan, embedding_model, sparse_model)
+        generate_output_files(client, collection_name)
+        return True
+
+    except Exception as e:
+        logger.error(f"Error processing changes: {str(e)}", exc_info=True)
+        return False
+
+def watch_changes(client, use_polling: bool = False) -> None:
+    """Keep running and process changes in the watched folders as they happen.
+    
+    Args:
+        client: Initialized Qdrant client
+        use_polling: Poll the folders, even when watchdog is installed
+    """
+    embedding_model = create_embedding_model()
+    # Load the models once, not for every batch of changes
+    sparse_model = None
+    if has_sparse_vector(client, config.embedding.collection_name):
+        sparse_model = create_sparse_embedding_model()
+    folders = [(config.fabric_patterns_folder, 2), (config.obsidian_input_folder, None)]
+    with FolderWatcher(folders, use_polling=use_polling) as watcher:
+        logger.info("Watching for changes. Press Ctrl+C to stop.")
+        for changed_paths in watcher.batches():
+            process_changed_paths(client, changed_paths, embedding_model, sparse_model)
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Convert fabric patterns to espanso and Obsidian TextGenerator files")
+    parser.add_argument("--dry-run", action="store_true", help="Print the planned database changes without applying them")
+    parser.add_argument("--watch", action="store_true", help="Keep running and process changes in the pattern folders as they happen")
+    parser.add_argument("--poll", action="store_true", help="In watch mode, poll the folders instead of using watchdog")
+    return parser.parse_args(argv)
+
 def main() -> Optional[int]:
     """Main application entry point.
     
     Returns:
         Optional[int]: Exit code, None if successful, 1 if error
     """
+    args = parse_args()
+
     # Setup signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -94,12 +178,17 @@ def main() -> Optional[int]:
         logger.info(f"  Database URL: {config.database.url}")
         logger.info(f"  Fabric patterns folder: {config.fabric_patterns_folder}")
         logger.info(f"  YAML output folder: {config.yaml_output_folder}")
-        logger.info(f"  Obsidian textgenerator markdown output folder: {config.markdown_output_folder}")
+        logger.info(f"  Obsidian textgenerator markdown output folder: {config.obsidian_output_folder}")
         logger.info(f"  Obsidian personal prompts input folder: {config.obsidian_input_folder}") 
         
         # Process changes with managed client
         with managed_qdrant_client() as client:
-            if process_changes(client):
+            if args.watch:
+                # Bring everything up to date first, then only process what changes
+                process_changes(client)
+                watch_changes(client, use_polling=args.poll)
+                return None
+            if process_changes(client, dry_run=args.dry_run):
                 logger.info("Fabric to Espanso conversion completed successfully")
                 return None
             else:
@@ -36,6 +36,43 @@ else:
     OBSIDIAN_INPUT_FOLDER="cloud_dummy"
     YAML_OUTPUT_FOLDER="cloud_dummy"
 
+# Local cache of parsed pattern files, so unchanged files are not read again.
+# Set to None to always read and parse all files
+SCAN_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "scan_manifest.sqlite3")
+
+# Local manifest of the hashes of the Obsidian prompts and their copies in the fabric patterns
+# folder, so unchanged prompts are not read again. Set to None to hash all files on every sync
+SYNC_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "sync_manifest.sqlite3")
+# Number of threads copying and deleting prompts when syncing Obsidian to the fabric patterns folder
+SYNC_WORKERS = 8
+
+# Parse pattern files in parallel. None: parse in the main process,
+# n: use n workers of the given executor type ("process" or "thread")
+PARSE_WORKERS = None
+PARSE_EXECUTOR = "process"
+# Number of files handed to a worker at once
+PARSE_CHUNKSIZE = 16
+
+# File and directory names that are skipped when scanning the fabric patterns folder
+# and the Obsidian vault (case-insensitive glob patterns)
+SCAN_IGNORE_PATTERNS = ['.*']
+
+# Split the espanso matches over several files, so a change only rewrites (and makes espanso reload)
+# a small file. None: one fabric_patterns.yml, "prefix": one file per first letter of the
+# pattern name, "source": one file for the fabric patterns and one for the own Obsidian prompts
+YAML_SHARDING = None
+
+# Number of threads writing the markdown files for Obsidian TextGenerator
+OUTPUT_WRITE_WORKERS = 8
+
+# Watch mode (main.py --watch)
+# Seconds between scans of the folders when watchdog is not installed
+WATCH_POLL_INTERVAL = 2.0
+# Seconds without new changes before a batch of changes is processed
+WATCH_DEBOUNCE = 3.0
+# Maximum seconds a batch of changes waits while changes keep coming in
+WATCH_MAX_DELAY = 60.0
+
 # Headings to extract from markdown files
 BASE_WORDS = ['Identity', 'Purpose', 'Task', 'Goal']
 
@@ -48,11 +85,31 @@ BASE_WORDS = ['Identity', 'Purpose', 'Task', 'Goal']
 # Cloud:
 QDRANT_URL = "https://91ed3a93-6135-4951-a624-1c8c2878240d.europe-west3-0.gcp.cloud.qdrant.io:6333"
 COLLECTION_NAME = "fabric_patterns"
+# Where the database is kept: "remote" connects to the Qdrant server at QDRANT_URL, "local" keeps
+# the database in this process and on disk at QDRANT_LOCAL_PATH, "memory" in this process only.
+# A local database can only be opened by one process at a time
+QDRANT_BACKEND = "remote"
+# Use gRPC instead of REST for the remote database, the server listens for gRPC on QDRANT_GRPC_PORT.
+# gRPC sends the payloads as protobuf instead of JSON, which is smaller and faster to decode
+QDRANT_PREFER_GRPC = False
+QDRANT_GRPC_PORT = 6334
+# Maximum number of HTTP connections of a REST client, shared by the threads using the client.
+# A gRPC client sends all requests over one connection
+QDRANT_POOL_SIZE = 10
+QDRANT_LOCAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "qdrant")
 
 # Required fields for database points
 # TODO: default trigger wordt nu twee keer gedefinieerd, oplossen
 DEFAULT_TRIGGER = ";;fab"
 REQUIRED_FIELDS = ['filename', 'content', 'purpose', 'filesize', 'trigger']
+# Number of points fetched per request when reading a whole collection
+SCROLL_PAGE_SIZE = 256
+# Writing points to the database in batches
+# Maximum number of points and approximate maximum payload size in bytes per upsert request
+UPSERT_BATCH_SIZE = 64
+UPSERT_BATCH_BYTES = 8 * 1024 * 1024
+# Number of upsert requests that can be in flight at the same time
+UPSERT_WORKERS = 4
 REQUIRED_FIELDS_DEFAULTS = {
     'trigger': ';;fab',
     'filesize': 0,
@@ -61,4 +118,38 @@ REQUIRED_FIELDS_DEFAULTS = {
 
 # Embedding Model parameters voor Qdrant
 USE_FASTEMBED = True
-EMBED_MODEL = "fast-bge-small-en" 
\ No newline at end of file
+EMBED_MODEL = "fast-bge-small-en"
+# Number of texts that are embedded together in one call to the model
+EMBED_BATCH_SIZE = 64
+# Number of worker processes for embedding. None: embed in the main process,
+# 0: use all available cores, n: use n worker processes
+EMBED_PARALLEL = None
+# Sparse (keyword) embedding model for hybrid search, stored next to the dense vector.
+# Set to None to only use dense vectors
+SPARSE_EMBED_MODEL = "Qdrant/bm25"
+# Local cache of computed embeddings, keyed by model and text. Set to None to disable
+EMBEDDING_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "embeddings.sqlite3")
+# Maximum number of cached embeddings, the least recently used are removed first
+EMBEDDING_CACHE_MAX_ENTRIES = 50000
+
+# Caching of search results and query embeddings in the query apps
+# Maximum number of cached queries (0 disables the cache) and seconds a cached result stays valid
+QUERY_CACHE_MAX_ENTRIES = 256
+QUERY_CACHE_TTL = 300.0
+# Local copy of the collection in the query apps, searched in memory instead of over the network.
+# Also used when the database can't be reached. Set the path to None to disable
+LOCAL_REPLICA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "replica")
+# Seconds between checks of the database for changed points
+LOCAL_REPLICA_SYNC_INTERVAL = 60.0
+# Combine dense and sparse (keyword) search with reciprocal rank fusion, when the collection has
+# sparse vectors. Hybrid searches run on the database, the local replica is then only used when the
+# database can't be reached
+QUERY_HYBRID_SEARCH = True
+# Number of candidates each of the dense and the sparse search give to the fusion
+HYBRID_PREFETCH_LIMIT = 20
+# Local query daemon, keeps the database client and the embedding model loaded for command line
+# and espanso lookups. Only listen on a loopback address, the daemon has no authentication
+QUERY_DAEMON_HOST = "127.0.0.1"
+QUERY_DAEMON_PORT = 8765
+# Seconds a command line lookup waits for the daemon to answer
+QUERY_DAEMON_TIMEOUT = 30.0
@@ -1 +1,7 @@
-from .database import initialize_qdrant_database
\ No newline at end of file
+def __getattr__(name):
+    # Import the database module on first use, so importing a light submodule
+    # (like the configuration) doesn't load the database client
+    if name == 'initialize_qdrant_database':
+        from .database import initialize_qdrant_database
+        return initialize_qdrant_database
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,82 @@
+"""Atomic file writing for fabric-to-espanso.
+
+Output files are written to a temporary file in the same folder, which
+replaces the target in one rename. Programs watching the output, like
+espanso, never see a half written file, and a file whose content didn't
+change is left alone so its watchers aren't triggered.
+"""
+from pathlib import Path
+from typing import IO, Optional
+import logging
+import os
+import tempfile
+
+from .hashing import hash_file
+
+logger = logging.getLogger('fabric_to_espanso')
+
+class AtomicFileWriter:
+    """Context manager that writes a text file atomically, only when its content changed.
+
+    Example:
+        with AtomicFileWriter(path) as writer:
+            writer.write(text)
+        if writer.changed:
+            ...
+    """
+
+    def __init__(self, path: str | Path, encoding: str = 'utf-8', only_if_changed: bool = True):
+        """Prepare writing a file.
+
+        Args:
+            path: File to write
+            encoding: Text encoding of the file
+            only_if_changed: Compare with the existing file and keep it when the content is the same.
+                Turn off when the caller already knows the content changed
+        """
+        self.path = Path(path)
+        self.encoding = encoding
+        self.only_if_changed = only_if_changed
+        # Set when leaving the with block: whether the file was replaced
+        self.changed = False
+        self._file: Optional[IO[str]] = None
+        self._tmp_path: Optional[str] = None
+
+    def __enter__(self) -> 'AtomicFileWriter':
+        fd, self._tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix='.tmp')
+        self._file = os.fdopen(fd, 'w', encoding=self.encoding)
+        return self
+
+    def write(self, text: str) -> None:
+        """Write text to the temporary file."""
+        self._file.write(text)
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            self._file.close()
+            if exc_type is None and (not self.only_if_changed or hash_file(self._tmp_path) != hash_file(self.path)):
+                # mkstemp creates the file readable for the owner only, keep the usual permissions
+                os.chmod(self._tmp_path, self.path.stat().st_mode if self.path.exists() else 0o644)
+                os.replace(self._tmp_path, self.path)
+                self.changed = True
+        finally:
+            if not self.changed and os.path.exists(self._tmp_path):
+                os.unlink(self._tmp_path)
+        if exc_type is None and not self.changed:
+            logger.debug(f"{self.path} is unchanged, not written")
+
+def write_file_atomic(path: str | Path, text: str, encoding: str = 'utf-8', only_if_changed: bool = True) -> bool:
+    """Write a text file atomically, by default only when its content changed.
+
+    Args:
+        path: File to write
+        text: New content of the file
+        encoding: Text encoding of the file
+        only_if_changed: Keep the existing file when the content is the same
+
+    Returns:
+        Whether the file was written
+    """
+    with AtomicFileWriter(path, encoding, only_if_changed) as writer:
+        writer.write(text)
+    return writer.changed
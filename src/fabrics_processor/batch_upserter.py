@@ -0,0 +1,171 @@
+"""Batched writing of points to the Qdrant database for fabric-to-espanso."""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+import json
+import logging
+import threading
+
+import grpc
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.http.models import PointStruct, SparseVector
+
+from .config import config
+from .exceptions import DatabaseError
+from .vector_store import get_vector_store_backend
+
+logger = logging.getLogger('fabric_to_espanso')
+
+def estimate_point_size(point: PointStruct) -> int:
+    """Estimate the size in bytes of a point in an upsert request.
+
+    Args:
+        point: Point to estimate the size of
+
+    Returns:
+        Approximate number of bytes the point adds to the JSON request body
+    """
+    payload_size = len(json.dumps(point.payload or {}, default=str).encode('utf-8'))
+    vectors = point.vector.values() if isinstance(point.vector, dict) else [point.vector]
+    # A float in JSON takes about 20 characters
+    vector_size = sum(len(vector) * 20 for vector in vectors if isinstance(vector, list))
+    # A sparse vector has an index and a value per token
+    vector_size += sum(len(vector.indices) * 30 for vector in vectors if isinstance(vector, SparseVector))
+    return payload_size + vector_size + 64
+
+def is_request_too_large(error: Exception) -> bool:
+    """Check if a request failed because it was too large for the server.
+
+    Args:
+        error: Error raised by the Qdrant client
+
+    Returns:
+        Whether the request can succeed when it is split in smaller requests
+    """
+    if isinstance(error, UnexpectedResponse):
+        # Qdrant answers 400 with this message when a JSON body exceeds its max_request_size_mb
+        return error.status_code == 413 or (
+            error.status_code == 400 and b'larger than allowed' in (error.content or b'')
+        )
+    if isinstance(error, grpc.RpcError):
+        return error.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+    return False
+
+class BatchUpserter:
+    """Collect points and write them to the database in batches.
+
+    Batches are closed when they reach the maximum number of points or the
+    maximum estimated number of bytes, and are sent on a thread pool so
+    collecting the next batch doesn't wait for the previous request. A batch
+    that is too large for the server is split in half and retried, until a
+    single point is left. Other errors, like a server that can't be reached,
+    stop the upserter.
+    Call `barrier` (or leave the context manager) to wait for all batches.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str,
+        max_points: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.max_points = max_points or config.database.upsert_batch_size
+        self.max_bytes = max_bytes or config.database.upsert_batch_bytes
+        if max_workers is None:
+            # An in-process database can't handle writes from several threads
+            max_workers = 1 if get_vector_store_backend().in_process else config.database.upsert_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='upsert'
+        )
+        self._futures: List[Future] = []
+        self._batch: List[PointStruct] = []
+        self._batch_bytes = 0
+        self._lock = threading.Lock()
+        self._failed: List[PointStruct] = []
+        # Set when a batch failed for another reason than its size, the next batches are not sent
+        self._stopped = threading.Event()
+        self.points_written = 0
+
+    def __enter__(self) -> 'BatchUpserter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.barrier()
+        else:
+            # Don't hide the original error, but don't leave requests running either
+            self._executor.shutdown(wait=True)
+
+    def add(self, point: PointStruct) -> None:
+        """Add a point to the current batch, sending the batch when it is full."""
+        point_bytes = estimate_point_size(point)
+        if self._batch and (
+            len(self._batch) >= self.max_points
+            or self._batch_bytes + point_bytes > self.max_bytes
+        ):
+            self.flush()
+        self._batch.append(point)
+        self._batch_bytes += point_bytes
+
+    def flush(self) -> None:
+        """Send the current batch without waiting for the request to finish."""
+        if not self._batch:
+            return
+        batch, self._batch, self._batch_bytes = self._batch, [], 0
+        self._futures.append(self._executor.submit(self._upsert_batch, batch))
+
+    def barrier(self) -> int:
+        """Send the last batch and wait until all batches are written.
+
+        Returns:
+            Number of points written to the database
+
+        Raises:
+            DatabaseError: If a batch could not be written, or points were too large
+                even after splitting their batches
+        """
+        self.flush()
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._futures.clear()
+            self._executor.shutdown(wait=True)
+
+        logger.info(f"Wrote {self.points_written} points to collection {self.collection_name}")
+        if self._failed:
+            filenames = [(point.payload or {}).get('filename', point.id) for point in self._failed]
+            raise DatabaseError(f"Failed to write {len(self._failed)} points to the database: {filenames}")
+        return self.points_written
+
+    def _upsert_batch(self, points: List[PointStruct]) -> None:
+        """Write a batch of points, splitting the batch in half if it is too large."""
+        if self._stopped.is_set():
+            # An earlier batch failed, this one would wait for the same timeout or outage
+            return
+        try:
+            self.client.upsert(collection_name=self.collection_name, points=points)
+            with self._lock:
+                self.points_written += len(points)
+            logger.debug(f"Upserted batch of {len(points)} points")
+        except Exception as e:
+            if not is_request_too_large(e):
+                self._stopped.set()
+                raise DatabaseError(f"Failed to upsert batch of {len(points)} points: {str(e)}") from e
+            if len(points) == 1:
+                logger.error(f"Failed to upsert point {points[0].id}: {str(e)}")
+                with self._lock:
+                    self._failed.extend(points)
+                return
+            middle = len(points) // 2
+            logger.warning(
+                f"Upsert of batch with {len(points)} points was too large, "
+                f"retrying as two batches of {middle} and {len(points) - middle}: {str(e)}"
+            )
+            self._upsert_batch(points[:middle])
+            self._upsert_batch(points[middle:])
@@ -13,13 +13,48 @@ from parameters import (
     DEFAULT_TRIGGER,
     OBSIDIAN_OUTPUT_FOLDER,
     OBSIDIAN_INPUT_FOLDER,
+    SCAN_MANIFEST_PATH,
+    SYNC_MANIFEST_PATH,
+    SYNC_WORKERS,
+    SCAN_IGNORE_PATTERNS,
+    PARSE_WORKERS,
+    PARSE_EXECUTOR,
+    PARSE_CHUNKSIZE,
+    WATCH_POLL_INTERVAL,
+    WATCH_DEBOUNCE,
+    WATCH_MAX_DELAY,
+    OUTPUT_WRITE_WORKERS,
+    YAML_SHARDING,
     BASE_WORDS,
     QDRANT_URL,
+    QDRANT_BACKEND,
+    QDRANT_LOCAL_PATH,
+    QDRANT_PREFER_GRPC,
+    QDRANT_GRPC_PORT,
+    QDRANT_POOL_SIZE,
     USE_FASTEMBED,
     EMBED_MODEL,
+    EMBED_BATCH_SIZE,
+    EMBED_PARALLEL,
+    SPARSE_EMBED_MODEL,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
     COLLECTION_NAME,
     REQUIRED_FIELDS,
-    REQUIRED_FIELDS_DEFAULTS
+    SCROLL_PAGE_SIZE,
+    UPSERT_BATCH_SIZE,
+    UPSERT_BATCH_BYTES,
+    UPSERT_WORKERS,
+    REQUIRED_FIELDS_DEFAULTS,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_TTL,
+    LOCAL_REPLICA_PATH,
+    LOCAL_REPLICA_SYNC_INTERVAL,
+    QUERY_HYBRID_SEARCH,
+    HYBRID_PREFETCH_LIMIT,
+    QUERY_DAEMON_HOST,
+    QUERY_DAEMON_PORT,
+    QUERY_DAEMON_TIMEOUT
 )
 
 logger = logging.getLogger('fabric_to_espanso')
@@ -28,12 +63,21 @@ logger = logging.getLogger('fabric_to_espanso')
 class DatabaseConfig:
     """Database configuration settings."""
     url: str = QDRANT_URL
+    backend: str = QDRANT_BACKEND
+    local_path: Optional[str] = QDRANT_LOCAL_PATH
+    prefer_grpc: bool = QDRANT_PREFER_GRPC
+    grpc_port: int = QDRANT_GRPC_PORT
+    pool_size: int = QDRANT_POOL_SIZE
     max_retries: int = 3
     retry_delay: float = 1.0
     timeout: float = 10.0
     api_key: Optional[str] = None
     required_fields: list = field(default_factory=lambda: REQUIRED_FIELDS)
     required_fields_defaults: dict = field(default_factory=lambda: REQUIRED_FIELDS_DEFAULTS)
+    scroll_page_size: int = SCROLL_PAGE_SIZE
+    upsert_batch_size: int = UPSERT_BATCH_SIZE
+    upsert_batch_bytes: int = UPSERT_BATCH_BYTES
+    upsert_workers: int = UPSERT_WORKERS
 
 
     def validate(self) -> None:
@@ -43,9 +87,17 @@ class DatabaseConfig:
             ConfigurationError: If any configuration values are invalid.
         """
         try:
+            # The url is only used by the remote backend
             result = urlparse(self.url)
-            if not all([result.scheme, result.netloc]):
+            if self.backend == "remote" and not all([result.scheme, result.netloc]):
                 raise ValueError(f"Invalid database URL: {self.url}")
+
+            from .vector_store import vector_store_backends
+            if self.backend not in vector_store_backends:
+                raise ValueError(f"Unknown backend {self.backend}, choose from {', '.join(vector_store_backends)}")
+
+            if self.backend == "local" and not self.local_path:
+                raise ValueError("local_path must be set for the local backend")
             
             if self.max_retries < 0:
                 raise ValueError(f"max_retries must be >= 0, got {self.max_retries}")
@@ -55,6 +107,24 @@ class DatabaseConfig:
             
             if self.timeout <= 0:
                 raise ValueError(f"timeout must be > 0, got {self.timeout}")
+
+            if self.scroll_page_size <= 0:
+                raise ValueError(f"scroll_page_size must be > 0, got {self.scroll_page_size}")
+
+            if self.upsert_batch_size <= 0:
+                raise ValueError(f"upsert_batch_size must be > 0, got {self.upsert_batch_size}")
+
+            if self.upsert_batch_bytes <= 0:
+                raise ValueError(f"upsert_batch_bytes must be > 0, got {self.upsert_batch_bytes}")
+
+            if self.upsert_workers <= 0:
+                raise ValueError(f"upsert_workers must be > 0, got {self.upsert_workers}")
+
+            if not 0 < self.grpc_port < 65536:
+                raise ValueError(f"grpc_port must be between 1 and 65535, got {self.grpc_port}")
+
+            if self.pool_size <= 0:
+                raise ValueError(f"pool_size must be > 0, got {self.pool_size}")
                 
         except ValueError as e:
             from .exceptions import ConfigurationError
@@ -67,6 +137,11 @@ class EmbeddingConfig:
     model_name: str = EMBED_MODEL
     collection_name: str = COLLECTION_NAME
     vector_size: int = 384
+    batch_size: int = EMBED_BATCH_SIZE
+    parallel: Optional[int] = EMBED_PARALLEL
+    sparse_model_name: Optional[str] = SPARSE_EMBED_MODEL
+    cache_path: Optional[str] = EMBEDDING_CACHE_PATH
+    cache_max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES
     
     def validate(self) -> None:
         """Validate the embedding configuration."""
@@ -78,6 +153,57 @@ class EmbeddingConfig:
             from .exceptions import ConfigurationError
             raise ConfigurationError(f"Vector size must be > 0, got {self.vector_size}")
 
+        if self.batch_size <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Embedding batch size must be > 0, got {self.batch_size}")
+
+        if self.parallel is not None and self.parallel < 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Embedding parallel must be None or >= 0, got {self.parallel}")
+
+        if self.cache_max_entries <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Embedding cache max entries must be > 0, got {self.cache_max_entries}")
+
+@dataclass
+class QueryConfig:
+    """Query cache, local replica, hybrid search and query daemon configuration."""
+    cache_max_entries: int = QUERY_CACHE_MAX_ENTRIES
+    cache_ttl: float = QUERY_CACHE_TTL
+    replica_path: Optional[str] = LOCAL_REPLICA_PATH
+    replica_sync_interval: float = LOCAL_REPLICA_SYNC_INTERVAL
+    hybrid_search: bool = QUERY_HYBRID_SEARCH
+    hybrid_prefetch_limit: int = HYBRID_PREFETCH_LIMIT
+    daemon_host: str = QUERY_DAEMON_HOST
+    daemon_port: int = QUERY_DAEMON_PORT
+    daemon_timeout: float = QUERY_DAEMON_TIMEOUT
+
+    def validate(self) -> None:
+        """Validate the query configuration."""
+        if self.cache_max_entries < 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Query cache max entries must be >= 0, got {self.cache_max_entries}")
+
+        if self.cache_ttl <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Query cache TTL must be > 0, got {self.cache_ttl}")
+
+        if self.replica_sync_interval <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Local replica sync interval must be > 0, got {self.replica_sync_interval}")
+
+        if self.hybrid_prefetch_limit <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Hybrid prefetch limit must be > 0, got {self.hybrid_prefetch_limit}")
+
+        if not 0 < self.daemon_port < 65536:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Query daemon port must be between 1 and 65535, got {self.daemon_port}")
+
+        if self.daemon_timeout <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"Query daemon timeout must be > 0, got {self.daemon_timeout}")
+
 class Config:
     """Global configuration singleton."""
     _instance: Optional['Config'] = None
@@ -87,18 +213,32 @@ class Config:
             cls._instance = super().__new__(cls)
             cls._instance.database = DatabaseConfig()
             cls._instance.embedding = EmbeddingConfig()
+            cls._instance.query = QueryConfig()
             cls._instance.espanso_trigger = DEFAULT_TRIGGER
             cls._instance.fabric_patterns_folder = FABRIC_PATTERNS_FOLDER
             cls._instance.yaml_output_folder = YAML_OUTPUT_FOLDER
             cls._instance.obsidian_output_folder = OBSIDIAN_OUTPUT_FOLDER
             cls._instance.obsidian_input_folder = OBSIDIAN_INPUT_FOLDER
             cls._instance.base_words = BASE_WORDS
+            cls._instance.scan_manifest_path = SCAN_MANIFEST_PATH
+            cls._instance.sync_manifest_path = SYNC_MANIFEST_PATH
+            cls._instance.sync_workers = SYNC_WORKERS
+            cls._instance.scan_ignore_patterns = SCAN_IGNORE_PATTERNS
+            cls._instance.parse_workers = PARSE_WORKERS
+            cls._instance.parse_executor = PARSE_EXECUTOR
+            cls._instance.parse_chunksize = PARSE_CHUNKSIZE
+            cls._instance.watch_poll_interval = WATCH_POLL_INTERVAL
+            cls._instance.watch_debounce = WATCH_DEBOUNCE
+            cls._instance.watch_max_delay = WATCH_MAX_DELAY
+            cls._instance.output_write_workers = OUTPUT_WRITE_WORKERS
+            cls._instance.yaml_sharding = YAML_SHARDING
         return cls._instance
     
     def validate(self) -> None:
         """Validate all configuration settings."""
         self.database.validate()
         self.embedding.validate()
+        self.query.validate()
         
         # Validate paths
         if not self.espanso_trigger:
@@ -121,6 +261,35 @@ class Config:
             from .exceptions import ConfigurationError
             raise ConfigurationError("Obsidian input folder path to find the personal prompts stored in Obsidian cannot be empty")
 
+        if self.parse_workers is not None and self.parse_workers <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"parse_workers must be None or > 0, got {self.parse_workers}")
+
+        if self.parse_executor not in ("process", "thread"):
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"parse_executor must be 'process' or 'thread', got {self.parse_executor}")
+
+        if self.parse_chunksize <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"parse_chunksize must be > 0, got {self.parse_chunksize}")
+
+        if self.yaml_sharding not in (None, "prefix", "source"):
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"yaml_sharding must be None, 'prefix' or 'source', got {self.yaml_sharding}")
+
+        if self.sync_workers <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"sync_workers must be > 0, got {self.sync_workers}")
+
+        if self.output_write_workers <= 0:
+            from .exceptions import ConfigurationError
+            raise ConfigurationError(f"output_write_workers must be > 0, got {self.output_write_workers}")
+
+        for name in ['watch_poll_interval', 'watch_debounce', 'watch_max_delay']:
+            if getattr(self, name) <= 0:
+                from .exceptions import ConfigurationError
+                raise ConfigurationError(f"{name} must be > 0, got {getattr(self, name)}")
+
         for path in [self.fabric_patterns_folder, self.yaml_output_folder, self.obsidian_output_folder, self.obsidian_input_folder]:
             if not path == "cloud_dummy" and not Path(path).is_dir():
                 from .exceptions import ConfigurationError
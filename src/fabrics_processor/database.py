@@ -1,22 +1,40 @@
 """Database management for fabric-to-espanso."""
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
+import asyncio
+import atexit
+import functools
 import logging
+import threading
 import time
 
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models, exceptions
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.models import Distance, VectorParams, SparseVectorParams, Modifier, PointStruct, Filter, Record
 
 from .config import config
+from .embedding import get_sparse_vector_name
+from .events import add_collection_change_listener, notify_collection_changed
+from .vector_store import VectorStoreBackend, get_vector_store_backend
 from .exceptions import DatabaseConnectionError, CollectionError, DatabaseInitializationError, ConfigurationError
 
 logger = logging.getLogger('fabric_to_espanso')
 
+def _describe_location(backend: VectorStoreBackend, url: Optional[str]) -> str:
+    if not backend.in_process:
+        return url or config.database.url
+    if backend.name == 'local':
+        return config.database.local_path
+    return ":memory:"
+
 def create_database_connection(url: Optional[str] = None, api_key: Optional[str] = None) -> QdrantClient:
     """Create a database connection.
     
+    The configured vector store backend decides whether the client connects
+    to a Qdrant server, or keeps the data in this process (see vector_store).
+    
     Args:
         url: Optional database URL. If not provided, uses configuration.
+            Only used by the remote backend
         
     Returns:
         QdrantClient: Connected database client
@@ -24,21 +42,18 @@ def create_database_connection(url: Optional[str] = None, api_key: Optional[str]
     Raises:
         DatabaseConnectionError: If connection fails after retries
     """
-    url = url or config.database.url
+    backend = get_vector_store_backend()
+    location = _describe_location(backend, url)
     for attempt in range(config.database.max_retries + 1):
         try:
-            client = QdrantClient(
-                url=url,
-                timeout=config.database.timeout,
-                api_key=api_key
-            )
+            client = backend.create_client(url, api_key)
             # Test connection
             client.get_collections()
             return client
         except Exception as e:
             if attempt == config.database.max_retries:
                 raise DatabaseConnectionError(
-                    f"Failed to connect to database at {url} after "
+                    f"Failed to connect to database at {location} after "
                     f"{config.database.max_retries} attempts: {str(e)}"
                 ) from e
             logger.warning(
@@ -47,6 +62,155 @@ def create_database_connection(url: Optional[str] = None, api_key: Optional[str]
             )
             time.sleep(config.database.retry_delay)
 
+async def create_async_database_connection(url: Optional[str] = None, api_key: Optional[str] = None) -> AsyncQdrantClient:
+    """Create an asynchronous database connection.
+    
+    The client keeps a pool of connections, share one client between all
+    requests of an application instead of creating one per request.
+    
+    Args:
+        url: Optional database URL. If not provided, uses configuration.
+            Only used by the remote backend
+        
+    Returns:
+        AsyncQdrantClient: Connected database client
+        
+    Raises:
+        DatabaseConnectionError: If connection fails after retries
+    """
+    backend = get_vector_store_backend()
+    location = _describe_location(backend, url)
+    for attempt in range(config.database.max_retries + 1):
+        client = backend.create_async_client(url, api_key)
+        try:
+            # Test connection
+            await client.get_collections()
+            return client
+        except Exception as e:
+            await client.close()
+            if attempt == config.database.max_retries:
+                raise DatabaseConnectionError(
+                    f"Failed to connect to database at {location} after "
+                    f"{config.database.max_retries} attempts: {str(e)}"
+                ) from e
+            logger.warning(
+                f"Connection attempt {attempt + 1} failed, retrying in "
+                f"{config.database.retry_delay} seconds..."
+            )
+            await asyncio.sleep(config.database.retry_delay)
+
+class _SerializedClient:
+    """Client wrapper that lets one thread at a time call the wrapped client.
+
+    In-process clients keep the collections in plain Python objects, which
+    break when several threads change or read them at the same time.
+    """
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def serialized(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+        return serialized
+
+# One client per process, shared by the modules and the sessions of the apps
+_shared_client: Optional[QdrantClient] = None
+_shared_client_lock = threading.Lock()
+
+def get_shared_client(api_key: Optional[str] = None) -> QdrantClient:
+    """Return the database client of this process, initializing the database on first use.
+    
+    A remote client can be used by several threads at the same time, they
+    share its connection pool (or gRPC channel). In-process clients are not
+    thread safe, their calls are made one at a time.
+    
+    Args:
+        api_key: API key for the first initialization. If None, uses configuration
+        
+    Returns:
+        QdrantClient: The shared, initialized client
+        
+    Raises:
+        DatabaseInitializationError: If initialization fails
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            client = initialize_qdrant_database(api_key=api_key if api_key is not None else config.database.api_key)
+            _shared_client = _SerializedClient(client) if get_vector_store_backend().in_process else client
+        return _shared_client
+
+def close_shared_client() -> None:
+    """Close the shared client, the next get_shared_client creates a new one."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+
+atexit.register(close_shared_client)
+
+def scroll_points(
+    client: QdrantClient,
+    collection_name: str,
+    payload_fields: Optional[List[str]] = None,
+    with_vectors: bool = False,
+    scroll_filter: Optional[Filter] = None,
+    page_size: Optional[int] = None
+) -> Iterator[Record]:
+    """Lazily iterate over all points in a collection, one page at a time.
+    
+    Args:
+        client: Initialized Qdrant client
+        collection_name: Name of the collection to read
+        payload_fields: Payload fields to fetch. If None, fetches the whole payload
+        with_vectors: Whether to fetch the vectors as well
+        scroll_filter: Optional filter on the points
+        page_size: Number of points per request. If not provided, uses configuration
+        
+    Yields:
+        Record: Points in the collection
+    """
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=page_size or config.database.scroll_page_size,
+            offset=offset,
+            with_payload=payload_fields if payload_fields is not None else True,
+            with_vectors=with_vectors
+        )
+        yield from points
+        if offset is None:  # No more points to fetch
+            break
+
+def has_sparse_vector(client: QdrantClient, collection_name: str, vector_name: Optional[str] = None) -> bool:
+    """Check if a collection has a sparse vector. Collections created before hybrid search don't.
+    
+    Args:
+        client: Initialized Qdrant client
+        collection_name: Name of the collection to check
+        vector_name: Name of the sparse vector. If not provided, uses configuration
+        
+    Returns:
+        bool: Whether the collection has the sparse vector
+    """
+    if vector_name is None:
+        if not config.embedding.sparse_model_name:
+            return False
+        vector_name = get_sparse_vector_name()
+    sparse_vectors = client.get_collection(collection_name).config.params.sparse_vectors or {}
+    return vector_name in sparse_vectors
+
 def initialize_qdrant_database(
     url: str = config.database.url,
     api_key: Optional[str] = "",
@@ -94,10 +258,19 @@ def initialize_qdrant_database(
                     )
                 }
             
+            # Sparse vectors for the keyword part of hybrid search. The IDF modifier
+            # lets the database weigh the terms, which completes BM25
+            sparse_vector_config = None
+            if config.embedding.sparse_model_name:
+                sparse_vector_config = {
+                    get_sparse_vector_name(): SparseVectorParams(modifier=Modifier.IDF)
+                }
+            
             try:
                 client.create_collection(
                     collection_name=collection_name,
                     vectors_config=vector_config,
+                    sparse_vectors_config=sparse_vector_config,
                     on_disk_payload=True
                 )
             except exceptions.UnexpectedResponse as e:
@@ -105,8 +278,9 @@ def initialize_qdrant_database(
                     f"Failed to create collection {collection_name}: {str(e)}"
                 ) from e
             
-            # Create indexes for efficient searching
-            for field_name, field_type in [
+            # Create indexes for efficient searching. An in-process database
+            # searches without payload indexes
+            for field_name, field_type in [] if get_vector_store_backend().in_process else [
                 ("filename", models.PayloadSchemaType.KEYWORD),
                 ("date", models.PayloadSchemaType.DATETIME)
             ]:
@@ -119,6 +293,11 @@ def initialize_qdrant_database(
         
         # Log collection status
         collection_info = client.get_collection(collection_name)
+        if config.embedding.sparse_model_name and not has_sparse_vector(client, collection_name):
+            logger.warning(
+                f"Collection {collection_name} has no sparse vector {get_sparse_vector_name()}, "
+                f"searches only use the dense vector. Recreate the collection to enable hybrid search"
+            )
         logger.info(
             f"Collection {collection_name} ready with "
             f"{collection_info.points_count} points"
@@ -145,35 +324,26 @@ def validate_database_payload(
 
     # First validate existing points in database
     logger.info("Validating existing database points...")
-    offset = None
     
-    while True:
-        scroll_result = client.scroll(
-            collection_name=collection_name,
-            limit=5, # Process in batches of 5
-            offset=offset
-        )
-        
-        points, offset = scroll_result
-        
-        for point in points:
-            try:
-                fixed_payload = validate_point_payload(point.payload, point.id)
-                if fixed_payload != point.payload:
-                    # Update point with fixed payload
-                    point_struct = PointStruct(
-                        id=point.id,
-                        vector=point.vector,
-                        payload=fixed_payload
-                    )
-                    client.upsert(collection_name=collection_name, points=[point_struct])
-                    logger.info(f"Fixed and updated point {point.id} in database")
-            except ConfigurationError as e:
-                logger.error(str(e))
-        
-        if not offset:  # No more points to process
-            break
+    updated = False
+    for point in scroll_points(client, collection_name, with_vectors=True):
+        try:
+            fixed_payload = validate_point_payload(point.payload, point.id)
+            if fixed_payload != point.payload:
+                # Update point with fixed payload
+                point_struct = PointStruct(
+                    id=point.id,
+                    vector=point.vector,
+                    payload=fixed_payload
+                )
+                client.upsert(collection_name=collection_name, points=[point_struct])
+                updated = True
+                logger.info(f"Fixed and updated point {point.id} in database")
+        except ConfigurationError as e:
+            logger.error(str(e))
     
+    if updated:
+        notify_collection_changed(collection_name)
     logger.info("Database validation completed")
 
 def validate_point_payload(payload: dict, point_id: Optional[str] = None) -> dict:
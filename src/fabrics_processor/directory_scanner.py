@@ -0,0 +1,82 @@
+"""Directory scanning for fabric-to-espanso."""
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence
+import logging
+import os
+
+logger = logging.getLogger('fabric_to_espanso')
+
+class ScannedFile(NamedTuple):
+    """A file found by scan_directory, with the stat result of the scan."""
+    path: Path
+    mtime: float
+    size: int
+    stat: os.stat_result
+
+def _is_ignored(name: str, ignore: Sequence[str]) -> bool:
+    """Check a file or directory name against case-insensitive ignore patterns."""
+    name = name.lower()
+    return any(fnmatchcase(name, pattern.lower()) for pattern in ignore)
+
+def is_ignored_path(path: Path | str, root: Path | str, ignore: Sequence[str]) -> bool:
+    """Check if a file or any directory between it and root matches a case-insensitive ignore pattern.
+
+    Args:
+        path: Path of the file
+        root: Watched or scanned folder the path is in
+        ignore: Glob patterns for file and directory names, like scan_directory uses
+
+    Returns:
+        Whether scan_directory would skip the path. False for paths outside root
+    """
+    try:
+        parts = Path(path).relative_to(root).parts
+    except ValueError:
+        return False
+    return any(_is_ignored(part, ignore) for part in parts)
+
+def scan_directory(
+    root_dir: Path | str,
+    max_depth: Optional[int] = None,
+    pattern: str = "*.md",
+    ignore: Sequence[str] = ()
+) -> List[ScannedFile]:
+    """Find files matching a pattern, without descending below max_depth.
+
+    Uses os.scandir, so the stat result of each file comes from the
+    directory listing where the platform provides it, and directories
+    deeper than max_depth or matching an ignore pattern are never listed.
+
+    Args:
+        root_dir: Root directory to search in
+        max_depth: Maximum depth of the files, files directly in root_dir have depth 1.
+            If None, searches the whole tree
+        pattern: Glob pattern for the file names to find
+        ignore: Glob patterns for file and directory names to skip, e.g. '.*' for hidden entries
+
+    Returns:
+        List of scanned files, sorted by path
+    """
+    files: List[ScannedFile] = []
+    # Directories to scan, with the depth of the files in them
+    stack = [(str(root_dir), 1)]
+    while stack:
+        directory, depth = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if ignore and _is_ignored(entry.name, ignore):
+                        continue
+                    if entry.is_dir():
+                        if max_depth is None or depth < max_depth:
+                            stack.append((entry.path, depth + 1))
+                    elif fnmatchcase(entry.name, pattern) and entry.is_file():
+                        stat_result = entry.stat()
+                        files.append(ScannedFile(
+                            Path(entry.path), stat_result.st_mtime, stat_result.st_size, stat_result
+                        ))
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {str(e)}")
+    files.sort(key=lambda file: file.path)
+    return files
@@ -0,0 +1,178 @@
+"""Embedding generation for fabric-to-espanso.
+
+FastEmbed is imported when a model is created, importing this module
+doesn't load the models' runtime.
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, TYPE_CHECKING
+import logging
+import time
+
+from .config import config
+from .embedding_cache import EmbeddingCache
+
+if TYPE_CHECKING:
+    from fastembed import TextEmbedding, SparseTextEmbedding
+    from qdrant_client.http.models import SparseVector
+
+logger = logging.getLogger('fabric_to_espanso')
+
+# Model FastEmbed uses by default
+DEFAULT_FASTEMBED_MODEL = "BAAI/bge-small-en-v1.5"
+
+def get_embedding_model_name() -> str:
+    """Return the name of the configured embedding model."""
+    if config.embedding.use_fastembed:
+        return DEFAULT_FASTEMBED_MODEL
+    return config.embedding.model_name
+
+def create_embedding_model() -> TextEmbedding:
+    """Initialize the embedding model from the configuration.
+
+    Returns:
+        TextEmbedding: Loaded embedding model
+    """
+    from fastembed import TextEmbedding
+    if config.embedding.use_fastembed:
+        # TODO: I think it is possible to choose another model here. Make that an option
+        logger.info("Initializing FastEmbed model.")
+        return TextEmbedding(model_name=DEFAULT_FASTEMBED_MODEL)
+    logger.info(f"Initializing embedding model: {config.embedding.model_name}")
+    # TODO: testen. Weet niet of dit werkt.
+    return TextEmbedding(model_name=config.embedding.model_name)
+
+def embed_texts(
+    texts: Sequence[str],
+    embedding_model: Optional[TextEmbedding] = None,
+    batch_size: Optional[int] = None,
+    parallel: Optional[int] = None,
+    use_cache: bool = True
+) -> List[list]:
+    """Generate embedding vectors for a list of texts in batches.
+
+    Vectors found in the embedding cache are reused, only the other texts
+    are sent to the model.
+
+    Args:
+        texts: Texts to generate embeddings for
+        embedding_model: Loaded embedding model. If None, it is only loaded when
+            some texts are not in the cache
+        batch_size: Number of texts per model call. If None, uses configuration
+        parallel: Number of worker processes. None embeds in the main process,
+            0 uses all available cores. If None, uses configuration
+        use_cache: Whether to use the embedding cache, if one is configured
+
+    Returns:
+        List of embedding vectors, in the same order as the input texts
+    """
+    if not texts:
+        return []
+
+    cache = None
+    if use_cache and config.embedding.cache_path:
+        cache = EmbeddingCache(config.embedding.cache_path, config.embedding.cache_max_entries)
+    model_name = get_embedding_model_name()
+
+    try:
+        vectors = cache.get_many(model_name, texts) if cache else [None] * len(texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if cache:
+            logger.info(f"Found {len(texts) - len(missing)} of {len(texts)} embeddings in the cache")
+        if not missing:
+            return vectors
+
+        batch_size = batch_size or config.embedding.batch_size
+        parallel = parallel if parallel is not None else config.embedding.parallel
+        embedding_model = embedding_model or create_embedding_model()
+        missing_texts = [texts[index] for index in missing]
+
+        start = time.perf_counter()
+        # FastEmbed keeps the input order, also when the work is spread over worker processes
+        embeddings = [
+            embedding.tolist()
+            for embedding in embedding_model.embed(missing_texts, batch_size=batch_size, parallel=parallel)
+        ]
+        elapsed = time.perf_counter() - start
+
+        logger.info(
+            f"Embedded {len(embeddings)} texts in {elapsed:.2f} seconds "
+            f"({len(embeddings) / elapsed if elapsed else float('inf'):.1f} texts/sec, "
+            f"batch size {batch_size}, parallel {parallel})"
+        )
+
+        for index, embedding in zip(missing, embeddings):
+            vectors[index] = embedding
+        if cache:
+            cache.put_many(model_name, missing_texts, embeddings)
+        return vectors
+    finally:
+        if cache:
+            cache.close()
+
+def get_sparse_vector_name(model_name: Optional[str] = None) -> str:
+    """Return the name of the sparse vector in the collection, named like the fastembed integration of Qdrant does.
+
+    Args:
+        model_name: Sparse embedding model. If None, uses configuration
+    """
+    model_name = model_name or config.embedding.sparse_model_name
+    return f"fast-sparse-{model_name.split('/')[-1].lower()}"
+
+def create_sparse_embedding_model() -> SparseTextEmbedding:
+    """Initialize the sparse embedding model from the configuration.
+
+    Returns:
+        SparseTextEmbedding: Loaded sparse embedding model
+    """
+    from fastembed import SparseTextEmbedding
+    logger.info(f"Initializing sparse embedding model: {config.embedding.sparse_model_name}")
+    return SparseTextEmbedding(model_name=config.embedding.sparse_model_name)
+
+def sparse_document(filename: str, content: str) -> str:
+    """Text the sparse vector of a pattern is computed from.
+
+    The filename is added as is and with spaces, so both "extract_wisdom"
+    and "extract wisdom" match it.
+    """
+    return f"{filename} {filename.replace('_', ' ')}\n{content}"
+
+def embed_sparse_texts(
+    texts: Sequence[str],
+    sparse_model: Optional[SparseTextEmbedding] = None,
+    batch_size: Optional[int] = None
+) -> List[SparseVector]:
+    """Generate sparse (keyword) vectors for a list of texts in batches.
+
+    Args:
+        texts: Texts to generate sparse vectors for
+        sparse_model: Loaded sparse embedding model. If None, it is loaded from the configuration
+        batch_size: Number of texts per model call. If None, uses configuration
+
+    Returns:
+        List of sparse vectors, in the same order as the input texts
+    """
+    if not texts:
+        return []
+    from qdrant_client.http.models import SparseVector
+    sparse_model = sparse_model or create_sparse_embedding_model()
+    start = time.perf_counter()
+    vectors = [
+        SparseVector(indices=embedding.indices.tolist(), values=embedding.values.tolist())
+        for embedding in sparse_model.embed(list(texts), batch_size=batch_size or config.embedding.batch_size)
+    ]
+    logger.info(f"Computed {len(vectors)} sparse vectors in {time.perf_counter() - start:.2f} seconds")
+    return vectors
+
+def get_embedding(text: str, embedding_model: TextEmbedding) -> list:
+    """
+    Generate embedding vector for the given text using FastEmbed.
+
+    Args:
+        text (str): Text to generate embedding for
+
+    Returns:
+        list: Embedding vector
+    """
+    embeddings = list(embedding_model.embed([text]))
+    return embeddings[0].tolist()
@@ -0,0 +1,97 @@
+"""Persistent embedding cache for fabric-to-espanso.
+
+Embeddings are stored in a SQLite file keyed by model name and the hash of
+the normalized text, so re-adding, restoring or moving a pattern, or
+rebuilding a collection, reuses the vectors that were computed before.
+"""
+from array import array
+from pathlib import Path
+from typing import List, Optional, Sequence
+import logging
+import sqlite3
+import time
+
+from .hashing import hash_text
+
+logger = logging.getLogger('fabric_to_espanso')
+
+def normalize_text(text: str) -> str:
+    """Normalize whitespace, which doesn't change the tokens the model sees."""
+    return ' '.join(text.split())
+
+class EmbeddingCache:
+    """SQLite backed cache of embedding vectors with least recently used eviction."""
+
+    def __init__(self, cache_path: str | Path, max_entries: int):
+        """Open or create the cache.
+
+        Args:
+            cache_path: Location of the SQLite database
+            max_entries: Maximum number of vectors kept, the least recently used are evicted
+        """
+        path = Path(cache_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._connection = sqlite3.connect(str(path))
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+    def __enter__(self) -> 'EmbeddingCache':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[list]]:
+        """Look up the vectors of texts.
+
+        Returns:
+            Vector per text, None for texts that are not in the cache
+        """
+        now = time.time()
+        vectors: List[Optional[list]] = []
+        for text in texts:
+            text_hash = hash_text(normalize_text(text))
+            row = self._connection.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?", (model_name, text_hash)
+            ).fetchone()
+            if row is None:
+                vectors.append(None)
+                continue
+            self._connection.execute(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?", (now, model_name, text_hash)
+            )
+            vectors.append(array('f', row[0]).tolist())
+        return vectors
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[list]) -> None:
+        """Store the vectors of texts, evicting the least recently used vectors when full."""
+        now = time.time()
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+            [
+                (model_name, hash_text(normalize_text(text)), array('f', vector).tobytes(), now)
+                for text, vector in zip(texts, vectors)
+            ]
+        )
+        count = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            logger.debug(f"Evicted {count - self.max_entries} vectors from the embedding cache")
+
+    def close(self) -> None:
+        """Write the changes to disk and close the cache."""
+        self._connection.commit()
+        self._connection.close()
@@ -0,0 +1,33 @@
+"""Collection change notifications for fabric-to-espanso.
+
+Kept free of database and model imports, so the query apps can register
+their cache invalidation without loading the database client.
+"""
+from typing import Callable, List
+import logging
+
+logger = logging.getLogger('fabric_to_espanso')
+
+# Functions called with the collection name after the points in a collection changed
+_collection_change_listeners: List[Callable[[str], None]] = []
+
+def add_collection_change_listener(listener: Callable[[str], None]) -> None:
+    """Register a function to call when the points in a collection change.
+    
+    Args:
+        listener: Function that is called with the name of the changed collection
+    """
+    if listener not in _collection_change_listeners:
+        _collection_change_listeners.append(listener)
+
+def notify_collection_changed(collection_name: str) -> None:
+    """Tell the registered listeners that the points in a collection changed.
+    
+    Args:
+        collection_name: Name of the changed collection
+    """
+    for listener in _collection_change_listeners:
+        try:
+            listener(collection_name)
+        except Exception as e:
+            logger.error(f"Collection change listener failed: {str(e)}", exc_info=True)
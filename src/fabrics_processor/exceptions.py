@@ -34,4 +34,8 @@ class ParsingError(FabricToEspansoError):
 
 class ProcessingError(FabricToEspansoError):
     """Raised when there's an error processing the input files."""
+    pass
+
+class QueryDaemonError(FabricToEspansoError):
+    """Raised when the local query daemon can't be reached or fails to answer."""
     pass
\ No newline at end of file
@@ -1,24 +1,32 @@
 """File change detection for fabric-to-espanso."""
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 from datetime import datetime
 import logging
 
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue
 from qdrant_client.http.exceptions import UnexpectedResponse
 
 from .file_processor import process_markdown_files
+from .database import scroll_points
 from .config import config
 from .exceptions import DatabaseError
 
 logger = logging.getLogger('fabric_to_espanso')
 
-def get_stored_files(client: QdrantClient, collection_name: str = config.embedding.collection_name) -> Dict[str, Dict[str, Any]]:
+# Payload fields needed to detect changes
+CHANGE_DETECTION_FIELDS = ['filename', 'filesize', 'content_hash', 'purpose_hash']
+
+def get_stored_files(
+    client: QdrantClient,
+    collection_name: str = config.embedding.collection_name,
+    payload_fields: Optional[List[str]] = CHANGE_DETECTION_FIELDS
+) -> Dict[str, Dict[str, Any]]:
     """Get all files stored in the database.
     
     Args:
         client: Initialized Qdrant client
         collection_name: Name of the collection to query
+        payload_fields: Payload fields to fetch. If None, fetches the whole payload
         
     Returns:
         Dict mapping filenames to their database records
@@ -27,17 +35,13 @@ def get_stored_files(client: QdrantClient, collection_name: str = config.embeddi
         DatabaseError: If query fails
     """
     try:
-        stored_files = client.scroll(
-            collection_name=collection_name,
-            limit=10000  # Adjust based on expected file count
-        )[0]
         return {
             file.payload['filename']: {
                 'payload': file.payload,
                 'id': file.id,
                 'vector': file.vector
             }
-            for file in stored_files
+            for file in scroll_points(client, collection_name, payload_fields=payload_fields)
         }
     except UnexpectedResponse as e:
         raise DatabaseError(f"Failed to query stored files: {str(e)}") from e
@@ -59,6 +63,47 @@ def compare_file_dates(
     stored_date = datetime.strptime(stored_date_str, '%Y-%m-%dT%H:%M:%S.%f')
     return current_date > stored_date
 
+def compare_files(
+    current_files: List[Dict[str, Any]],
+    stored_files: Dict[str, Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[str]]:
+    """Compare the current files with the files stored in the database.
+    
+    Args:
+        current_files: Processed files from the fabric patterns folder
+        stored_files: Dict mapping filenames to their database records
+        
+    Returns:
+        Tuple containing:
+            - List of new files
+            - List of modified files
+            - List of deleted files
+    """
+    new_files: List[Dict[str, Any]] = []
+    modified_files: List[Dict[str, Any]] = []
+    
+    # Check for new and modified files
+    for file in current_files:
+        filename = file['filename']
+        if filename not in stored_files:
+            logger.debug(f"New file detected: {filename}")
+            new_files.append(file)
+        # compare on content hash, not on modified date, because fabric -U will change the modified date of the file
+        # even if the content hasn't changed. Points stored before the hash was added count as modified,
+        # so they get their hash when the update is applied
+        elif file['content_hash'] != stored_files[filename]['payload'].get('content_hash'):
+            logger.debug(f"Modified file detected: {filename}")
+            modified_files.append(file)
+    
+    # Check for deleted files
+    current_filenames = {file['filename'] for file in current_files}
+    deleted_files = [
+        filename for filename in stored_files
+        if filename not in current_filenames
+    ]
+    
+    return new_files, modified_files, deleted_files
+
 def detect_file_changes(
     client: QdrantClient,
     fabric_patterns_folder: str
@@ -88,29 +133,7 @@ def detect_file_changes(
         stored_files = get_stored_files(client)
         logger.debug(f"Found {len(stored_files)} files in database")
         
-        # Initialize change lists
-        new_files: List[Dict[str, Any]] = []
-        modified_files: List[Dict[str, Any]] = []
-        deleted_files: List[str] = []
-        
-        # Check for new and modified files
-        for file in current_files:
-            filename = file['filename']
-            if filename not in stored_files:
-                logger.debug(f"New file detected: {filename}")
-                new_files.append(file)
-            # compare on file size, not on modified date, because fabric -U will change the modified date of the file
-            # even if the content hasn't changed
-            elif file['filesize'] != stored_files[filename]['payload']['filesize']:
-                logger.debug(f"Modified file detected: {filename}")
-                modified_files.append(file)
-        
-        # Check for deleted files
-        current_filenames = {file['filename'] for file in current_files}
-        deleted_files = [
-            filename for filename in stored_files
-            if filename not in current_filenames
-        ]
+        new_files, modified_files, deleted_files = compare_files(current_files, stored_files)
         
         if deleted_files:
             logger.debug(f"Deleted files detected: {deleted_files}")
@@ -1,20 +1,29 @@
 """File processing module for fabric-to-espanso."""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import logging
+import os
 
 from .markdown_parser import parse_markdown_file
+from .hashing import hash_text
+from .scan_manifest import ScanManifest
+from .directory_scanner import ScannedFile, scan_directory
+from .config import config
 from .exceptions import ProcessingError
 
 logger = logging.getLogger('fabric_to_espanso')
 
-def find_markdown_files(
+# Files in the fabric patterns folder that are not patterns
+NON_PATTERN_FILES = ['readme.md', 'user.md']
+
+def scan_markdown_files(
     root_dir: Path,
     max_depth: int = 2,
     pattern: str = "*.md"
-) -> List[Path]:
-    """Find markdown files in directory up to specified depth.
+) -> List[ScannedFile]:
+    """Find markdown files in directory up to specified depth, with their stat results.
     
     Args:
         root_dir: Root directory to search in
@@ -22,7 +31,7 @@ def find_markdown_files(
         pattern: Glob pattern for files to find
         
     Returns:
-        List of paths to markdown files
+        List of scanned markdown files, sorted by path
         
     Raises:
         ValueError: If root_dir doesn't exist or isn't a directory
@@ -31,26 +40,14 @@ def find_markdown_files(
         raise ValueError(f"Directory does not exist: {root_dir}")
     if not root_dir.is_dir():
         raise ValueError(f"Path is not a directory: {root_dir}")
-        
-    files: List[Path] = []
     
     try:
-        # Convert depth to parts for comparison
-        root_parts = len(root_dir.parts)
-        
-        # Use rglob to find all markdown files
-        for file_path in root_dir.rglob(pattern):
-            # Skip if too deep
-            if len(file_path.parts) - root_parts > max_depth:
-                continue
-            # Skip README.md files
-            if file_path.name.lower() == "readme.md":
-                continue
-            if file_path.name.lower() == "user.md":
-                continue
-            if file_path.is_file():
-                files.append(file_path)
-                
+        files = scan_directory(
+            root_dir,
+            max_depth=max_depth,
+            pattern=pattern,
+            ignore=NON_PATTERN_FILES + list(config.scan_ignore_patterns)
+        )
         logger.debug(f"Found {len(files)} markdown files in {root_dir}")
         return files
         
@@ -58,15 +55,37 @@ def find_markdown_files(
         logger.error(f"Error finding markdown files: {str(e)}", exc_info=True)
         raise ProcessingError(f"Failed to find markdown files: {str(e)}") from e
 
+def find_markdown_files(
+    root_dir: Path,
+    max_depth: int = 2,
+    pattern: str = "*.md"
+) -> List[Path]:
+    """Find markdown files in directory up to specified depth.
+    
+    Args:
+        root_dir: Root directory to search in
+        max_depth: Maximum directory depth to search
+        pattern: Glob pattern for files to find
+        
+    Returns:
+        List of paths to markdown files
+        
+    Raises:
+        ValueError: If root_dir doesn't exist or isn't a directory
+    """
+    return [file.path for file in scan_markdown_files(root_dir, max_depth, pattern)]
+
 def process_markdown_file(
     file_path: Path,
-    trigger_prefix: str
+    trigger_prefix: str,
+    stat_result: Optional[os.stat_result] = None
 ) -> Optional[Dict[str, Any]]:
     """Process a single markdown file.
     
     Args:
         file_path: Path to markdown file
         trigger_prefix: Prefix for espanso triggers
+        stat_result: Result of stat() on the file, if already known
         
     Returns:
         Dictionary with file information or None if processing fails
@@ -79,13 +98,16 @@ def process_markdown_file(
         if extracted_sections is None:
             logger.warning(f"No sections extracted from {file_path}")
             extracted_sections = content
+        stat_result = stat_result or file_path.stat()
             
         return {
             'filename': file_path.parent.name,
             'content': content,
             'purpose': extracted_sections,
-            'last_modified': datetime.fromtimestamp(file_path.stat().st_mtime),
-            'filesize': file_path.stat().st_size,
+            'content_hash': hash_text(content),
+            'purpose_hash': hash_text(extracted_sections),
+            'last_modified': datetime.fromtimestamp(stat_result.st_mtime),
+            'filesize': stat_result.st_size,
             'trigger': trigger_prefix,
             'label': file_path.stem  # filename without extension
         }
@@ -94,18 +116,63 @@ def process_markdown_file(
         logger.error(f"Error processing {file_path}: {str(e)}", exc_info=True)
         raise ProcessingError(f"Failed to process {file_path}: {str(e)}") from e
 
+def _process_markdown_file_safe(
+    args: Tuple[Path, str, os.stat_result]
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Process a single markdown file in a worker, returning errors instead of raising them."""
+    try:
+        return process_markdown_file(*args), None
+    except ProcessingError as e:
+        return None, str(e)
+
+def process_markdown_file_batch(
+    jobs: List[Tuple[Path, str, os.stat_result]],
+    workers: Optional[int] = None,
+    executor: str = "process",
+    chunksize: int = 16
+) -> List[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """Process markdown files, optionally spread over a pool of workers.
+    
+    Args:
+        jobs: (file_path, trigger_prefix, stat_result) per file
+        workers: Number of workers. If None, files are processed in the main process
+        executor: "process" or "thread" pool
+        chunksize: Number of files handed to a process worker at once
+        
+    Returns:
+        (result, error) per file, in the same order as the jobs
+    """
+    if not workers or len(jobs) <= 1:
+        return [_process_markdown_file_safe(job) for job in jobs]
+    if executor == "thread":
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_process_markdown_file_safe, jobs))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_process_markdown_file_safe, jobs, chunksize=chunksize))
+
 def process_markdown_files(
     markdown_folder: Path | str,
     # TODO: make 'max_depth' a parameter
     max_depth: int = 2,
-    trigger_prefix: str = ";;fab"
+    trigger_prefix: str = ";;fab",
+    manifest_path: Optional[Path | str] = config.scan_manifest_path,
+    workers: Optional[int] = config.parse_workers,
+    executor: str = config.parse_executor,
+    chunksize: int = config.parse_chunksize
 ) -> List[Dict[str, Any]]:
     """Process all markdown files in directory.
     
+    Files that are unchanged since the previous run, according to the scan
+    manifest, are not read again.
+    
     Args:
         markdown_folder: Directory containing markdown files
         max_depth: Maximum directory depth to search
         trigger_prefix: Prefix for espanso triggers
+        manifest_path: Location of the scan manifest. If None, all files are processed
+        workers: Number of parallel workers for parsing. If None, parses in the main process
+        executor: "process" or "thread" pool for parallel parsing
+        chunksize: Number of files handed to a process worker at once
         
     Returns:
         List of processed file information
@@ -118,18 +185,42 @@ def process_markdown_files(
     processed_files: List[Dict[str, Any]] = []
     
     try:
-        # Find all markdown files
-        markdown_files = find_markdown_files(root_dir, max_depth)
+        # Find all markdown files, sorted so the output order doesn't depend on the file system
+        markdown_files = scan_markdown_files(root_dir, max_depth)
         
-        # Process each file
-        for file_path in markdown_files:
-            try:
-                if result := process_markdown_file(file_path, trigger_prefix):
-                    processed_files.append(result)
+        manifest = ScanManifest(manifest_path, parser_key=repr(sorted(config.base_words))) if manifest_path else None
+        try:
+            # Use the stored results of unchanged files, collect the others for processing
+            results: List[Optional[Dict[str, Any]]] = []
+            jobs: List[Tuple[Path, str, os.stat_result]] = []
+            job_indices: List[int] = []
+            for file_path, _, _, stat_result in markdown_files:
+                if manifest and (result := manifest.get(str(file_path), stat_result)):
+                    result['trigger'] = trigger_prefix
+                    logger.debug(f"Unchanged: {file_path.parent.name}")
+                    results.append(result)
+                else:
+                    job_indices.append(len(results))
+                    jobs.append((file_path, trigger_prefix, stat_result))
+                    results.append(None)
+            
+            # Process the new and changed files
+            processed = process_markdown_file_batch(jobs, workers, executor, chunksize)
+            for index, (file_path, _, stat_result), (result, error) in zip(job_indices, jobs, processed):
+                if error:
+                    logger.error(error)
+                    continue
+                if result:
+                    results[index] = result
+                    if manifest:
+                        manifest.put(str(file_path), stat_result, result)
                     logger.info(f"Processed: {file_path.parent.name}")
-            except ProcessingError as e:
-                logger.error(str(e))
-                continue
+            processed_files.extend(result for result in results if result)
+            if manifest:
+                manifest.prune((str(file.path) for file in markdown_files), root_dir=str(root_dir))
+        finally:
+            if manifest:
+                manifest.close()
                 
         logger.info(f"Successfully processed {len(processed_files)} files in fabric patterns folder")
         return processed_files
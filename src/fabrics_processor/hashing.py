@@ -0,0 +1,34 @@
+"""Content hashing for fabric-to-espanso."""
+from pathlib import Path
+from typing import Optional
+import hashlib
+
+def hash_text(text: str) -> str:
+    """Return a fast, stable hash of a text.
+    
+    Args:
+        text: Text to hash
+        
+    Returns:
+        Hex digest of the UTF-8 encoded text
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def hash_file(path: str | Path, chunk_size: int = 1024 * 1024) -> Optional[str]:
+    """Return the hash of a file's bytes, read in chunks.
+    
+    Args:
+        path: File to hash
+        chunk_size: Number of bytes read at a time
+        
+    Returns:
+        Hex digest of the file, or None if the file doesn't exist
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
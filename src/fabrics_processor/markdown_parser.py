@@ -1,5 +1,6 @@
 """Markdown parsing module for fabric-to-espanso."""
-from typing import Tuple, List, Optional, Set
+from functools import lru_cache
+from typing import Tuple, List, Optional, Set, FrozenSet
 from pathlib import Path
 import regex
 import logging
@@ -16,6 +17,62 @@ def create_section_pattern(keywords: Set[str]) -> regex.Pattern:
         regex.MULTILINE | regex.IGNORECASE
     )
 
+@lru_cache(maxsize=32)
+def get_heading_pattern(keywords: FrozenSet[str]) -> regex.Pattern:
+    """Return the compiled pattern for a level 1 heading containing one of the keywords.
+    
+    The pattern is compiled once per set of keywords and matched against single lines.
+    The possessive whitespace quantifier keeps long heading lines from backtracking.
+    """
+    keyword_pattern = '|'.join(regex.escape(kw) for kw in sorted(keywords))
+    return regex.compile(rf'#\s++.*(?:{keyword_pattern})', regex.IGNORECASE)
+
+def _next_hash_line(content: str, start: int) -> int:
+    """Return the position of the next line starting with '#' after start, or -1."""
+    position = content.find('\n#', start)
+    return position + 1 if position >= 0 else -1
+
+def extract_sections(content: str, keywords: Set[str]) -> List[str]:
+    """Extract the sections under level 1 headings that contain one of the keywords.
+    
+    A section starts at a line like '# IDENTITY and PURPOSE' and runs up to the
+    next line starting with '#'. Gives the same sections as the pattern from
+    create_section_pattern, but jumps from one line starting with '#' to the
+    next with str.find and slices the sections out of the content, so the
+    section bodies are scanned once and never backtracked over.
+    
+    One difference is deliberate: the heading must be on one line. The
+    pattern also started a section at a bare '#' line followed by a line
+    with a keyword ('#\nPurpose ...'), the extractor doesn't.
+    
+    Args:
+        content: Markdown text
+        keywords: Keywords to match in headings, case insensitive
+        
+    Returns:
+        List of sections, each including its heading line
+    """
+    heading_pattern = get_heading_pattern(frozenset(keywords))
+    sections: List[str] = []
+    section_start = -1
+    
+    # Position of the first line starting with '#', -1 when there are no more
+    position = 0 if content.startswith('#') else _next_hash_line(content, 0)
+    while position >= 0:
+        if section_start >= 0:
+            sections.append(content[section_start:position])
+            section_start = -1
+        line_end = content.find('\n', position)
+        line = content[position:] if line_end < 0 else content[position:line_end]
+        # Only level 1 headings ('#' followed by whitespace) can start a section
+        if line[1:2].isspace() and heading_pattern.match(line):
+            section_start = position
+        position = -1 if line_end < 0 else _next_hash_line(content, line_end)
+
+    if section_start >= 0:
+        sections.append(content[section_start:])
+    return sections
+
 def parse_markdown_file(
     file_path: str | Path,
     keywords: Optional[Set[str]] = None
@@ -37,9 +94,6 @@ def parse_markdown_file(
         # Use provided keywords or defaults from config
         keywords = keywords or set(config.base_words)
         
-        # Create regex pattern for keywords in headings and text
-        section_pattern = create_section_pattern(keywords)
-        
         # Read file content
         path = Path(file_path)
         try:
@@ -48,7 +102,7 @@ def parse_markdown_file(
             raise ParsingError(f"Failed to read {path}: {str(e)}") from e
             
         # Find all matching headings
-        section_matches = list(section_pattern.findall(content))
+        section_matches = extract_sections(content, keywords)
         
         # If no matches found, return full content
         if not section_matches:
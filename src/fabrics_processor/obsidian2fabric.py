@@ -1,9 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from shutil import copy2, rmtree
+from typing import Optional, Set
 from fastcore.utils import L
+import logging
+import os
 import re
 
 from src.fabrics_processor.config import config
+from src.fabrics_processor.directory_scanner import scan_directory
+from src.fabrics_processor.hashing import hash_file
+from src.fabrics_processor.scan_manifest import ScanManifest
+
+logger = logging.getLogger('fabric_to_espanso')
 
 def sentence2snake(name: str) -> str:
     """Convert any string to snake_case, replacing non-alphanumeric with underscore"""
@@ -11,80 +20,88 @@ def sentence2snake(name: str) -> str:
     s2 = re.sub(r'\W', r'_', s1)
     return re.sub(r'_+', r'_', s2)
 
-def round_timestamp(ts: float) -> int:
-    """Round timestamp to handle filesystem differences"""
-    return int(str(ts).split('.')[0][:-4])
-
-def get_md_files_obsidian(path: Path) -> dict:
-    """Get files from obsidian vault: stem -> (path, timestamp, size)"""
-    # Rename files to snake_case and add identifier to distinguish own prompts from others
-    return {sentence2snake(p.stem)+"-"+p.parent.name.lower(): (p, p.stat().st_mtime, p.stat().st_size) 
-            for p in Path(path).glob('**/*.md')}
-
-def get_md_files_fabricsfolder(path: Path) -> dict:
-    """Get files from target structure: dir_name -> (system.md_path, timestamp, size)"""
-    target_subdirs = [x for x in path.iterdir() if x.is_dir()]
-    return {x.stem: (x/'system.md', (x/'system.md').stat().st_mtime, (x/'system.md').stat().st_size)
-            for x in target_subdirs 
-            if (x/'system.md').exists()}
-
-def get_modified_files(source_files: dict, target_files: dict) -> list:
-    """Compare timestamps between source and target files, returns dictionary of
-    entries needing updates. The dictionary has the filename as key and the following
-    values:
-        path, timestamp, size"""
-    existing_files = L(k for k in source_files.keys() if k in target_files)
-    # removed checking for timestamp. Because you don't want false positives because of file system differences
-    # or daylight savings. But you also want to be able to update files that have almost the same timestamp
-    # when you change the file.
-    # different_timestamps = L(k for k in existing_files 
-    #                        if round_timestamp(source_files[k][1]) > round_timestamp(target_files[k][1]))
-    # return L(source_files[k][0] for k in different_timestamps 
-    #         if source_files[k][2] != target_files[k][2])
-    return L({k: source_files[k]} for k in existing_files if source_files[k][2] != target_files[k][2])
-
-def get_new_files(source_files: dict, target_files: dict) -> list:
-    """Return list of dictionaries containing with the key as filename and these values:
-        path, timestamp, size"""
-    return L({k: source_files[k]} for k in source_files.keys() if k not in target_files)
-
-def process_file(source: dict, target_dir: Path) -> None:
-    """
-    Process a single file: create directory, copy as system.md, create user.md
-    
-    Args:
-        source: Dict of source file: filename:(path, timestamp, size)
-        target_dir: Base target directory (e.g. 'md_target')
-    """
-    filename = next(iter(source))
-    filepath = next(iter(source.values()))[0]
-    subdir = target_dir/filename
+def copy_prompt(name: str, source_path: Path, target_dir: Path) -> os.stat_result:
+    """Copy a prompt as <target_dir>/<name>/system.md with an empty user.md. Returns the stat of the copy."""
+    subdir = target_dir/name
     subdir.mkdir(mode=0o755, exist_ok=True)
-    copy2(filepath, subdir/'system.md')
+    copy2(source_path, subdir/'system.md')
     (subdir/'user.md').touch()
+    return (subdir/'system.md').stat()
 
-def sync_folders(source_dir: Path, target_dir: Path) -> None:
+def get_file_hash(manifest: Optional[ScanManifest], path: Path, stat: os.stat_result) -> str:
+    """Hash of a file, taken from the manifest when the file didn't change since it was stored"""
+    entry = manifest.get(str(path), stat) if manifest else None
+    if entry is not None:
+        return entry['hash']
+    file_hash = hash_file(path)
+    if manifest:
+        manifest.put(str(path), stat, {'hash': file_hash})
+    return file_hash
+
+def sync_folders(
+    source_dir: Path,
+    target_dir: Path,
+    manifest_path: Optional[str] = config.sync_manifest_path,
+    workers: Optional[int] = None
+) -> Set[str]:
     """
     Main function to synchronize folders
     
+    A prompt is copied when its content differs from the copy in the target
+    directory. The hashes of both are kept in a manifest, so files that didn't
+    change since the last sync are not read. Copies and deletions run on a
+    thread pool.
+    
     Args:
         source_dir: Path to source directory (obsidian vault)
         target_dir: Path to target directory (fabrics folder)
+        manifest_path: Location of the sync manifest. If None, all files are hashed
+        workers: Number of threads copying and deleting. If None, uses configuration
+        
+    Returns:
+        Names of the pattern directories in the target directory that were created, updated or deleted
     """
-    source_files = get_md_files_obsidian(Path(source_dir))
-    target_files = get_md_files_fabricsfolder(Path(target_dir))
-    
-    # Get all files that need processing
-    files_to_process = L(get_new_files(source_files, target_files) + 
-                        get_modified_files(source_files, target_files))
-    
-    # Process each file
-    for i in files_to_process:
-        process_file(i, target_dir)
-    
-    # Get all files that need deleting
-    files_to_delete = L(k for k in target_files.keys() if k not in source_files and "-" in k)
+    source_dir, target_dir = Path(source_dir), Path(target_dir)
+    source_files = {sentence2snake(f.path.stem)+"-"+f.path.parent.name.lower(): f
+                    for f in scan_directory(source_dir, pattern='*.md', ignore=config.scan_ignore_patterns)}
+    target_files = {f.path.parent.name: f
+                    for f in scan_directory(target_dir, max_depth=2, pattern='system.md', ignore=config.scan_ignore_patterns)
+                    if f.path.parent != target_dir}
+
+    manifest = ScanManifest(manifest_path, parser_key="obsidian2fabric") if manifest_path else None
+    try:
+        # Get all files that need processing: new files and files whose content differs from the copy
+        files_to_process = {}
+        for name, source in source_files.items():
+            source_hash = get_file_hash(manifest, source.path, source.stat)
+            target = target_files.get(name)
+            if target is None or get_file_hash(manifest, target.path, target.stat) != source_hash:
+                files_to_process[name] = (source.path, source_hash)
+
+        # Get all files that need deleting, own prompts are recognised by the "-" in their name
+        files_to_delete = L(k for k in target_files.keys() if k not in source_files and "-" in k)
+
+        with ThreadPoolExecutor(max_workers=workers or config.sync_workers, thread_name_prefix='sync') as pool:
+            copies = {name: pool.submit(copy_prompt, name, path, target_dir) for name, (path, _) in files_to_process.items()}
+            deletions = [pool.submit(rmtree, target_dir/name) for name in files_to_delete]
+        for future in deletions:
+            future.result()
+
+        # The copies have the hash of their source
+        for name, future in copies.items():
+            stat = future.result()
+            if manifest:
+                manifest.put(str(target_dir/name/'system.md'), stat, {'hash': files_to_process[name][1]})
+
+        if manifest:
+            manifest.prune([str(f.path) for f in source_files.values()], root_dir=str(source_dir))
+            manifest.prune([str(target_dir/name/'system.md') for name in target_files if name not in files_to_delete]
+                           + [str(target_dir/name/'system.md') for name in files_to_process], root_dir=str(target_dir))
+    finally:
+        if manifest:
+            manifest.close()
 
-    # Delete each directory and its contents
-    for file_name in files_to_delete:
-        rmtree(target_dir/file_name)
\ No newline at end of file
+    changed = set(files_to_process) | set(files_to_delete)
+    if changed:
+        logger.info(f"Synced {len(files_to_process)} prompts from Obsidian and deleted {len(files_to_delete)}: {sorted(changed)}")
+    return changed
@@ -1,8 +1,14 @@
 """YAML file generation for fabric-to-espanso and
-markdown file generation for Obsidian TextGenerator plugin."""
+markdown file generation for Obsidian TextGenerator plugin.
+
+Output formats are registered as output writers, which all get the payloads
+of one snapshot of the collection."""
 from pathlib import Path
-from shutil import rmtree
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Any, List, Iterable, Optional, Set, Tuple, Callable
+import json
 import yaml
 import logging
 
@@ -11,6 +17,10 @@ from qdrant_client.http.exceptions import UnexpectedResponse
 from src.fabrics_processor.config import config
 
 from .exceptions import DatabaseError
+from .database import scroll_points
+from .atomic_file import AtomicFileWriter, write_file_atomic
+from .directory_scanner import scan_directory
+from .hashing import hash_file, hash_text
 
 logger = logging.getLogger('fabric_to_espanso')
 
@@ -20,19 +30,186 @@ class BlockString(str):
 
 def repr_block_string(dumper: yaml.Dumper, data: BlockString) -> yaml.ScalarNode:
     """Custom YAML representer for block strings."""
-    return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+    return dumper.represent_scalar('tag:yaml.org,2002:str', str(data), style='|')
+
+# The C emitter of libyaml is much faster with many large block strings, if PyYAML was built with it
+YamlDumper = getattr(yaml, 'CDumper', yaml.Dumper)
 
 yaml.add_representer(BlockString, repr_block_string)
+yaml.add_representer(BlockString, repr_block_string, Dumper=YamlDumper)
+
+def create_match_entry(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Create the espanso match of a pattern."""
+    return {
+        'trigger': payload['trigger'],
+        'replace': BlockString(payload['content'] + '\n{{clipb}}'),
+        'label': payload['filename'],
+        'vars': [
+            {'name': 'clipb', 'type': 'clipboard'}
+        ]
+    }
+
+def write_matches_yaml(writer: Any, payloads: Iterable[Dict[str, Any]]) -> int:
+    """Write an espanso match file, one match at a time.
+
+    The output loads the same as dumping the whole {'matches': [...]} document
+    at once, without building it in memory.
+
+    Args:
+        writer: Object with a write(str) method
+        payloads: Point payloads with filename, content and trigger, in the order to write
+
+    Returns:
+        Number of matches written
+    """
+    payloads = iter(payloads)
+    first = next(payloads, None)
+    if first is None:
+        writer.write('matches: []\n')
+        return 0
+    writer.write('matches:\n')
+    count = 0
+    for payload in chain([first], payloads):
+        # A top level sequence is emitted at the same indentation as under a mapping key
+        writer.write(yaml.dump(
+            [create_match_entry(payload)],
+            Dumper=YamlDumper, sort_keys=False, default_flow_style=False
+        ))
+        count += 1
+    return count
+
+@dataclass
+class OutputWriter:
+    """An output format generated from the patterns in the database."""
+    name: str
+    # Payload fields the writer needs
+    payload_fields: List[str]
+    # Called with the payloads of all points in the collection
+    write: Callable[[List[Dict[str, Any]]], None]
+
+# Registered output writers by name, all run after every database update
+output_writers: Dict[str, OutputWriter] = {}
 
-def generate_yaml_file(client: QdrantClient, collection_name: str, yaml_output_folder: str) -> None:
-    """Generate a complete YAML file from the Qdrant database.
+def register_output_writer(writer: OutputWriter) -> None:
+    """Add an output format, or replace the writer with the same name.
+
+    Args:
+        writer: Output writer to register
+    """
+    output_writers[writer.name] = writer
+
+def fetch_collection_snapshot(client: QdrantClient, collection_name: str, payload_fields: List[str]) -> List[Dict[str, Any]]:
+    """Fetch the payloads of all points in a collection in one pass.
 
     Args:
         client: Initialized Qdrant client
+        collection_name: Name of the collection to read
+        payload_fields: Payload fields to fetch
+
+    Returns:
+        List of point payloads
+
+    Raises:
+        DatabaseError: If database query fails
+    """
+    try:
+        return [point.payload for point in scroll_points(client, collection_name, payload_fields=payload_fields)]
+    except UnexpectedResponse as e:
+        raise DatabaseError(f"Failed to query database: {str(e)}") from e
+
+def generate_output_files(
+    client: QdrantClient,
+    collection_name: str,
+    writer_names: Optional[Iterable[str]] = None
+) -> None:
+    """Generate all output files from one snapshot of the collection.
+
+    The payload fields all writers need are fetched once, then the writers
+    run at the same time.
+
+    Args:
+        client: Initialized Qdrant client
+        collection_name: Name of the collection to read
+        writer_names: Names of the output writers to run. If None, runs all registered writers
+
+    Raises:
+        DatabaseError: If database query fails
+        Exception: The first error of a writer, after all writers finished
+    """
+    writers = [output_writers[name] for name in writer_names] if writer_names is not None else list(output_writers.values())
+    if not writers:
+        return
+    payload_fields = sorted({field for writer in writers for field in writer.payload_fields})
+    payloads = fetch_collection_snapshot(client, collection_name, payload_fields)
+    logger.info(f"Fetched {len(payloads)} points to generate {', '.join(writer.name for writer in writers)}")
+
+    with ThreadPoolExecutor(max_workers=len(writers), thread_name_prefix='writer') as pool:
+        futures = {writer.name: pool.submit(writer.write, payloads) for writer in writers}
+    errors = [(name, future.exception()) for name, future in futures.items() if future.exception() is not None]
+    for name, error in errors:
+        logger.error(f"Output writer {name} failed: {str(error)}")
+    if errors:
+        raise errors[0][1]
+
+# Name of the espanso match file, and the prefix of the sharded match files
+YAML_FILE_STEM = "fabric_patterns"
+# Lists the match files written to the output folder, only those are removed when their shard is gone.
+# Espanso only loads .yml files
+YAML_MANIFEST_NAME = f".{YAML_FILE_STEM}_files.json"
+
+def read_yaml_manifest(output_path: Path) -> Set[str]:
+    """Return the names of the match files written by an earlier run.
+
+    Args:
+        output_path: Folder with the match files
+
+    Returns:
+        The file names, the unsharded match file is always included
+    """
+    # Written before sharding existed, when there was no manifest yet
+    names = {f"{YAML_FILE_STEM}.yml"}
+    try:
+        recorded = json.loads((output_path / YAML_MANIFEST_NAME).read_text(encoding='utf-8'))
+        # Only names of files in the output folder itself
+        names.update(name for name in recorded if isinstance(name, str) and Path(name).name == name)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable YAML manifest in {output_path}: {str(e)}")
+    return names
+
+def get_yaml_shard(filename: str, sharding: Optional[str]) -> Optional[str]:
+    """Return the shard of the espanso match files a pattern belongs to.
+
+    Args:
+        filename: Name of the pattern
+        sharding: None, "prefix" or "source"
+
+    Returns:
+        Name of the shard, None when the matches are not sharded
+    """
+    if sharding == "prefix":
+        first = filename[:1].lower()
+        return first if first.isascii() and first.isalnum() else "other"
+    if sharding == "source":
+        # Own prompts synced from Obsidian are named <name>-<folder>, see obsidian2fabric
+        return "own" if "-" in filename else "official"
+    return None
+
+def write_yaml_file(payloads: List[Dict[str, Any]], yaml_output_folder: str, sharding: Optional[str] = None) -> None:
+    """Write the espanso YAML file, or one YAML file per shard.
+
+    Only files whose content changed are written, and match files of a
+    previous layout or of shards that became empty are removed, so espanso
+    doesn't load the same matches twice. The written files are recorded in
+    a manifest, other files in the folder are never removed.
+
+    Args:
+        payloads: Payloads with filename, content and trigger of all points
         yaml_output_folder: Directory where the YAML file will be created
+        sharding: None, "prefix" or "source". If None, uses configuration
         
     Raises:
-        DatabaseError: If database query fails
         OSError: If file operations fail
         ValueError: If output folder is invalid
     """
@@ -42,55 +219,71 @@ def generate_yaml_file(client: QdrantClient, collection_name: str, yaml_output_f
         if not output_path.exists():
             logger.info(f"YAML output path doesn't exist. Check the Espanso matches directory with `espanso path` in PowerShell: {output_path}")
             raise ValueError(f"YAML output path doesn't exist. Check the Espanso matches directory with `espanso path` in PowerShell: {output_path}")
+
+        sharding = sharding or config.yaml_sharding
+        # Sort for stable files: the same database content always gives the same files
+        payloads = sorted(payloads, key=lambda payload: (payload['filename'], payload['trigger']))
+        shards: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for payload in payloads:
+            shards.setdefault(get_yaml_shard(payload['filename'], sharding), []).append(payload)
+        if not shards and not sharding:
+            # An empty database still gives a valid, empty match file
+            shards[None] = []
             
-        # Query all entries from the database
-        try:
-            results = client.scroll(
-                collection_name=collection_name,
-                limit=10000  # Adjust based on expected maximum files
-            )[0]
-        except UnexpectedResponse as e:
-            raise DatabaseError(f"Failed to query database: {str(e)}") from e
-            
-        # Prepare YAML data
-        data: Dict[str, List[Dict[str, Any]]] = {'matches': []}
-        
-        for result in results:
-            entry = {
-                'trigger': result.payload['trigger'],
-                'replace': BlockString(result.payload['content'] + '\n{{clipb}}'),
-                'label': result.payload['filename'],
-                'vars': [
-                    {'name': 'clipb', 'type': 'clipboard'}
-                ]
-            }
-            data['matches'].append(entry)
-            
-        # Write the YAML file
-        yaml_output_path = output_path / "fabric_patterns.yml"  
-        with open(yaml_output_path, 'w') as yaml_file:
-            yaml.dump(data, yaml_file, sort_keys=False, default_flow_style=False)
-        
-        logger.info(f"YAML file generated successfully at {yaml_output_path}")
+        # Write each YAML file to a temporary file that replaces the old file when the content changed,
+        # espanso reloads its matches on every change of a file
+        written = []
+        for shard, shard_payloads in shards.items():
+            yaml_output_path = output_path / (f"{YAML_FILE_STEM}_{shard}.yml" if shard else f"{YAML_FILE_STEM}.yml")
+            with AtomicFileWriter(yaml_output_path) as yaml_file:
+                write_matches_yaml(yaml_file, shard_payloads)
+            written.append(yaml_output_path)
+            if yaml_file.changed:
+                logger.info(f"YAML file generated successfully at {yaml_output_path} ({len(shard_payloads)} matches)")
+
+        # Remove the match files this function wrote for shards that no longer exist
+        written_names = sorted(path.name for path in written)
+        for name in sorted(read_yaml_manifest(output_path) - set(written_names)):
+            path = output_path / name
+            if path.exists():
+                path.unlink()
+                logger.info(f"Removed YAML file {path}")
+        write_file_atomic(output_path / YAML_MANIFEST_NAME, json.dumps(written_names, indent=2) + '\n')
+
+        logger.info(f"YAML files at {output_path} are up to date ({len(payloads)} matches in {len(written)} files)")
     except Exception as e:
         logger.error(f"Error generating YAML file: {str(e)}", exc_info=True)
-        if isinstance(e, (DatabaseError, OSError, ValueError)):
+        if isinstance(e, (OSError, ValueError)):
             raise
         raise RuntimeError(f"Unexpected error generating YAML: {str(e)}") from e
 
-def generate_markdown_files(client: QdrantClient, collection_name: str, markdown_output_folder: str) -> None:
-    """Generate markdown files from the Qdrant database.
+def generate_yaml_file(client: QdrantClient, collection_name: str, yaml_output_folder: str, sharding: Optional[str] = None) -> None:
+    """Generate a complete YAML file, or sharded YAML files, from the Qdrant database.
 
     Args:
         client: Initialized Qdrant client
-        collection_name: Name of the collection to query
-        markdown_output_folder: Directory where the markdown files will be created
+        yaml_output_folder: Directory where the YAML file will be created
+        sharding: None, "prefix" or "source". If None, uses configuration
         
     Raises:
         DatabaseError: If database query fails
         OSError: If file operations fail
         ValueError: If output folder is invalid
     """
+    payloads = fetch_collection_snapshot(client, collection_name, ['filename', 'content', 'trigger'])
+    write_yaml_file(payloads, yaml_output_folder, sharding)
+
+def write_markdown_files(payloads: List[Dict[str, Any]], markdown_output_folder: str) -> None:
+    """Write the markdown files for Obsidian TextGenerator.
+
+    Only the files whose rendered content differs from the existing file are
+    written, and files of patterns that are no longer in the database are
+    removed. Unchanged files are not touched, so Obsidian doesn't re-index them.
+
+    Args:
+        payloads: Payloads with filename, purpose and content of all points
+        markdown_output_folder: Directory where the markdown files will be created
+    """
     try:
         # Validate output folder
         output_path = Path(markdown_output_folder)
@@ -98,35 +291,69 @@ def generate_markdown_files(client: QdrantClient, collection_name: str, markdown
             logger.info(f"Markdown output path doesn't exist. Check if this folder in parameters.py matches the Textgenerator folder in you Obsidian vault. {output_path}")
             raise ValueError(f"Markdown output path doesn't exist. Check if this folder in parameters.py matches the Textgenerator folder in you Obsidian vault. {output_path}")
             
-        # Query all entries from the database
-        try:
-            # Simply first remove all existing markdown files in Obisdian Textgenerator folder
-            rmtree(output_path)
-            output_path.mkdir(mode=0o755)
-
-            results = client.scroll(
-                collection_name=collection_name,
-                limit=10000  # Adjust based on expected maximum files
-            )[0]
-
-            # Generate markdown files for each entry
-            for result in results:
-                metadata = result.payload
-                filename = metadata['filename']
-                purpose = metadata['purpose']
-                content = metadata['content']
-                markdown_path = output_path / f"{filename}.md"
-                with open(markdown_path, 'w', encoding='utf-8') as markdown_file:
-                    markdown_file.write(apply_markdown_template(filename, purpose, content))
-            
-            logger.info(f"Generated {len(results)} Markdown files generated successfully at {markdown_output_folder}")
+        # Render the markdown file of each entry
+        rendered: Dict[str, str] = {
+            f"{metadata['filename']}.md": apply_markdown_template(metadata['filename'], metadata['purpose'], metadata['content'])
+            for metadata in payloads
+        }
 
-        except UnexpectedResponse as e:
-            raise DatabaseError(f"Failed to query database: {str(e)}") from e
+        created, updated, removed = sync_output_files(output_path, rendered)
+        logger.info(
+            f"Markdown files at {markdown_output_folder} are up to date: {len(rendered)} files, "
+            f"{created} created, {updated} updated, {removed} removed"
+        )
             
     except Exception as e:
         logger.error(f"Error generating Markdown files: {str(e)}")
 
+def generate_markdown_files(client: QdrantClient, collection_name: str, markdown_output_folder: str) -> None:
+    """Generate markdown files from the Qdrant database.
+
+    Args:
+        client: Initialized Qdrant client
+        collection_name: Name of the collection to query
+        markdown_output_folder: Directory where the markdown files will be created
+    """
+    try:
+        payloads = fetch_collection_snapshot(client, collection_name, ['filename', 'purpose', 'content'])
+    except DatabaseError as e:
+        logger.error(f"Error generating Markdown files: {str(e)}")
+        return
+    write_markdown_files(payloads, markdown_output_folder)
+
+def sync_output_files(output_path: Path, rendered: Dict[str, str], workers: Optional[int] = None) -> Tuple[int, int, int]:
+    """Make the markdown files in a folder match the rendered files.
+
+    Args:
+        output_path: Folder with the markdown files
+        rendered: Dict mapping file names to their content
+        workers: Number of threads reading and writing files. If None, uses configuration
+
+    Returns:
+        Number of created, updated and removed files
+    """
+    # Temporary files of the atomic writes start with a dot and are skipped
+    existing = {
+        file.path.name: file
+        for file in scan_directory(output_path, max_depth=1, pattern='*.md', ignore=config.scan_ignore_patterns)
+    }
+
+    def write(name: str, text: str) -> Optional[str]:
+        file = existing.get(name)
+        if file is not None:
+            data = text.encode('utf-8')
+            # Only read the existing file when the size doesn't already tell it changed
+            if file.size == len(data) and hash_file(file.path) == hash_text(text):
+                return None
+        write_file_atomic(output_path / name, text, only_if_changed=False)
+        return 'created' if file is None else 'updated'
+
+    obsolete = [file.path for name, file in existing.items() if name not in rendered]
+    with ThreadPoolExecutor(max_workers=workers or config.output_write_workers, thread_name_prefix='output') as pool:
+        actions = list(pool.map(write, rendered.keys(), rendered.values()))
+        list(pool.map(Path.unlink, obsolete))
+    return actions.count('created'), actions.count('updated'), len(obsolete)
+
 
 def apply_markdown_template(filename: str, purpose: str, content: str) -> str:
     """Apply the markdown template to the given content.
@@ -154,4 +381,16 @@ config:
 ---
 
 {{{{selection}}}}
-"""
\ No newline at end of file
+"""
+
+# The output folders are read from the configuration when the writers run
+register_output_writer(OutputWriter(
+    name='espanso',
+    payload_fields=['filename', 'content', 'trigger'],
+    write=lambda payloads: write_yaml_file(payloads, config.yaml_output_folder)
+))
+register_output_writer(OutputWriter(
+    name='obsidian',
+    payload_fields=['filename', 'purpose', 'content'],
+    write=lambda payloads: write_markdown_files(payloads, config.obsidian_output_folder)
+))
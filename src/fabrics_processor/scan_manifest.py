@@ -0,0 +1,101 @@
+"""Local manifest of scanned pattern files for fabric-to-espanso.
+
+The manifest stores the (inode, mtime_ns, size) of every processed file
+together with the result of processing it. When a file has the same stat
+values on the next run, the stored result is used and the file is not
+opened at all.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+import json
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger('fabric_to_espanso')
+
+class ScanManifest:
+    """SQLite backed manifest of processed files, keyed by path."""
+
+    def __init__(self, manifest_path: str | Path, parser_key: str = ""):
+        """Open or create the manifest.
+
+        Args:
+            manifest_path: Location of the SQLite database
+            parser_key: Description of the parser settings (e.g. the headings to
+                extract). When it differs from the stored key, all entries are dropped.
+        """
+        path = Path(manifest_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path))
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                result TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'parser_key'").fetchone()
+        if row is None or row[0] != parser_key:
+            logger.info("Parser settings changed, clearing the scan manifest")
+            self._connection.execute("DELETE FROM files")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('parser_key', ?)", (parser_key,)
+            )
+        self._entries = {
+            row[0]: (row[1], row[2], row[3], row[4])
+            for row in self._connection.execute("SELECT path, inode, mtime_ns, size, result FROM files")
+        }
+
+    def __enter__(self) -> 'ScanManifest':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def get(self, path: str, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        """Return the stored result for a file if its stat values are unchanged."""
+        entry = self._entries.get(path)
+        if entry is None or entry[:3] != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return None
+        result = json.loads(entry[3])
+        if 'last_modified' in result:
+            result['last_modified'] = datetime.fromisoformat(result['last_modified'])
+        return result
+
+    def put(self, path: str, stat: os.stat_result, result: Dict[str, Any]) -> None:
+        """Store the result of processing a file."""
+        serialized = json.dumps(result, default=lambda value: value.isoformat())
+        self._entries[path] = (stat.st_ino, stat.st_mtime_ns, stat.st_size, serialized)
+        self._connection.execute(
+            "INSERT OR REPLACE INTO files (path, inode, mtime_ns, size, result) VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_ino, stat.st_mtime_ns, stat.st_size, serialized)
+        )
+
+    def prune(self, existing_paths: Iterable[str], root_dir: Optional[str] = None) -> None:
+        """Remove the entries of files that no longer exist.
+
+        Args:
+            existing_paths: Paths of the files that still exist
+            root_dir: Only remove entries below this directory, for scans of part of a tree
+        """
+        candidates = self._entries.keys()
+        if root_dir is not None:
+            prefix = os.path.join(root_dir, '')
+            candidates = [path for path in candidates if path.startswith(prefix)]
+        removed = set(candidates) - set(existing_paths)
+        for path in removed:
+            del self._entries[path]
+        self._connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+
+    def close(self) -> None:
+        """Write the changes to disk and close the manifest."""
+        self._connection.commit()
+        self._connection.close()
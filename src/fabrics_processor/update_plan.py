@@ -0,0 +1,359 @@
+"""Plan and apply database updates for fabric-to-espanso.
+
+Building the plan only reads the fabric patterns folder and the database.
+Applying the plan does all the writes: embedding and upserting the new and
+modified files, updating payloads and deleting points.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple, TYPE_CHECKING
+import json
+import logging
+import uuid
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    PointStruct, Filter, FieldCondition, MatchAny, FilterSelector,
+    SetPayload, SetPayloadOperation, UpdateVectors, UpdateVectorsOperation, PointVectors
+)
+
+from .config import config
+from .database import validate_point_payload, scroll_points, notify_collection_changed, has_sparse_vector
+from .embedding import embed_texts, embed_sparse_texts, create_sparse_embedding_model, sparse_document, get_sparse_vector_name
+from .batch_upserter import BatchUpserter
+from .file_processor import process_markdown_files
+from .file_change_detector import get_stored_files, compare_files
+from .exceptions import ConfigurationError
+
+if TYPE_CHECKING:
+    from fastembed import TextEmbedding, SparseTextEmbedding
+
+logger = logging.getLogger('fabric_to_espanso')
+
+@dataclass
+class UpdatePlan:
+    """Changes needed to bring the database in line with the fabric patterns folder."""
+    collection_name: str
+    # New files, get a new point
+    adds: List[Dict[str, Any]] = field(default_factory=list)
+    # (point_id, file) of modified files whose purpose changed, need a new embedding
+    updates: List[Tuple[Any, Dict[str, Any]]] = field(default_factory=list)
+    # (point_id, file) of modified files with the same purpose, only the payload changes
+    payload_updates: List[Tuple[Any, Dict[str, Any]]] = field(default_factory=list)
+    # Filenames of deleted files
+    deletes: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not any([self.adds, self.updates, self.payload_updates, self.deletes])
+
+    @property
+    def estimated_embeddings(self) -> int:
+        """Number of texts that have to be embedded to apply the plan."""
+        return len(self.adds) + len(self.updates)
+
+    @property
+    def estimated_bytes(self) -> int:
+        """Approximate number of bytes sent to the database to apply the plan."""
+        # A float in JSON takes about 20 characters
+        vector_bytes = config.embedding.vector_size * 20
+        files = self.adds + [file for _, file in self.updates]
+        total = sum(_payload_size(file) + vector_bytes for file in files)
+        total += sum(_payload_size(file) for _, file in self.payload_updates)
+        total += sum(len(filename) for filename in self.deletes)
+        return total
+
+    def summary(self) -> str:
+        """Human readable description of the plan."""
+        lines = [
+            f"Update plan for collection {self.collection_name}:",
+            f"  {len(self.adds)} new: {[file['filename'] for file in self.adds]}",
+            f"  {len(self.updates)} modified: {[file['filename'] for _, file in self.updates]}",
+            f"  {len(self.payload_updates)} payload only: {[file['filename'] for _, file in self.payload_updates]}",
+            f"  {len(self.deletes)} deleted: {self.deletes}",
+            f"  Estimated embeddings: {self.estimated_embeddings}",
+            f"  Estimated bytes to transfer: {self.estimated_bytes}",
+        ]
+        return '\n'.join(lines)
+
+def _payload_size(file: Dict[str, Any]) -> int:
+    return len(json.dumps(
+        {key: file.get(key) for key in ('filename', 'content', 'purpose', 'trigger')},
+        default=str
+    ).encode('utf-8'))
+
+def _same_purpose(stored_payload: Dict[str, Any], file: Dict[str, Any]) -> bool:
+    """Check if a modified file has the same purpose, and so the same embedding, as the stored point."""
+    if 'purpose_hash' in stored_payload:
+        return stored_payload['purpose_hash'] == file['purpose_hash']
+    return stored_payload.get('purpose') == file['purpose']
+
+def build_update_plan(
+    collection_name: str,
+    new_files: List[Dict[str, Any]],
+    modified_files: List[Dict[str, Any]],
+    deleted_files: List[str],
+    stored_files: Dict[str, Dict[str, Any]]
+) -> UpdatePlan:
+    """Build an update plan from detected file changes.
+
+    Args:
+        collection_name: Name of the collection to update
+        new_files: List of new files
+        modified_files: List of modified files
+        deleted_files: List of deleted filenames
+        stored_files: Dict mapping filenames to their database records
+
+    Returns:
+        UpdatePlan with the changes to apply
+    """
+    plan = UpdatePlan(collection_name=collection_name, adds=list(new_files), deletes=list(deleted_files))
+    for file in modified_files:
+        stored = stored_files.get(file['filename'])
+        if stored is None:
+            logger.warning(f"File not found in database for update: {file['filename']}")
+        elif _same_purpose(stored['payload'], file):
+            plan.payload_updates.append((stored['id'], file))
+        else:
+            plan.updates.append((stored['id'], file))
+    return plan
+
+def create_update_plan(
+    client: QdrantClient,
+    fabric_patterns_folder: str,
+    collection_name: str = config.embedding.collection_name
+) -> UpdatePlan:
+    """Compare the fabric patterns folder with the database and plan the changes.
+
+    Args:
+        client: Initialized Qdrant client
+        fabric_patterns_folder: Folder containing the fabric patterns
+        collection_name: Name of the collection to compare with
+
+    Returns:
+        UpdatePlan with the changes to apply
+    """
+    current_files = process_markdown_files(fabric_patterns_folder)
+    stored_files = get_stored_files(client, collection_name)
+    new_files, modified_files, deleted_files = compare_files(current_files, stored_files)
+    # Points stored before the purpose hash was added need their purpose to compare with
+    legacy_files = [
+        file['filename'] for file in modified_files
+        if 'purpose_hash' not in stored_files[file['filename']]['payload']
+    ]
+    stored_files.update(get_stored_files_by_name(client, collection_name, legacy_files))
+    return build_update_plan(collection_name, new_files, modified_files, deleted_files, stored_files)
+
+def create_update_plan_for_patterns(
+    client: QdrantClient,
+    fabric_patterns_folder: str,
+    pattern_names: Iterable[str],
+    collection_name: str = config.embedding.collection_name
+) -> UpdatePlan:
+    """Plan the changes for some pattern directories only.
+
+    Only the given pattern directories are read, and only their points are
+    fetched from the database. A pattern directory that no longer exists is
+    planned as deleted.
+
+    Args:
+        client: Initialized Qdrant client
+        fabric_patterns_folder: Folder containing the fabric patterns
+        pattern_names: Names of the pattern directories that changed
+        collection_name: Name of the collection to compare with
+
+    Returns:
+        UpdatePlan with the changes to apply
+    """
+    pattern_names = sorted(set(pattern_names))
+    current_files: List[Dict[str, Any]] = []
+    for name in pattern_names:
+        pattern_dir = Path(fabric_patterns_folder) / name
+        if pattern_dir.is_dir():
+            # Depth 1 within the pattern directory is depth 2 in the fabric patterns folder
+            current_files.extend(process_markdown_files(pattern_dir, max_depth=1))
+
+    # Fetch the full payload, the stored purpose is needed for points without a purpose hash
+    stored_files = get_stored_files_by_name(client, collection_name, pattern_names)
+    new_files, modified_files, deleted_files = compare_files(current_files, stored_files)
+    return build_update_plan(collection_name, new_files, modified_files, deleted_files, stored_files)
+
+def get_stored_files_by_name(
+    client: QdrantClient,
+    collection_name: str,
+    filenames: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    """Get the database records of the given files.
+
+    Args:
+        client: Initialized Qdrant client
+        collection_name: Name of the collection to query
+        filenames: Filenames to look up
+
+    Returns:
+        Dict mapping filenames to their database records
+    """
+    stored_files: Dict[str, Dict[str, Any]] = {}
+    if not filenames:
+        return stored_files
+    points = scroll_points(
+        client,
+        collection_name,
+        scroll_filter=Filter(
+            must=[FieldCondition(key="filename", match=MatchAny(any=list(filenames)))]
+        )
+    )
+    for point in points:
+        # TODO: Add handling of cases of multiple entries with the same filename
+        stored_files.setdefault(point.payload['filename'], {'payload': point.payload, 'id': point.id})
+    return stored_files
+
+def apply_update_plan(
+    client: QdrantClient,
+    plan: UpdatePlan,
+    embedding_model: Optional[TextEmbedding] = None,
+    sparse_model: Optional[SparseTextEmbedding] = None
+) -> None:
+    """Apply an update plan to the database.
+
+    Args:
+        client: Initialized Qdrant client
+        plan: Update plan to apply
+        embedding_model: Loaded embedding model. Only initialized when the plan needs embeddings
+            that are not in the embedding cache
+        sparse_model: Loaded sparse embedding model. Only initialized when the collection has a
+            sparse vector and the plan adds or changes files
+    """
+    # The sparse vector for hybrid search is computed from the filename and content,
+    # when the collection has one
+    sparse_vector_name = None
+    if (plan.adds or plan.updates or plan.payload_updates) and has_sparse_vector(client, plan.collection_name):
+        sparse_vector_name = get_sparse_vector_name()
+
+    # Collect the points that need a new embedding
+    points_to_embed = []  # (point_id, payload, action)
+    for file in plan.adds:
+        try:
+            payload_new = validate_point_payload(file)
+            points_to_embed.append((str(uuid.uuid4()), {  # Generate a new UUID for each point
+                "filename": payload_new['filename'],
+                "content": payload_new['content'],
+                "purpose": payload_new['purpose'],
+                "content_hash": payload_new['content_hash'],
+                "purpose_hash": payload_new['purpose_hash'],
+                "date": payload_new['last_modified'],
+                "filesize": payload_new['filesize'],
+                "trigger": payload_new['trigger'],
+            }, "Added new file to database"))
+        except ConfigurationError as e:
+            logger.error(f"Skipping new file: {str(e)}")
+
+    for point_id, file in plan.updates:
+        try:
+            payload_current = validate_point_payload(file, point_id)
+            points_to_embed.append((point_id, {
+                "filename": payload_current['filename'],
+                "content": file['content'],
+                "purpose": file['purpose'],
+                "content_hash": file['content_hash'],
+                "purpose_hash": file['purpose_hash'],
+                "date": file['last_modified'],
+                "filesize": file['filesize'],
+                "trigger": payload_current['trigger'],
+            }, "Updated modified file in database"))
+        except ConfigurationError as e:
+            logger.error(f"Skipping modified file: {str(e)}")
+
+    # Whether something was written. The caches are told about the change even when a
+    # later write fails, the points written before are in the database
+    changed = False
+    upserter = None
+    try:
+        if points_to_embed:
+            # Generate vectors from the purpose fields
+            # The model is only loaded when some purposes are not in the embedding cache
+            vectors = embed_texts([payload['purpose'] for _, payload, _ in points_to_embed], embedding_model)
+            sparse_vectors = [None] * len(points_to_embed)
+            if sparse_vector_name:
+                sparse_model = sparse_model or create_sparse_embedding_model()
+                sparse_vectors = embed_sparse_texts([
+                    sparse_document(payload['filename'], payload['content']) for _, payload, _ in points_to_embed
+                ], sparse_model)
+
+            # Add new files and update modified files. The points are sent in batches,
+            # leaving the with block waits until all batches are written
+            with BatchUpserter(client, plan.collection_name) as upserter:
+                for (point_id, payload, action), vector, sparse_vector in zip(points_to_embed, vectors, sparse_vectors):
+                    point_vectors = {'fast-bge-small-en': vector}
+                    if sparse_vector is not None:
+                        point_vectors[sparse_vector_name] = sparse_vector
+                    point = PointStruct(
+                        id=point_id,
+                        # LET OP: als je 'fastembed' gebruikt, moet je de naam van de vector gebruiken.
+                        # In dit geval is de naam 'fast-bge-small-en'.
+                        # Gebruik je fastembed niet, maar rechtstreeks de QDRANT api, dan kun je ook gebruik maken
+                        # van unnamed vectors en kun je dus schrrijven vector = get_embedding(file['purpose'], embedding_model)
+                        # Zie https://github.com/qdrant/qdrant-client/discussions/598
+                        # De naam die fastembed gebruikt is afhankelijk van het model dat je gebruikt.
+                        # Je kunt de naam vinden door: client.get_vector_field_name()
+                        vector=point_vectors,
+                        payload=payload
+                    )
+                    upserter.add(point)
+            # Leaving the with block confirmed that all points are written
+            for _, payload, action in points_to_embed:
+                logger.info(f"{action}: {payload['filename']}")
+
+        # Update the payload of modified files whose purpose, and so the dense embedding, didn't change
+        if plan.payload_updates:
+            operations = [
+                SetPayloadOperation(set_payload=SetPayload(
+                    payload={
+                        "content": file['content'],
+                        "content_hash": file['content_hash'],
+                        "purpose_hash": file['purpose_hash'],
+                        "date": file['last_modified'],
+                        "filesize": file['filesize'],
+                    },
+                    points=[point_id]
+                ))
+                for point_id, file in plan.payload_updates
+            ]
+            if sparse_vector_name:
+                # The content changed, so the sparse vector has to be updated as well
+                sparse_model = sparse_model or create_sparse_embedding_model()
+                sparse_vectors = embed_sparse_texts([
+                    sparse_document(file['filename'], file['content']) for _, file in plan.payload_updates
+                ], sparse_model)
+                operations += [
+                    UpdateVectorsOperation(update_vectors=UpdateVectors(
+                        points=[PointVectors(id=point_id, vector={sparse_vector_name: sparse_vector})]
+                    ))
+                    for (point_id, _), sparse_vector in zip(plan.payload_updates, sparse_vectors)
+                ]
+            batch_size = config.database.upsert_batch_size
+            for start in range(0, len(operations), batch_size):
+                client.batch_update_points(
+                    collection_name=plan.collection_name,
+                    update_operations=operations[start:start + batch_size]
+                )
+                changed = True
+            for _, file in plan.payload_updates:
+                logger.info(f"Updated payload of modified file in database: {file['filename']}")
+
+        # Delete removed files with one request. Filtering on filename also removes duplicate entries
+        if plan.deletes:
+            client.delete(
+                collection_name=plan.collection_name,
+                points_selector=FilterSelector(filter=Filter(
+                    must=[FieldCondition(key="filename", match=MatchAny(any=plan.deletes))]
+                ))
+            )
+            changed = True
+            logger.info(f"Deleted files from database: {plan.deletes}")
+    finally:
+        if changed or (upserter is not None and upserter.points_written):
+            notify_collection_changed(plan.collection_name)
+    logger.info("Database update completed successfully")
@@ -0,0 +1,108 @@
+"""Vector store backends for fabric-to-espanso.
+
+All modules store and search the patterns through the Qdrant client API
+(scroll, retrieve, upsert, query_points, ...). A backend decides where that
+API is served: by a Qdrant server, or in this process, on disk or in
+memory. The in-process backends need no server and have no network round
+trips, which suits single machine installs, benchmarks and tests.
+
+The backend is selected with config.database.backend. Other backends can be
+added with register_vector_store_backend, as long as they return a client
+with the Qdrant client API.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
+
+from .config import config
+from .exceptions import ConfigurationError
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient, AsyncQdrantClient
+
+@dataclass
+class VectorStoreBackend:
+    """A way to create the database client."""
+    name: str
+    # Called with the url and API key passed to create_database_connection, None uses configuration
+    create_client: Callable[[Optional[str], Optional[str]], QdrantClient]
+    create_async_client: Callable[[Optional[str], Optional[str]], AsyncQdrantClient]
+    # Whether the data is in this process. In-process clients can't be used by several
+    # threads at the same time, and payload indexes and the local replica are not needed
+    in_process: bool = False
+
+# Registered backends by name
+vector_store_backends: Dict[str, VectorStoreBackend] = {}
+
+def register_vector_store_backend(backend: VectorStoreBackend) -> None:
+    """Add a backend, or replace the backend with the same name.
+
+    Args:
+        backend: Backend to register
+    """
+    vector_store_backends[backend.name] = backend
+
+def get_vector_store_backend(name: Optional[str] = None) -> VectorStoreBackend:
+    """Return a registered backend.
+
+    Args:
+        name: Name of the backend. If None, uses configuration
+
+    Raises:
+        ConfigurationError: If there is no backend with that name
+    """
+    name = name or config.database.backend
+    try:
+        return vector_store_backends[name]
+    except KeyError:
+        raise ConfigurationError(
+            f"Unknown vector store backend {name}, choose from {', '.join(vector_store_backends)}"
+        ) from None
+
+# Largest gRPC message, the default of 4 MB is too small for a scroll page of markdown documents
+GRPC_MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+def _remote_client_args(url: Optional[str], api_key: Optional[str]) -> Dict[str, Any]:
+    import httpx
+    return {
+        'url': url or config.database.url,
+        'timeout': config.database.timeout,
+        'api_key': api_key,
+        'prefer_grpc': config.database.prefer_grpc,
+        'grpc_port': config.database.grpc_port,
+        'grpc_options': {
+            'grpc.max_send_message_length': GRPC_MAX_MESSAGE_BYTES,
+            'grpc.max_receive_message_length': GRPC_MAX_MESSAGE_BYTES,
+        },
+        # Keep the connections open, so the threads sharing the client reuse them
+        'limits': httpx.Limits(max_connections=config.database.pool_size, max_keepalive_connections=config.database.pool_size),
+    }
+
+def _remote_client(url: Optional[str], api_key: Optional[str]) -> QdrantClient:
+    from qdrant_client import QdrantClient
+    return QdrantClient(**_remote_client_args(url, api_key))
+
+def _remote_async_client(url: Optional[str], api_key: Optional[str]) -> AsyncQdrantClient:
+    from qdrant_client import AsyncQdrantClient
+    return AsyncQdrantClient(**_remote_client_args(url, api_key))
+
+def _local_client(url: Optional[str], api_key: Optional[str]) -> QdrantClient:
+    from qdrant_client import QdrantClient
+    return QdrantClient(path=config.database.local_path)
+
+def _local_async_client(url: Optional[str], api_key: Optional[str]) -> AsyncQdrantClient:
+    from qdrant_client import AsyncQdrantClient
+    return AsyncQdrantClient(path=config.database.local_path)
+
+def _memory_client(url: Optional[str], api_key: Optional[str]) -> QdrantClient:
+    from qdrant_client import QdrantClient
+    return QdrantClient(location=":memory:")
+
+def _memory_async_client(url: Optional[str], api_key: Optional[str]) -> AsyncQdrantClient:
+    from qdrant_client import AsyncQdrantClient
+    return AsyncQdrantClient(location=":memory:")
+
+register_vector_store_backend(VectorStoreBackend('remote', _remote_client, _remote_async_client))
+register_vector_store_backend(VectorStoreBackend('local', _local_client, _local_async_client, in_process=True))
+register_vector_store_backend(VectorStoreBackend('memory', _memory_client, _memory_async_client, in_process=True))
@@ -0,0 +1,148 @@
+"""Folder watching for the fabric-to-espanso watch mode.
+
+Changes are picked up with watchdog when it is installed, otherwise the
+folders are polled. Bursts of changes, like `fabric -U` rewriting all
+patterns, are debounced into a single batch of changed paths.
+"""
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import logging
+import queue
+import threading
+import time
+
+from .config import config
+from .directory_scanner import is_ignored_path, scan_directory
+
+logger = logging.getLogger('fabric_to_espanso')
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+class _QueueEventHandler(FileSystemEventHandler):
+    """Put the paths of watchdog events on a queue, skipping the paths polling would skip."""
+
+    def __init__(self, events: queue.Queue, roots: Sequence[Path], ignore: Sequence[str]):
+        super().__init__()
+        self.events = events
+        self.roots = roots
+        self.ignore = ignore
+
+    def on_any_event(self, event) -> None:
+        if event.event_type in ('opened', 'closed_no_write'):
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path and not self._is_ignored(Path(path)):
+                self.events.put(Path(path))
+
+    def _is_ignored(self, path: Path) -> bool:
+        return any(is_ignored_path(path, root, self.ignore) for root in self.roots)
+
+class FolderWatcher:
+    """Watch folders and yield debounced batches of changed paths."""
+
+    def __init__(
+        self,
+        folders: Sequence[Tuple[str | Path, Optional[int]]],
+        poll_interval: Optional[float] = None,
+        debounce: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        use_polling: bool = False
+    ):
+        """Create a watcher.
+
+        Args:
+            folders: (folder, max_depth) pairs to watch, max_depth None watches the whole tree
+            poll_interval: Seconds between scans when polling. If None, uses configuration
+            debounce: Seconds without changes before a batch is yielded. If None, uses configuration
+            max_delay: Maximum seconds a batch waits while changes keep coming. If None, uses configuration
+            use_polling: Poll even when watchdog is available
+        """
+        self.folders = [(Path(folder), max_depth) for folder, max_depth in folders]
+        self.poll_interval = poll_interval or config.watch_poll_interval
+        self.debounce = debounce or config.watch_debounce
+        self.max_delay = max_delay or config.watch_max_delay
+        self.use_polling = use_polling or Observer is None
+        self._events: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._observer = None
+        self._poll_thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'FolderWatcher':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Start watching the folders."""
+        if self.use_polling:
+            logger.info(f"Watching folders by polling every {self.poll_interval} seconds")
+            self._poll_thread = threading.Thread(target=self._poll, name='folder-poller', daemon=True)
+            self._poll_thread.start()
+        else:
+            logger.info("Watching folders with watchdog")
+            self._observer = Observer()
+            handler = _QueueEventHandler(self._events, [folder for folder, _ in self.folders], config.scan_ignore_patterns)
+            for folder, _ in self.folders:
+                self._observer.schedule(handler, str(folder), recursive=True)
+            self._observer.start()
+
+    def stop(self) -> None:
+        """Stop watching the folders."""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._poll_thread is not None:
+            self._poll_thread.join()
+
+    def batches(self) -> Iterator[Set[Path]]:
+        """Yield sets of changed paths, after the changes have settled.
+
+        Blocks until there are changes, until the watcher is stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                first = self._events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            changed = {first}
+            started = last = time.monotonic()
+            # Keep collecting until it is quiet for debounce seconds, or the batch is max_delay old
+            while not self._stop.is_set():
+                now = time.monotonic()
+                timeout = min(last + self.debounce, started + self.max_delay) - now
+                if timeout <= 0:
+                    break
+                try:
+                    changed.add(self._events.get(timeout=timeout))
+                    last = time.monotonic()
+                except queue.Empty:
+                    break
+            logger.info(f"Detected changes in {len(changed)} paths")
+            yield changed
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        """Scan the folders: path -> (mtime_ns, size)."""
+        snapshot: Dict[Path, Tuple[int, int]] = {}
+        for folder, max_depth in self.folders:
+            for file in scan_directory(folder, max_depth=max_depth, pattern='*', ignore=config.scan_ignore_patterns):
+                snapshot[file.path] = (file.stat.st_mtime_ns, file.size)
+        return snapshot
+
+    def _poll(self) -> None:
+        """Compare snapshots of the folders and put the changed paths on the queue."""
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            changed: List[Path] = [path for path, state in current.items() if previous.get(path) != state]
+            changed += [path for path in previous if path not in current]
+            for path in changed:
+                self._events.put(path)
+            previous = current
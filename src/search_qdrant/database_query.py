@@ -1,22 +1,181 @@
+# Importing this module is kept cheap for the query apps: qdrant_client, fastembed,
+# numpy and the local replica are imported on first use. See benchmarks/bench_import_time.py
+from __future__ import annotations
+
+import asyncio
 import logging
-from src.fabrics_processor.database import initialize_qdrant_database
-from qdrant_client import QdrantClient
-from qdrant_client.models import QueryResponse
+import threading
+from typing import TYPE_CHECKING
+from src.fabrics_processor.events import add_collection_change_listener
+from src.fabrics_processor.embedding import get_sparse_vector_name
+from src.search_qdrant.query_cache import QueryCache
 import argparse
 from src.fabrics_processor.config import config
 
+if TYPE_CHECKING:
+      from qdrant_client import QdrantClient, AsyncQdrantClient
+      from qdrant_client.fastembed_common import QueryResponse
+      from qdrant_client.http.models import ScoredPoint, SparseVector
+      from fastembed import TextEmbedding, SparseTextEmbedding
+      from src.search_qdrant.local_replica import LocalReplica
+
+# Search results keyed by (collection_name, query, num_results), cleared when the collection changes
+_result_cache = QueryCache(config.query.cache_max_entries, config.query.cache_ttl)
+# Query embeddings keyed by (model_name, query), they don't depend on the collection
+_embedding_cache = QueryCache(config.query.cache_max_entries, config.query.cache_ttl)
+add_collection_change_listener(_result_cache.invalidate)
+
+# Query embedding models, loaded on first use
+_embedding_models: dict[str, TextEmbedding | SparseTextEmbedding] = {}
+_embedding_models_lock = threading.Lock()
+
+# Whether a collection has the sparse vector for hybrid search, checked once per collection
+_hybrid_collections: dict[str, bool] = {}
+
+def _get_embedding_model(model_name: str, sparse: bool = False) -> TextEmbedding | SparseTextEmbedding:
+      with _embedding_models_lock:
+            if model_name not in _embedding_models:
+                  from fastembed import TextEmbedding, SparseTextEmbedding
+                  logging.info(f"Loading query embedding model: {model_name}")
+                  model_class = SparseTextEmbedding if sparse else TextEmbedding
+                  _embedding_models[model_name] = model_class(model_name=model_name)
+            return _embedding_models[model_name]
+
+def _get_local_replica(collection_name: str) -> LocalReplica | None:
+      from src.fabrics_processor.vector_store import get_vector_store_backend
+      # An in-process database is searched in memory already
+      if not config.query.replica_path or get_vector_store_backend().in_process:
+            return None
+      from src.search_qdrant.local_replica import get_local_replica
+      # Results cached before a sync changed the replica are outdated
+      return get_local_replica(collection_name, on_change=_result_cache.invalidate)
+
+def warm_up(client: QdrantClient | AsyncQdrantClient | None = None) -> threading.Thread:
+      """Import the query dependencies, and load the query embedding model, in a background thread.
+      
+      Lets an app show its interface first, while the first search doesn't
+      have to wait for everything to load.
+      
+      Args:
+            client: Client whose embedding model to load. If None, only the modules are imported
+      
+      Returns:
+            The started daemon thread
+      """
+      def load() -> None:
+            try:
+                  import qdrant_client.fastembed_common  # noqa: F401
+                  import src.search_qdrant.local_replica  # noqa: F401
+                  if client is not None:
+                        _get_embedding_model(client.embedding_model_name)
+            except Exception as e:
+                  logging.warning(f"Warming up the query dependencies failed: {e}")
+
+      thread = threading.Thread(target=load, name='query-warm-up', daemon=True)
+      thread.start()
+      return thread
+
+def embed_query(query: str, client: QdrantClient | AsyncQdrantClient) -> list[float]:
+      """Embed a search query with the model the client uses for the collection.
+      
+      Args:
+            query: The search query text
+            client: Initialized QdrantClient or AsyncQdrantClient instance
+      
+      Returns:
+            The query embedding
+      """
+      model_name = client.embedding_model_name
+
+      def compute() -> list[float]:
+            return next(iter(_get_embedding_model(model_name).query_embed(query))).tolist()
+
+      return _embedding_cache.get_or_compute((model_name, query), compute)
+
+def embed_sparse_query(query: str) -> SparseVector:
+      """Compute the sparse (keyword) vector of a search query.
+      
+      Args:
+            query: The search query text
+      
+      Returns:
+            The sparse query vector
+      """
+      model_name = config.embedding.sparse_model_name
+
+      def compute() -> SparseVector:
+            from qdrant_client.http.models import SparseVector
+            embedding = next(iter(_get_embedding_model(model_name, sparse=True).query_embed(query)))
+            return SparseVector(indices=embedding.indices.tolist(), values=embedding.values.tolist())
+
+      return _embedding_cache.get_or_compute((model_name, query), compute)
+
+def _use_hybrid_search(client: QdrantClient, collection_name: str) -> bool:
+      if not config.query.hybrid_search or not config.embedding.sparse_model_name:
+            return False
+      if collection_name not in _hybrid_collections:
+            try:
+                  from src.fabrics_processor.database import has_sparse_vector
+                  _hybrid_collections[collection_name] = has_sparse_vector(client, collection_name)
+            except Exception as e:
+                  logging.warning(f"Could not check the collection for hybrid search: {e}")
+                  return False
+      return _hybrid_collections[collection_name]
+
+async def _use_hybrid_search_async(client: AsyncQdrantClient, collection_name: str) -> bool:
+      if not config.query.hybrid_search or not config.embedding.sparse_model_name:
+            return False
+      if collection_name not in _hybrid_collections:
+            try:
+                  collection = await client.get_collection(collection_name)
+            except Exception as e:
+                  logging.warning(f"Could not check the collection for hybrid search: {e}")
+                  return False
+            _hybrid_collections[collection_name] = get_sparse_vector_name() in (collection.config.params.sparse_vectors or {})
+      return _hybrid_collections[collection_name]
+
+def _hybrid_query(
+      client: QdrantClient | AsyncQdrantClient,
+      collection_name: str,
+      query_vector: list[float],
+      sparse_vector: SparseVector,
+      num_results: int) -> dict:
+      """Arguments of query_points for a dense and a sparse search, fused with reciprocal rank fusion in the database."""
+      from qdrant_client.http.models import Prefetch, FusionQuery, Fusion
+      prefetch_limit = max(config.query.hybrid_prefetch_limit, num_results)
+      return dict(
+            collection_name=collection_name,
+            prefetch=[
+                  Prefetch(query=query_vector, using=client.get_vector_field_name(), limit=prefetch_limit),
+                  Prefetch(query=sparse_vector, using=get_sparse_vector_name(), limit=prefetch_limit),
+            ],
+            query=FusionQuery(fusion=Fusion.RRF),
+            limit=num_results,
+            with_payload=True
+      )
+
 def query_qdrant_database(
       query: str,
       client: QdrantClient,
       num_results: int = 5,
-      collection_name: str = config.embedding.collection_name) -> list[QueryResponse]:
+      collection_name: str = config.embedding.collection_name,
+      use_cache: bool = True) -> list[QueryResponse]:
       """Query the Qdrant database for similar documents.
       
+      Results and query embeddings are cached in memory. Identical queries
+      that run at the same time share one search. When the collection has
+      sparse vectors, a dense and a keyword search run in one request and
+      are fused with reciprocal rank fusion. Otherwise, when the local
+      replica is enabled, the search runs on the replica, which is synced
+      in the background. The replica is also searched when the database
+      can't be reached.
+      
       Args:
             query: The search query text
             client: Initialized QdrantClient instance
             num_results: Maximum number of results to return
             collection_name: Name of the collection to query
+            use_cache: Whether to use cached results
       
       Returns:
             List of QueryResponse objects containing matches
@@ -24,23 +183,181 @@ def query_qdrant_database(
       Raises:
             QdrantException: If there's an error querying the database
       """
+      def search() -> list[QueryResponse]:
+            query_vector = embed_query(query, client)
+            replica = _get_local_replica(collection_name)
+            if _use_hybrid_search(client, collection_name):
+                  sparse_vector = embed_sparse_query(query)
+                  if replica is not None and replica.needs_sync:
+                        # Keep the replica up to date for when the database can't be reached
+                        replica.sync_in_background(client)
+                  try:
+                        points = client.query_points(
+                              **_hybrid_query(client, collection_name, query_vector, sparse_vector, num_results)
+                        ).points
+                        return _to_query_responses(points)
+                  except Exception as e:
+                        if replica is None or not len(replica):
+                              raise
+                        logging.warning(f"Hybrid search failed, searching the local replica: {e}")
+                        return _replica_responses(replica.search(query_vector, num_results))
+
+            if replica is not None:
+                  # Sync first when the replica is empty, or the collection was changed by this process,
+                  # so a search after an edit shows the new payload
+                  if not len(replica) or replica.changed:
+                        replica.sync_or_warn(client)
+                  elif replica.needs_sync:
+                        replica.sync_in_background(client)
+                  if len(replica):
+                        return _replica_responses(replica.search(query_vector, num_results))
+
+            # Same search client.query does, but with a cached query embedding
+            points = client.query_points(
+                  collection_name=collection_name,
+                  query=query_vector,
+                  using=client.get_vector_field_name(),
+                  limit=num_results,
+                  with_payload=True
+            ).points
+            return _to_query_responses(points)
+
       try:
-            results = client.query(collection_name=collection_name, query_text=query, limit=num_results)
-            return results
+            if not use_cache:
+                  return search()
+            # Return a copy, so callers can't change the cached list
+            return list(_result_cache.get_or_compute((collection_name, query, num_results), search))
       except Exception as e:
             logging.error(f"Error querying Qdrant database: {e}")
             raise
 
+async def query_qdrant_database_async(
+      query: str,
+      client: AsyncQdrantClient,
+      num_results: int = 5,
+      collection_name: str = config.embedding.collection_name,
+      use_cache: bool = True) -> list[QueryResponse]:
+      """Query the Qdrant database for similar documents without blocking the event loop.
+      
+      The asyncio version of query_qdrant_database, sharing its caches. The
+      query is embedded in a worker thread and the search awaits the client.
+      
+      Args:
+            query: The search query text
+            client: Initialized AsyncQdrantClient instance, shared by all requests
+            num_results: Maximum number of results to return
+            collection_name: Name of the collection to query
+            use_cache: Whether to use cached results
+      
+      Returns:
+            List of QueryResponse objects containing matches
+            
+      Raises:
+            QdrantException: If there's an error querying the database
+      """
+      async def search() -> list[QueryResponse]:
+            # Embedding is CPU bound, run it outside the event loop
+            query_vector = await asyncio.to_thread(embed_query, query, client)
+            replica = _get_local_replica(collection_name)
+            if await _use_hybrid_search_async(client, collection_name):
+                  sparse_vector = await asyncio.to_thread(embed_sparse_query, query)
+                  if replica is not None and replica.needs_sync:
+                        # Keep the replica up to date for when the database can't be reached
+                        replica.sync_async_in_background(client)
+                  try:
+                        response = await client.query_points(
+                              **_hybrid_query(client, collection_name, query_vector, sparse_vector, num_results)
+                        )
+                        return _to_query_responses(response.points)
+                  except Exception as e:
+                        if replica is None or not len(replica):
+                              raise
+                        logging.warning(f"Hybrid search failed, searching the local replica: {e}")
+                        return _replica_responses(replica.search(query_vector, num_results))
+
+            if replica is not None:
+                  if not len(replica) or replica.changed:
+                        await replica.sync_async_or_warn(client)
+                  elif replica.needs_sync:
+                        replica.sync_async_in_background(client)
+                  if len(replica):
+                        return _replica_responses(replica.search(query_vector, num_results))
+
+            response = await client.query_points(
+                  collection_name=collection_name,
+                  query=query_vector,
+                  using=client.get_vector_field_name(),
+                  limit=num_results,
+                  with_payload=True
+            )
+            return _to_query_responses(response.points)
+
+      try:
+            if not use_cache:
+                  return await search()
+            return list(await _result_cache.get_or_compute_async((collection_name, query, num_results), search))
+      except Exception as e:
+            logging.error(f"Error querying Qdrant database: {e}")
+            raise
+
+def _to_query_responses(points: list[ScoredPoint]) -> list[QueryResponse]:
+      """Convert search results to the QueryResponse objects client.query returns."""
+      from qdrant_client.fastembed_common import QueryResponse
+      return [
+            QueryResponse(
+                  id=point.id,
+                  embedding=None,
+                  sparse_embedding=None,
+                  metadata=point.payload,
+                  document=point.payload.get('content', ''),
+                  score=point.score
+            )
+            for point in points
+      ]
+
+def _replica_responses(results: list[tuple]) -> list[QueryResponse]:
+      """Convert local replica search results to QueryResponse objects."""
+      from qdrant_client.fastembed_common import QueryResponse
+      return [
+            QueryResponse(
+                  id=point_id,
+                  embedding=None,
+                  sparse_embedding=None,
+                  metadata=payload,
+                  document=payload.get('content', ''),
+                  score=score
+            )
+            for point_id, score, payload in results
+      ]
+
+def clear_query_cache() -> None:
+      """Remove all cached search results and query embeddings."""
+      _result_cache.clear()
+      _embedding_cache.clear()
+
 def main():
-      client = initialize_qdrant_database() 
+      from src.search_qdrant.query_daemon import QueryDaemonError, format_results, query_daemon, result_to_dict
 
       parser = argparse.ArgumentParser(description="Query Qdrant database")
       parser.add_argument("query", type=str, help="The search query text")
       parser.add_argument("--num_results", "-n", type=int, default=5, help="The number of results to return (default: 5)")
       parser.add_argument("--collection_name", "-c", type=str, default=config.embedding.collection_name, help="The name of the collection to query.")
+      parser.add_argument("--format", choices=["list", "text", "json"], default="list", help="Print the filenames as a list (list) or one per line (text), or the full results (json)")
+      parser.add_argument("--no-daemon", action="store_true", help="Don't use a running query daemon, query the database directly")
 
       args = parser.parse_args()
 
+      # A running daemon answers without connecting to the database and loading the model first
+      if not args.no_daemon:
+            try:
+                  results = query_daemon(args.query, args.num_results, args.collection_name)
+                  print(format_results(results, args.format))
+                  return
+            except QueryDaemonError as e:
+                  logging.debug(f"Querying the database directly: {e}")
+
+      from src.fabrics_processor.database import initialize_qdrant_database
+      client = initialize_qdrant_database()
       try:
           results = query_qdrant_database(query=args.query,
                                         client=client,
@@ -48,8 +365,7 @@ def main():
                                         collection_name=args.collection_name
           )
 
-          filenames = [r.metadata['filename'] for r in results]
-          print(filenames)
+          print(format_results([result_to_dict(r) for r in results], args.format))
       finally:
           client.close()
 
@@ -0,0 +1,315 @@
+"""Local read replica of a collection for fabric-to-espanso.
+
+The vectors of a collection are kept in one contiguous float32 matrix, with
+the few payload fields the query apps show, so a search is a single matrix
+product instead of a round trip to the database. The replica is saved to
+disk and synced incrementally: only points whose id is new or whose date
+or trigger changed are fetched. When the database can't be reached, the
+last synced copy is searched.
+"""
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import Record
+
+from src.fabrics_processor.config import config
+from src.fabrics_processor.database import scroll_points, add_collection_change_listener
+
+logger = logging.getLogger('fabric_to_espanso')
+
+# Payload fields kept in the replica
+REPLICA_PAYLOAD_FIELDS = ['filename', 'content', 'trigger', 'date']
+# Payload fields that tell if a point changed since the last sync
+SYNC_FIELDS = ['date', 'trigger']
+# Points fetched per request when checking for changes, only the sync fields are sent
+SYNC_PAGE_SIZE = 1000
+
+def _version(payload: Dict[str, Any]) -> List[Any]:
+    return [payload.get(field) for field in SYNC_FIELDS]
+
+class LocalReplica:
+    """In-memory copy of the vectors and compact payloads of a collection."""
+
+    def __init__(
+        self,
+        collection_name: str,
+        path: Optional[str | Path] = None,
+        sync_interval: Optional[float] = None,
+        on_change: Optional[Callable[[str], None]] = None
+    ):
+        """Create a replica, loading the copy saved by an earlier run.
+
+        Args:
+            collection_name: Name of the collection to replicate
+            path: Folder where the replica is saved. If None, the replica is only kept in memory
+            sync_interval: Seconds after which the replica is synced again. If None, uses configuration
+            on_change: Called with the collection name when a sync changed the replica,
+                e.g. to drop cached search results
+        """
+        self.collection_name = collection_name
+        self.on_change = on_change
+        self.file = Path(path) / f"{collection_name}.npz" if path else None
+        self.sync_interval = sync_interval or config.query.replica_sync_interval
+        self.vector_name: Optional[str] = None
+        self._ids: List[Any] = []
+        self._payloads: List[Dict[str, Any]] = []
+        self._versions: Dict[Any, List[Any]] = {}
+        self._vectors = np.zeros((0, config.embedding.vector_size), dtype=np.float32)
+        self._last_sync = 0.0
+        self._stale = True
+        # Searches read a consistent (ids, payloads, vectors) snapshot, syncs swap it under this lock
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def needs_sync(self) -> bool:
+        """Whether the replica is older than the sync interval, or the collection changed."""
+        return self._stale or time.monotonic() - self._last_sync > self.sync_interval
+
+    @property
+    def changed(self) -> bool:
+        """Whether the collection was changed by this process since the last sync.
+
+        Searches should then sync first, instead of in the background, so they
+        don't return the old payloads.
+        """
+        return self._stale
+
+    def mark_stale(self) -> None:
+        """Sync on the next search, called when the collection is changed by this process."""
+        self._stale = True
+
+    def search(self, query_vector: List[float], limit: int) -> List[Tuple[Any, float, Dict[str, Any]]]:
+        """Find the points most similar to a query vector, by cosine similarity.
+
+        Args:
+            query_vector: Embedding of the query
+            limit: Maximum number of results
+
+        Returns:
+            (point_id, score, payload) per result, best match first
+        """
+        with self._lock:
+            ids, payloads, vectors = self._ids, self._payloads, self._vectors
+        if not ids or limit <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        # The stored vectors are normalized, so the dot product is the cosine similarity
+        scores = vectors @ query
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [(ids[i], float(scores[i]), payloads[i]) for i in top]
+
+    def sync(self, client: QdrantClient) -> None:
+        """Fetch the points that changed since the last sync and drop the deleted points.
+
+        Args:
+            client: Initialized Qdrant client
+        """
+        with self._sync_lock:
+            self._stale = False
+            current = {
+                point.id: _version(point.payload)
+                for point in scroll_points(client, self.collection_name, payload_fields=SYNC_FIELDS, page_size=SYNC_PAGE_SIZE)
+            }
+            vector_name = client.get_vector_field_name()
+            changed = self._changed_ids(current, vector_name)
+            records: List[Record] = []
+            for start in range(0, len(changed), config.database.scroll_page_size):
+                records.extend(client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=changed[start:start + config.database.scroll_page_size],
+                    with_payload=REPLICA_PAYLOAD_FIELDS,
+                    with_vectors=[vector_name]
+                ))
+            self._apply(current, records, vector_name)
+
+    async def sync_async(self, client: AsyncQdrantClient) -> None:
+        """The asyncio version of sync.
+
+        Args:
+            client: Initialized AsyncQdrantClient
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return  # Another sync is running
+        try:
+            self._stale = False
+            current: Dict[Any, List[Any]] = {}
+            offset = None
+            while True:
+                points, offset = await client.scroll(
+                    collection_name=self.collection_name,
+                    limit=SYNC_PAGE_SIZE,
+                    offset=offset,
+                    with_payload=SYNC_FIELDS
+                )
+                current.update((point.id, _version(point.payload)) for point in points)
+                if offset is None:
+                    break
+            vector_name = client.get_vector_field_name()
+            changed = self._changed_ids(current, vector_name)
+            records: List[Record] = []
+            for start in range(0, len(changed), config.database.scroll_page_size):
+                records.extend(await client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=changed[start:start + config.database.scroll_page_size],
+                    with_payload=REPLICA_PAYLOAD_FIELDS,
+                    with_vectors=[vector_name]
+                ))
+            # Building the matrix and saving it is CPU and disk work, keep it off the event loop
+            await asyncio.to_thread(self._apply, current, records, vector_name)
+        finally:
+            self._sync_lock.release()
+
+    def sync_in_background(self, client: QdrantClient) -> None:
+        """Start a sync in a daemon thread, unless one is running."""
+        if self._sync_lock.locked():
+            return
+        threading.Thread(target=self.sync_or_warn, args=(client,), name='replica-sync', daemon=True).start()
+
+    def sync_async_in_background(self, client: AsyncQdrantClient) -> None:
+        """Start a sync as an asyncio task, unless one is running."""
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        self._sync_task = asyncio.ensure_future(self.sync_async_or_warn(client))
+
+    def sync_or_warn(self, client: QdrantClient) -> bool:
+        """Sync, logging a warning instead of raising when the database can't be reached.
+
+        Returns:
+            Whether the sync succeeded
+        """
+        try:
+            self.sync(client)
+            return True
+        except Exception as e:
+            self._stale = True
+            logger.warning(f"Could not sync the local replica of {self.collection_name}: {str(e)}")
+            return False
+
+    async def sync_async_or_warn(self, client: AsyncQdrantClient) -> bool:
+        """The asyncio version of sync_or_warn."""
+        try:
+            await self.sync_async(client)
+            return True
+        except Exception as e:
+            self._stale = True
+            logger.warning(f"Could not sync the local replica of {self.collection_name}: {str(e)}")
+            return False
+
+    def _changed_ids(self, current: Dict[Any, List[Any]], vector_name: str) -> List[Any]:
+        """Ids of the points that are new or changed since the last sync."""
+        if vector_name != self.vector_name:
+            return list(current)
+        return [point_id for point_id, version in current.items() if self._versions.get(point_id) != version]
+
+    def _apply(self, current: Dict[Any, List[Any]], records: List[Record], vector_name: str) -> None:
+        """Replace the changed points, drop the deleted points and save the replica."""
+        fetched = {record.id for record in records}
+        keep = [
+            row for row, point_id in enumerate(self._ids)
+            if point_id in current and point_id not in fetched and vector_name == self.vector_name
+        ]
+        ids = [self._ids[row] for row in keep] + [record.id for record in records]
+        payloads = [self._payloads[row] for row in keep] + [record.payload for record in records]
+        new_vectors = np.asarray([record.vector[vector_name] for record in records], dtype=np.float32)
+        if len(records):
+            new_vectors /= np.maximum(np.linalg.norm(new_vectors, axis=1, keepdims=True), 1e-12)
+        else:
+            new_vectors = new_vectors.reshape(0, self._vectors.shape[1])
+        vectors = np.ascontiguousarray(np.vstack([self._vectors[keep], new_vectors]) if keep else new_vectors)
+        versions = {point_id: current[point_id] for point_id in ids}
+        removed = len(self._ids) - len(keep) - len(fetched & set(self._ids))
+
+        with self._lock:
+            self._ids, self._payloads, self._vectors = ids, payloads, vectors
+            self._versions = versions
+            self.vector_name = vector_name
+        self._last_sync = time.monotonic()
+        logger.info(
+            f"Synced local replica of {self.collection_name}: {len(ids)} points, "
+            f"{len(records)} fetched, {removed} removed"
+        )
+        if records or removed:
+            self.save()
+            if self.on_change is not None:
+                self.on_change(self.collection_name)
+
+    def save(self) -> None:
+        """Write the replica to disk, replacing the previous copy at once."""
+        if self.file is None:
+            return
+        with self._lock:
+            ids, payloads, vectors = self._ids, self._payloads, self._vectors
+            meta = {'vector_name': self.vector_name, 'ids': ids, 'payloads': payloads, 'versions': [self._versions.get(i) for i in ids]}
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.file.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, vectors=vectors, meta=np.array(json.dumps(meta, default=str)))
+            os.replace(tmp_path, self.file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self) -> None:
+        """Read the replica saved by an earlier run, if there is one."""
+        if self.file is None or not self.file.exists():
+            return
+        try:
+            with np.load(self.file, allow_pickle=False) as data:
+                vectors = data['vectors']
+                meta = json.loads(str(data['meta']))
+        except Exception as e:
+            logger.warning(f"Could not load the local replica {self.file}: {str(e)}")
+            return
+        with self._lock:
+            self._ids, self._payloads, self._vectors = meta['ids'], meta['payloads'], vectors
+            self._versions = dict(zip(meta['ids'], meta['versions']))
+            self.vector_name = meta['vector_name']
+        logger.info(f"Loaded local replica of {self.collection_name} with {len(self._ids)} points")
+
+_replicas: Dict[str, LocalReplica] = {}
+_replicas_lock = threading.Lock()
+
+def get_local_replica(collection_name: str, on_change: Optional[Callable[[str], None]] = None) -> Optional[LocalReplica]:
+    """Get the shared replica of a collection, or None if the local replica is disabled.
+
+    Args:
+        collection_name: Name of the collection
+        on_change: Called when a sync changed the replica, set when the replica is created
+
+    Returns:
+        The replica, created on first use
+    """
+    if not config.query.replica_path:
+        return None
+    with _replicas_lock:
+        if collection_name not in _replicas:
+            _replicas[collection_name] = LocalReplica(collection_name, config.query.replica_path, on_change=on_change)
+        return _replicas[collection_name]
+
+def _mark_replica_stale(collection_name: str) -> None:
+    replica = _replicas.get(collection_name)
+    if replica is not None:
+        replica.mark_stale()
+
+add_collection_change_listener(_mark_replica_stale)
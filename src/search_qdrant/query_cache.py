@@ -0,0 +1,154 @@
+"""In-process caching of search queries for fabric-to-espanso.
+
+Results are kept in a least recently used cache with a time to live.
+Concurrent calls for the same key share one computation ("single-flight"),
+so a burst of identical queries from the UIs results in one search.
+Both threads and asyncio tasks can share the cache.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger('fabric_to_espanso')
+
+class QueryCache:
+    """Thread safe LRU cache with a time to live and request coalescing."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        """Create a cache.
+
+        Args:
+            max_entries: Maximum number of cached values, 0 disables caching but keeps coalescing
+            ttl: Seconds a cached value stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._in_flight_async: Dict[Hashable, asyncio.Task] = {}
+        # Incremented on invalidation, results computed before that are not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value of key, or compute it.
+
+        When another thread is already computing the same key, wait for its
+        result instead of computing it again.
+
+        Args:
+            key: Cache key
+            compute: Function that computes the value when it is not cached
+
+        Returns:
+            The cached or computed value
+
+        Raises:
+            Any exception raised by compute, also in the threads that waited for it
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                generation = self._generation
+
+        if not owner:
+            logger.debug(f"Waiting for in-flight query: {key}")
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._store(key, value, generation)
+        future.set_result(value)
+        return value
+
+    async def get_or_compute_async(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value of key, or await compute for it.
+
+        The asyncio version of get_or_compute. Tasks waiting for the same key
+        share one computation, which keeps running when a waiting task is cancelled.
+
+        Args:
+            key: Cache key
+            compute: Coroutine function that computes the value when it is not cached
+
+        Returns:
+            The cached or computed value
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            task = self._in_flight_async.get(key)
+            if task is None:
+                task = asyncio.ensure_future(compute())
+                self._in_flight_async[key] = task
+                task.add_done_callback(self._async_done_callback(key, self._generation))
+            else:
+                logger.debug(f"Waiting for in-flight query: {key}")
+        return await asyncio.shield(task)
+
+    def _async_done_callback(self, key: Hashable, generation: int) -> Callable[[asyncio.Task], None]:
+        def done(task: asyncio.Task) -> None:
+            with self._lock:
+                self._in_flight_async.pop(key, None)
+                if not task.cancelled() and task.exception() is None:
+                    self._store(key, task.result(), generation)
+        return done
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Find a valid cached value, the lock must be held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any, generation: int) -> None:
+        """Cache a computed value, unless the cache was invalidated meanwhile. The lock must be held."""
+        if generation != self._generation or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, collection_name: Optional[str] = None) -> None:
+        """Remove cached values.
+
+        Args:
+            collection_name: Only remove values whose key starts with this collection name.
+                If None, removes everything
+        """
+        with self._lock:
+            self._generation += 1
+            if collection_name is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if isinstance(key, tuple) and key[0] == collection_name]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Remove all cached values."""
+        self.invalidate()
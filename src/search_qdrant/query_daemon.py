@@ -0,0 +1,272 @@
+"""Local query daemon for fabric-to-espanso.
+
+A command line lookup has to connect to the database and load the embedding
+model before it can answer, which takes seconds. The daemon does that once
+and answers searches over loopback HTTP, so a lookup only costs a local
+request. The client side only uses the standard library, it doesn't import
+the database client or the models.
+
+Usage:
+    python -m src.search_qdrant.query_daemon serve
+    python -m src.search_qdrant.query_daemon query "summarize a paper" [-n 5] [--format json]
+
+Endpoints:
+    GET /health                      Status of the daemon
+    GET /query?q=<text>&n=<number>   Search results as JSON, optionally &collection=<name>
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlparse, urlsplit
+import argparse
+import contextlib
+import ipaddress
+import json
+import logging
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+from src.fabrics_processor.config import config
+from src.fabrics_processor.exceptions import QueryDaemonError
+
+logger = logging.getLogger('fabric_to_espanso')
+
+def result_to_dict(result: Any) -> Dict[str, Any]:
+    """Convert a QueryResponse to the JSON object the daemon returns."""
+    return {
+        'id': str(result.id),
+        'score': result.score,
+        'filename': result.metadata.get('filename'),
+        'trigger': result.metadata.get('trigger'),
+        'content': result.metadata.get('content'),
+    }
+
+def format_results(results: List[Dict[str, Any]], output_format: str = 'text') -> str:
+    """Format search results for the command line.
+
+    Args:
+        results: Results as returned by query_daemon
+        output_format: 'text' gives one filename per line, 'list' the filenames as a
+            Python list, 'json' the full results
+
+    Returns:
+        The formatted results
+    """
+    if output_format == 'json':
+        return json.dumps(results, ensure_ascii=False, indent=2)
+    if output_format == 'list':
+        return str([result['filename'] for result in results])
+    return '\n'.join(result['filename'] for result in results)
+
+# Host names a request to the daemon can use, besides the address it listens on
+ALLOWED_HOSTS = {'127.0.0.1', 'localhost', '::1'}
+
+class QueryDaemonHandler(BaseHTTPRequestHandler):
+    """Answers the search requests of the query daemon."""
+
+    server: 'QueryDaemon'
+
+    def do_GET(self) -> None:
+        # A web page can point its own host name at 127.0.0.1 (DNS rebinding) and read
+        # the answers, the Host header it sends still has that host name
+        if not self.server.is_allowed_host(self.headers.get('Host', '')):
+            self._send_json(403, {'error': "Host not allowed"})
+            return
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._send_json(200, {'status': 'ok', 'collection': self.server.collection_name})
+            return
+        if url.path != '/query':
+            self._send_json(404, {'error': f"Unknown path: {url.path}"})
+            return
+
+        params = parse_qs(url.query)
+        query = params.get('q', [''])[0]
+        if not query:
+            self._send_json(400, {'error': "Missing query parameter q"})
+            return
+        try:
+            num_results = int(params.get('n', ['5'])[0])
+        except ValueError:
+            self._send_json(400, {'error': "Parameter n must be a number"})
+            return
+        collection_name = params.get('collection', [self.server.collection_name])[0]
+
+        try:
+            results = self.server.search(query, num_results, collection_name)
+        except Exception as e:
+            logger.error(f"Query daemon search failed: {str(e)}", exc_info=True)
+            self._send_json(500, {'error': str(e)})
+            return
+        self._send_json(200, {'results': results})
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"Query daemon: {format % args}")
+
+class QueryDaemon(ThreadingHTTPServer):
+    """HTTP server that searches with one warm database client and embedding model."""
+
+    daemon_threads = True
+
+    def __init__(self, client: Any, host: str, port: int, collection_name: str):
+        """Create the server, it starts answering with serve_forever.
+
+        Args:
+            client: Initialized QdrantClient, shared by all requests
+            host: Address to listen on
+            port: Port to listen on, 0 picks a free port
+            collection_name: Collection searched when a request doesn't name one
+        """
+        super().__init__((host, port), QueryDaemonHandler)
+        self.client = client
+        self.collection_name = collection_name
+        from src.fabrics_processor.vector_store import get_vector_store_backend
+        # An in-process database can't be searched by several threads at the same time
+        self._search_lock = threading.Lock() if get_vector_store_backend().in_process else contextlib.nullcontext()
+
+    def is_allowed_host(self, host_header: str) -> bool:
+        """Whether a request with this Host header is addressed to the daemon itself.
+
+        Allowed are the loopback names and the address the daemon listens on, with its port.
+        """
+        try:
+            host = urlsplit(f"//{host_header}")
+            port = host.port
+        except ValueError:
+            return False
+        return host.hostname in ALLOWED_HOSTS | {self.server_address[0]} and port == self.server_port
+
+    def search(self, query: str, num_results: int, collection_name: str) -> List[Dict[str, Any]]:
+        from src.search_qdrant.database_query import query_qdrant_database
+        with self._search_lock:
+            results = query_qdrant_database(query=query, client=self.client, num_results=num_results, collection_name=collection_name)
+        return [result_to_dict(result) for result in results]
+
+    def warm_up(self) -> None:
+        """Load the embedding models and sync the local replica before the first request."""
+        from src.search_qdrant.database_query import query_qdrant_database
+        query_qdrant_database(query="warm up", client=self.client, num_results=1, collection_name=self.collection_name, use_cache=False)
+
+def _is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def serve(host: Optional[str] = None, port: Optional[int] = None, collection_name: Optional[str] = None) -> None:
+    """Run the query daemon until it is interrupted.
+
+    Args:
+        host: Address to listen on. If None, uses configuration
+        port: Port to listen on. If None, uses configuration
+        collection_name: Collection searched by default. If None, uses configuration
+    """
+    from src.fabrics_processor.database import get_shared_client, close_shared_client
+
+    host = host or config.query.daemon_host
+    port = port if port is not None else config.query.daemon_port
+    collection_name = collection_name or config.embedding.collection_name
+    if not _is_loopback(host):
+        logger.warning(f"The query daemon listens on {host}, which is not a loopback address. It has no authentication")
+
+    client = get_shared_client()
+    try:
+        server = QueryDaemon(client, host, port, collection_name)
+        server.warm_up()
+        logger.info(f"Query daemon listening on http://{host}:{server.server_port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Query daemon stopped")
+        finally:
+            server.server_close()
+    finally:
+        close_shared_client()
+
+def query_daemon(
+    query: str,
+    num_results: int = 5,
+    collection_name: Optional[str] = None,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """Search through a running query daemon.
+
+    Args:
+        query: The search query text
+        num_results: Maximum number of results to return
+        collection_name: Name of the collection to query. If None, the daemon's default
+        host: Address of the daemon. If None, uses configuration
+        port: Port of the daemon. If None, uses configuration
+        timeout: Seconds to wait for the answer. If None, uses configuration
+
+    Returns:
+        The results, best match first, with id, score, filename, trigger and content
+
+    Raises:
+        QueryDaemonError: If the daemon isn't running or the search failed
+    """
+    params = {'q': query, 'n': num_results}
+    if collection_name:
+        params['collection'] = collection_name
+    url = (
+        f"http://{host or config.query.daemon_host}:{port if port is not None else config.query.daemon_port}"
+        f"/query?{urlencode(params)}"
+    )
+    try:
+        with urllib.request.urlopen(url, timeout=timeout or config.query.daemon_timeout) as response:
+            return json.loads(response.read().decode('utf-8'))['results']
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read().decode('utf-8')).get('error', str(e))
+        except ValueError:
+            message = str(e)
+        raise QueryDaemonError(f"Query daemon search failed: {message}") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise QueryDaemonError(f"Query daemon not reachable at {url.split('/query')[0]}: {e}") from e
+
+def main():
+    parser = argparse.ArgumentParser(description="Local query daemon for fast searches of the Qdrant database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the daemon")
+    serve_parser.add_argument("--host", type=str, default=config.query.daemon_host, help="Address to listen on")
+    serve_parser.add_argument("--port", type=int, default=config.query.daemon_port, help="Port to listen on")
+    serve_parser.add_argument("--collection_name", "-c", type=str, default=config.embedding.collection_name, help="The collection to query by default")
+
+    query_parser = subparsers.add_parser("query", help="Search through the running daemon")
+    query_parser.add_argument("query", type=str, help="The search query text")
+    query_parser.add_argument("--num_results", "-n", type=int, default=5, help="The number of results to return (default: 5)")
+    query_parser.add_argument("--collection_name", "-c", type=str, default=None, help="The name of the collection to query")
+    query_parser.add_argument("--format", choices=["text", "list", "json"], default="text", help="Print the filenames one per line (text) or as a list (list), or the full results (json)")
+    query_parser.add_argument("--host", type=str, default=config.query.daemon_host, help="Address of the daemon")
+    query_parser.add_argument("--port", type=int, default=config.query.daemon_port, help="Port of the daemon")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        from src.fabrics_processor.logger import setup_logger
+        setup_logger()
+        serve(args.host, args.port, args.collection_name)
+        return
+
+    try:
+        results = query_daemon(args.query, args.num_results, args.collection_name, host=args.host, port=args.port)
+    except QueryDaemonError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+    print(format_results(results, args.format))
+
+if __name__ == "__main__":
+    main()
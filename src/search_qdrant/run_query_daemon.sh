@@ -0,0 +1,7 @@
+#!/bin/bash
+
+# Add the project root to PYTHONPATH
+export PYTHONPATH="/home/jelle/Tools/pythagora-core/workspace/fabric-to-espanso:$PYTHONPATH"
+
+# Start the query daemon, run_query.sh uses it when it is running
+python -m src.search_qdrant.query_daemon serve "$@"
@@ -1,14 +1,13 @@
 import streamlit as st
 import pyperclip
 from pathlib import Path
-from src.fabrics_processor.database import initialize_qdrant_database
+from src.fabrics_processor.database import get_shared_client, notify_collection_changed
 from src.fabrics_processor.database_updater import update_qdrant_database
 from src.fabrics_processor.file_change_detector import detect_file_changes
 from src.search_qdrant.database_query import query_qdrant_database
 from src.fabrics_processor.obsidian2fabric import sync_folders
 from src.fabrics_processor.logger import setup_logger
 import logging
-import atexit
 from src.fabrics_processor.config import config
 
 # Configure logging
@@ -17,10 +16,9 @@ logger = setup_logger()
 def init_session_state():
     """Initialize session state variables."""
     if 'client' not in st.session_state:
-        client = initialize_qdrant_database(api_key=st.secrets["api_key"])
-        st.session_state.client = client
-        # Register cleanup function
-        atexit.register(lambda: client.close() if hasattr(client, '_transport') else None)
+        # All sessions share the client of the process, and so its connections.
+        # It is closed when the process exits
+        st.session_state.client = get_shared_client(api_key=st.secrets["api_key"])
     if 'selected_prompts' not in st.session_state:
         st.session_state.selected_prompts = []
     if 'comparing' not in st.session_state:
@@ -65,6 +63,7 @@ def show_comparison_view(prompts):
                             payload={"trigger": new_trigger},
                             points=[prompt.id]
                         )
+                        notify_collection_changed(config.embedding.collection_name)
                         st.success(f"Updated trigger to: {new_trigger}")
                     except Exception as e:
                         st.error(f"Failed to update trigger: {str(e)}")
@@ -218,9 +217,9 @@ def main():
         page = st.radio("Select Option:", ["Search for prompts", "Update database and prompt files"])
         
         if st.button("Quit"):
-            if hasattr(st.session_state.client, '_transport'):
-                st.session_state.client.close()
-            st.success("Database connection closed.")
+            # Other sessions still use the shared client, it is closed when the process exits
+            del st.session_state.client
+            st.success("Session closed.")
             st.stop()
     
     # Main content
@@ -1,10 +1,8 @@
 import streamlit as st
 import pyperclip
-from src.fabrics_processor.database import initialize_qdrant_database
 from src.search_qdrant.database_query import query_qdrant_database
 from src.fabrics_processor.logger import setup_logger
 import logging
-import atexit
 from src.fabrics_processor.config import config
 import time
 
@@ -14,10 +12,10 @@ logger = setup_logger()
 def init_session_state():
     """Initialize session state variables."""
     if 'client' not in st.session_state:
-        client = initialize_qdrant_database(api_key=st.secrets["api_key"])
-        st.session_state.client = client
-        # Register cleanup function
-        atexit.register(lambda: client.close() if hasattr(client, '_transport') else None)
+        from src.fabrics_processor.database import get_shared_client
+        # All sessions share the client of the process, and so its connections.
+        # It is closed when the process exits
+        st.session_state.client = get_shared_client(api_key=st.secrets["api_key"])
     if 'selected_prompts' not in st.session_state:
         st.session_state.selected_prompts = []
     if 'comparing' not in st.session_state:
@@ -0,0 +1,49 @@
+"""Tests for writing output files atomically and only when they change."""
+import os
+
+import pytest
+
+from src.fabrics_processor.atomic_file import AtomicFileWriter, write_file_atomic
+
+def leftovers(folder):
+    return [path.name for path in folder.iterdir() if path.name.endswith('.tmp')]
+
+def test_new_file_is_written_with_the_usual_permissions(tmp_path):
+    path = tmp_path / 'matches.yml'
+    assert write_file_atomic(path, 'matches: []\n')
+    assert path.read_text(encoding='utf-8') == 'matches: []\n'
+    assert path.stat().st_mode & 0o777 == 0o644
+    assert leftovers(tmp_path) == []
+
+def test_unchanged_file_is_not_touched(tmp_path):
+    path = tmp_path / 'matches.yml'
+    write_file_atomic(path, 'matches: []\n')
+    before = os.stat(path)
+    with AtomicFileWriter(path) as writer:
+        writer.write('matches: ')
+        writer.write('[]\n')
+    assert not writer.changed
+    after = os.stat(path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert leftovers(tmp_path) == []
+
+def test_changed_file_is_replaced_and_keeps_its_permissions(tmp_path):
+    path = tmp_path / 'matches.yml'
+    write_file_atomic(path, 'matches: []\n')
+    os.chmod(path, 0o600)
+    assert write_file_atomic(path, 'matches:\n  - trigger: ";;fab"\n')
+    assert path.read_text(encoding='utf-8') == 'matches:\n  - trigger: ";;fab"\n'
+    assert path.stat().st_mode & 0o777 == 0o600
+    # only_if_changed=False replaces the file without comparing
+    assert write_file_atomic(path, 'matches:\n  - trigger: ";;fab"\n', only_if_changed=False)
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / 'matches.yml'
+    write_file_atomic(path, 'matches: []\n')
+    with pytest.raises(RuntimeError):
+        with AtomicFileWriter(path) as writer:
+            writer.write('matches:\n')
+            raise RuntimeError("database went away")
+    assert not writer.changed
+    assert path.read_text(encoding='utf-8') == 'matches: []\n'
+    assert leftovers(tmp_path) == []
@@ -0,0 +1,96 @@
+"""Tests for writing points in batches."""
+import threading
+
+import grpc
+import httpx
+import pytest
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.http.models import PointStruct
+
+from src.fabrics_processor.batch_upserter import BatchUpserter, is_request_too_large
+from src.fabrics_processor.exceptions import DatabaseError
+
+def make_points(count, content='x'):
+    return [PointStruct(id=index, vector=[0.1, 0.2], payload={'filename': f"pattern_{index}", 'content': content})
+            for index in range(count)]
+
+class ResourceExhausted(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.RESOURCE_EXHAUSTED
+
+class RecordingClient:
+    """Records the upsert requests, and fails the ones the error function returns an error for."""
+
+    def __init__(self, error=lambda points: None):
+        self.error = error
+        self.requests = []
+        self.written = []
+        self.lock = threading.Lock()
+
+    def upsert(self, collection_name, points):
+        with self.lock:
+            self.requests.append([point.id for point in points])
+        error = self.error(points)
+        if error is not None:
+            raise error
+        with self.lock:
+            self.written.extend(point.id for point in points)
+
+def test_batches_are_bounded_by_points_and_bytes():
+    client = RecordingClient()
+    with BatchUpserter(client, 'patterns', max_points=3, max_bytes=10**6, max_workers=1) as upserter:
+        for point in make_points(7):
+            upserter.add(point)
+    # With one worker the batches are sent in the order the points were added
+    assert client.requests == [[0, 1, 2], [3, 4, 5], [6]]
+    assert upserter.points_written == 7
+
+    client = RecordingClient()
+    with BatchUpserter(client, 'patterns', max_points=100, max_bytes=1200, max_workers=1) as upserter:
+        for point in make_points(4, content='x' * 400):
+            upserter.add(point)
+    assert client.requests == [[0, 1], [2, 3]]
+
+@pytest.mark.parametrize('too_large', [
+    UnexpectedResponse(413, 'Payload Too Large', b'', httpx.Headers()),
+    UnexpectedResponse(400, 'Bad Request', b'{"status":{"error":"Payload error: JSON payload is larger than allowed"}}', httpx.Headers()),
+    ResourceExhausted(),
+])
+def test_too_large_batches_are_split_until_they_fit(too_large):
+    client = RecordingClient(lambda points: too_large if len(points) > 2 else None)
+    upserter = BatchUpserter(client, 'patterns', max_points=8, max_bytes=10**6, max_workers=1)
+    for point in make_points(8):
+        upserter.add(point)
+    assert upserter.barrier() == 8
+    assert sorted(client.written) == list(range(8))
+    assert client.requests[:3] == [list(range(8)), [0, 1, 2, 3], [0, 1]]
+
+def test_single_points_that_are_too_large_are_reported():
+    too_large = UnexpectedResponse(413, 'Payload Too Large', b'', httpx.Headers())
+    client = RecordingClient(lambda points: too_large if 3 in [point.id for point in points] else None)
+    upserter = BatchUpserter(client, 'patterns', max_points=4, max_bytes=10**6, max_workers=1)
+    for point in make_points(4):
+        upserter.add(point)
+    with pytest.raises(DatabaseError, match='pattern_3'):
+        upserter.barrier()
+    assert sorted(client.written) == [0, 1, 2]
+
+@pytest.mark.parametrize('error', [
+    ResponseHandlingException(httpx.ConnectError('Connection refused')),
+    ResponseHandlingException(httpx.ReadTimeout('timed out')),
+    ConnectionRefusedError(),
+])
+def test_connection_errors_are_not_retried(error):
+    client = RecordingClient(lambda points: error)
+    upserter = BatchUpserter(client, 'patterns', max_points=8, max_bytes=10**6, max_workers=1)
+    for point in make_points(24):
+        upserter.add(point)
+    with pytest.raises(DatabaseError):
+        upserter.barrier()
+    # One request for the first batch, not 2N-1 requests per batch
+    assert client.requests == [list(range(8))]
+
+def test_is_request_too_large():
+    assert not is_request_too_large(UnexpectedResponse(400, 'Bad Request', b'{"status":{"error":"Wrong input"}}', httpx.Headers()))
+    assert not is_request_too_large(UnexpectedResponse(500, 'Internal Server Error', b'', httpx.Headers()))
+    assert not is_request_too_large(TimeoutError())
@@ -0,0 +1,73 @@
+"""Tests for the database client shared by the sessions of a process."""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+from qdrant_client import QdrantClient
+
+from src.fabrics_processor.config import config
+import src.fabrics_processor.database as database
+
+@pytest.fixture
+def shared_client(monkeypatch):
+    """Let get_shared_client create an in-memory client, the model is not needed."""
+    monkeypatch.setattr(config.database, 'backend', 'memory')
+    created = []
+    def initialize(api_key=None):
+        client = QdrantClient(":memory:")
+        client.create_collection('patterns', vectors_config={})
+        created.append(client)
+        return client
+    monkeypatch.setattr(database, 'initialize_qdrant_database', initialize)
+    database.close_shared_client()
+    yield created
+    database.close_shared_client()
+
+def test_quit_of_one_session_keeps_the_client_of_others(shared_client):
+    session_a = {'client': database.get_shared_client()}
+    session_b = {'client': database.get_shared_client()}
+    # What the Quit button of the streamlit app does
+    del session_a['client']
+    assert session_b['client'].collection_exists('patterns')
+    assert database.get_shared_client().collection_exists('patterns')
+    assert len(shared_client) == 1
+
+class RecordingClient:
+    """Records how many threads are in a call at the same time."""
+
+    def __init__(self):
+        self.active = 0
+        self.most_active = 0
+        self.counter = threading.Lock()
+
+    def query_points(self, collection_name):
+        with self.counter:
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+        time.sleep(0.01)
+        with self.counter:
+            self.active -= 1
+        return collection_name
+
+    def close(self):
+        pass
+
+@pytest.mark.parametrize('backend, serialized', [('memory', True), ('local', True), ('remote', False)])
+def test_in_process_clients_are_called_one_thread_at_a_time(monkeypatch, backend, serialized):
+    recording = RecordingClient()
+    monkeypatch.setattr(config.database, 'backend', backend)
+    monkeypatch.setattr(database, 'initialize_qdrant_database', lambda api_key=None: recording)
+    database.close_shared_client()
+    try:
+        client = database.get_shared_client()
+        # Like the sessions of the streamlit app, each in its own thread
+        barrier = threading.Barrier(8)
+        def search(index):
+            barrier.wait()
+            return client.query_points(collection_name=f"patterns_{index}")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            assert list(pool.map(search, range(8))) == [f"patterns_{index}" for index in range(8)]
+        assert (recording.most_active == 1) == serialized
+    finally:
+        database.close_shared_client()
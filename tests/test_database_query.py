@@ -0,0 +1,54 @@
+"""Tests for the cached searches on the local replica."""
+import uuid
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from src.fabrics_processor.config import config
+from src.fabrics_processor.events import notify_collection_changed
+import src.search_qdrant.database_query as database_query
+
+VECTOR_SIZE = config.embedding.vector_size
+
+@pytest.fixture
+def collection(tmp_path, monkeypatch):
+    """An in-memory collection with two patterns, searched through the local replica."""
+    monkeypatch.setattr(config.query, 'replica_path', str(tmp_path))
+    # Every query gets the same vector, the model is not needed to test the caching
+    monkeypatch.setattr(database_query, 'embed_query', lambda query, client: [1.0] * VECTOR_SIZE)
+    client = QdrantClient(":memory:")
+    collection_name = f"test_{uuid.uuid4().hex[:8]}"
+    vector_name = client.get_vector_field_name()
+    client.create_collection(collection_name, vectors_config={vector_name: VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)})
+    client.upsert(collection_name, [
+        PointStruct(id=index, vector={vector_name: [1.0 - index * 0.1] + [1.0] * (VECTOR_SIZE - 1)},
+                    payload={'filename': f"pattern_{index}", 'content': 'x', 'trigger': ';;fab', 'date': '2024-01-01'})
+        for index in range(2)
+    ])
+    database_query.clear_query_cache()
+    yield client, collection_name
+    client.close()
+
+def triggers(client, collection_name):
+    results = database_query.query_qdrant_database('find a pattern', client, num_results=2, collection_name=collection_name)
+    return {result.metadata['filename']: result.metadata['trigger'] for result in results}
+
+def test_edit_is_visible_after_notification(collection):
+    client, collection_name = collection
+    assert triggers(client, collection_name)['pattern_0'] == ';;fab'
+
+    client.set_payload(collection_name, payload={'trigger': ';;new'}, points=[0])
+    notify_collection_changed(collection_name)
+
+    assert triggers(client, collection_name)['pattern_0'] == ';;new'
+
+def test_replica_sync_drops_cached_results(collection):
+    client, collection_name = collection
+    assert triggers(client, collection_name)['pattern_1'] == ';;fab'
+
+    # A change by another process, picked up by the periodic sync of the replica
+    client.set_payload(collection_name, payload={'trigger': ';;other'}, points=[1])
+    database_query._get_local_replica(collection_name).sync(client)
+
+    assert triggers(client, collection_name)['pattern_1'] == ';;other'
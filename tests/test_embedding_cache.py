@@ -0,0 +1,57 @@
+"""Tests for the persistent embedding cache."""
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import src.fabrics_processor.embedding as embedding
+import src.fabrics_processor.embedding_cache as embedding_cache
+from src.fabrics_processor.config import config
+from src.fabrics_processor.embedding_cache import EmbeddingCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Every call of time.time in the cache is one second later."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(embedding_cache, 'time', SimpleNamespace(time=lambda: float(next(ticks))))
+
+def test_vectors_are_found_by_model_and_normalized_text(tmp_path):
+    with EmbeddingCache(tmp_path / 'cache.sqlite3', max_entries=10) as cache:
+        cache.put_many('model-a', ['Summarize  a\ntext'], [[0.5, 0.25]])
+        assert cache.get_many('model-a', ['Summarize a text', 'Other text']) == [[0.5, 0.25], None]
+        assert cache.get_many('model-b', ['Summarize a text']) == [None]
+    with EmbeddingCache(tmp_path / 'cache.sqlite3', max_entries=10) as cache:
+        assert cache.get_many('model-a', ['Summarize a text']) == [[0.5, 0.25]]
+
+def test_least_recently_used_vectors_are_evicted(tmp_path, clock):
+    with EmbeddingCache(tmp_path / 'cache.sqlite3', max_entries=2) as cache:
+        cache.put_many('model', ['a'], [[1.0]])
+        cache.put_many('model', ['b'], [[2.0]])
+        # Using a makes b the least recently used vector
+        assert cache.get_many('model', ['a']) == [[1.0]]
+        cache.put_many('model', ['c'], [[3.0]])
+        assert cache.get_many('model', ['a', 'b', 'c']) == [[1.0], None, [3.0]]
+
+class FakeModel:
+    """Stands in for the embedding model, records the texts it embeds."""
+
+    def __init__(self):
+        self.texts = []
+
+    def embed(self, texts, batch_size=None, parallel=None):
+        self.texts.extend(texts)
+        for text in texts:
+            yield np.array([float(len(text)), 1.0])
+
+def test_only_texts_missing_from_the_cache_are_embedded(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.embedding, 'cache_path', str(tmp_path / 'cache.sqlite3'))
+    model = FakeModel()
+    assert embedding.embed_texts(['one', 'three'], model) == [[3.0, 1.0], [5.0, 1.0]]
+    assert embedding.embed_texts(['three', 'seven'], model) == [[5.0, 1.0], [5.0, 1.0]]
+    assert model.texts == ['one', 'three', 'seven']
+
+    def load_model():
+        raise AssertionError("the model is not needed when all texts are cached")
+    monkeypatch.setattr(embedding, 'create_embedding_model', load_model)
+    assert embedding.embed_texts(['seven', 'one']) == [[5.0, 1.0], [3.0, 1.0]]
@@ -0,0 +1,15 @@
+"""Tests for the markdown section extractor."""
+from src.fabrics_processor.markdown_parser import create_section_pattern, extract_sections
+
+KEYWORDS = {'IDENTITY', 'PURPOSE', 'STEPS', 'TASK', 'GOAL'}
+
+def test_sections_match_the_section_regex():
+    document = "Intro\n# IDENTITY and PURPOSE\n\nYou are\n## Sub\n\ntext\n# OTHER\n\nx\n# STEPS\n- a\n"
+    assert extract_sections(document, KEYWORDS) == create_section_pattern(KEYWORDS).findall(document)
+
+def test_heading_must_be_on_one_line():
+    # The section regex let '#\s+' run over the newline, so this started a section.
+    # The extractor deliberately only accepts headings on one line
+    document = "#\nPurpose of the text\n\nBody\n"
+    assert create_section_pattern(KEYWORDS).findall(document) == [document]
+    assert extract_sections(document, KEYWORDS) == []
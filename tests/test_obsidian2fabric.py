@@ -0,0 +1,60 @@
+"""Tests for syncing own prompts from Obsidian to the fabric patterns folder."""
+import os
+
+import pytest
+
+import src.fabrics_processor.obsidian2fabric as obsidian2fabric
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    """A vault with two prompts and a fabric patterns folder with one official pattern."""
+    vault = tmp_path / 'vault'
+    (vault / 'Writing').mkdir(parents=True)
+    (vault / 'Writing' / 'Improve Essay.md').write_text('# IDENTITY\nImprove an essay\n', encoding='utf-8')
+    (vault / 'Writing' / 'Fix Title.md').write_text('# IDENTITY\nFix a title\n', encoding='utf-8')
+    patterns = tmp_path / 'patterns'
+    (patterns / 'summarize').mkdir(parents=True)
+    (patterns / 'summarize' / 'system.md').write_text('# IDENTITY\nSummarize\n', encoding='utf-8')
+
+    hashed = []
+    hash_file = obsidian2fabric.hash_file
+    def record(path):
+        hashed.append(path.name)
+        return hash_file(path)
+    monkeypatch.setattr(obsidian2fabric, 'hash_file', record)
+
+    def sync():
+        hashed.clear()
+        return obsidian2fabric.sync_folders(vault, patterns, manifest_path=str(tmp_path / 'sync.sqlite3'), workers=2)
+    return vault, patterns, sync, hashed
+
+def test_new_prompts_are_copied(folders):
+    vault, patterns, sync, _ = folders
+    assert sync() == {'improve_essay-writing', 'fix_title-writing'}
+    assert (patterns / 'improve_essay-writing' / 'system.md').read_text(encoding='utf-8') == '# IDENTITY\nImprove an essay\n'
+    assert (patterns / 'improve_essay-writing' / 'user.md').exists()
+
+def test_unchanged_vault_reads_no_files(folders):
+    _, _, sync, hashed = folders
+    sync()
+    assert sync() == set()
+    assert hashed == []
+
+def test_edit_with_the_same_size_is_synced(folders):
+    vault, patterns, sync, hashed = folders
+    sync()
+    prompt = vault / 'Writing' / 'Fix Title.md'
+    prompt.write_text('# IDENTITY\nFix a tidle\n', encoding='utf-8')
+    stat = prompt.stat()
+    os.utime(prompt, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert sync() == {'fix_title-writing'}
+    assert hashed == ['Fix Title.md']
+    assert (patterns / 'fix_title-writing' / 'system.md').read_text(encoding='utf-8') == '# IDENTITY\nFix a tidle\n'
+    assert sync() == set()
+
+def test_removed_prompts_are_deleted_but_official_patterns_kept(folders):
+    vault, patterns, sync, _ = folders
+    sync()
+    (vault / 'Writing' / 'Fix Title.md').unlink()
+    assert sync() == {'fix_title-writing'}
+    assert sorted(path.name for path in patterns.iterdir()) == ['improve_essay-writing', 'summarize']
@@ -0,0 +1,65 @@
+"""Tests for the espanso match files."""
+import yaml
+
+from src.fabrics_processor.config import config
+from src.fabrics_processor.output_files_generator import YAML_MANIFEST_NAME, get_yaml_shard, write_yaml_file
+
+def make_payload(filename):
+    return {'filename': filename, 'content': f"Prompt of {filename}", 'trigger': ';;fab'}
+
+def match_files(folder):
+    return sorted(path.name for path in folder.glob('*.yml'))
+
+def test_shards():
+    assert get_yaml_shard('summarize', 'prefix') == 's'
+    assert get_yaml_shard('_draft', 'prefix') == 'other'
+    assert get_yaml_shard('journal-prompts', 'source') == 'own'
+    assert get_yaml_shard('summarize', 'source') == 'official'
+    assert get_yaml_shard('summarize', None) is None
+
+def test_prefix_shards_hold_all_matches(tmp_path):
+    write_yaml_file([make_payload(name) for name in ['summarize', 'analyze_paper', 'agility_story', '3d_model']], str(tmp_path), 'prefix')
+    assert match_files(tmp_path) == ['fabric_patterns_3.yml', 'fabric_patterns_a.yml', 'fabric_patterns_s.yml']
+    matches = yaml.safe_load((tmp_path / 'fabric_patterns_a.yml').read_text(encoding='utf-8'))['matches']
+    assert [match['replace'].split('\n')[0] for match in matches] == ['Prompt of agility_story', 'Prompt of analyze_paper']
+
+def test_switching_layout_removes_only_written_files(tmp_path):
+    # Match files of the user, with names like the shards
+    (tmp_path / 'fabric_patterns_mine.yml').write_text('matches: []\n', encoding='utf-8')
+    (tmp_path / 'base.yml').write_text('matches: []\n', encoding='utf-8')
+    payloads = [make_payload('summarize'), make_payload('journal-prompts')]
+
+    write_yaml_file(payloads, str(tmp_path), 'prefix')
+    assert match_files(tmp_path) == ['base.yml', 'fabric_patterns_j.yml', 'fabric_patterns_mine.yml', 'fabric_patterns_s.yml']
+
+    write_yaml_file(payloads, str(tmp_path), 'source')
+    assert match_files(tmp_path) == ['base.yml', 'fabric_patterns_mine.yml', 'fabric_patterns_official.yml', 'fabric_patterns_own.yml']
+
+    # A shard that became empty is removed
+    write_yaml_file(payloads[:1], str(tmp_path), 'source')
+    assert match_files(tmp_path) == ['base.yml', 'fabric_patterns_mine.yml', 'fabric_patterns_official.yml']
+
+def test_unsharded_file_replaces_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'yaml_sharding', None)
+    write_yaml_file([make_payload('summarize')], str(tmp_path), 'prefix')
+    write_yaml_file([make_payload('summarize')], str(tmp_path))
+    assert match_files(tmp_path) == ['fabric_patterns.yml']
+    assert (tmp_path / YAML_MANIFEST_NAME).exists()
+
+def test_unreadable_manifest_removes_nothing_else(tmp_path):
+    (tmp_path / 'fabric_patterns_mine.yml').write_text('matches: []\n', encoding='utf-8')
+    (tmp_path / YAML_MANIFEST_NAME).write_text('["../fabric_patterns_mine.yml", 3', encoding='utf-8')
+    write_yaml_file([make_payload('summarize')], str(tmp_path), 'prefix')
+    assert match_files(tmp_path) == ['fabric_patterns_mine.yml', 'fabric_patterns_s.yml']
+
+def test_same_matches_leave_the_file_alone(tmp_path):
+    payloads = [make_payload('summarize'), make_payload('analyze_paper')]
+    write_yaml_file(payloads, str(tmp_path), None)
+    path = tmp_path / 'fabric_patterns.yml'
+    before = path.stat()
+    # Another order of the same database content gives the same file
+    write_yaml_file(payloads[::-1], str(tmp_path), None)
+    after = path.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    matches = yaml.safe_load(path.read_text(encoding='utf-8'))['matches']
+    assert [match['replace'].split('\n')[0] for match in matches] == ['Prompt of analyze_paper', 'Prompt of summarize']
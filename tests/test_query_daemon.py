@@ -0,0 +1,52 @@
+"""Tests for the query daemon and its command line clients."""
+import http.client
+import sys
+import threading
+
+import pytest
+
+import src.search_qdrant.database_query as database_query
+import src.search_qdrant.query_daemon as query_daemon
+
+RESULTS = [
+    {'id': '1', 'score': 0.9, 'filename': 'summarize', 'trigger': ';;sum', 'content': 'x'},
+    {'id': '2', 'score': 0.8, 'filename': 'extract_wisdom', 'trigger': ';;ext', 'content': 'y'},
+]
+
+def test_run_query_prints_a_list_of_filenames(monkeypatch, capsys):
+    # run_query.sh consumers parse the Python list that database_query always printed
+    monkeypatch.setattr(query_daemon, 'query_daemon', lambda *args, **kwargs: RESULTS)
+    monkeypatch.setattr(sys, 'argv', ['database_query.py', 'summarize a paper'])
+    database_query.main()
+    assert capsys.readouterr().out == "['summarize', 'extract_wisdom']\n"
+
+@pytest.fixture
+def daemon():
+    """A daemon on a free loopback port, answering every search with RESULTS."""
+    server = query_daemon.QueryDaemon(client=None, host='127.0.0.1', port=0, collection_name='patterns')
+    server.search = lambda query, num_results, collection_name: RESULTS
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get_status(server, host_header):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=5)
+    try:
+        connection.request('GET', '/query?q=summarize', headers={'Host': host_header})
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+def test_query_through_loopback_names(daemon):
+    port = daemon.server_port
+    for host in [f"127.0.0.1:{port}", f"localhost:{port}", f"[::1]:{port}"]:
+        assert get_status(daemon, host) == 200
+    assert query_daemon.query_daemon('summarize', port=port) == RESULTS
+
+def test_other_host_names_are_rejected(daemon):
+    # What a page served by evil.example sends after pointing evil.example at 127.0.0.1
+    port = daemon.server_port
+    for host in [f"evil.example:{port}", "127.0.0.1", "127.0.0.1:1", "", "[::1"]:
+        assert get_status(daemon, host) == 403
@@ -0,0 +1,66 @@
+"""Tests for skipping unchanged pattern files with the scan manifest."""
+import os
+
+import src.fabrics_processor.file_processor as file_processor
+from src.fabrics_processor.scan_manifest import ScanManifest
+
+PATTERN = "# IDENTITY and PURPOSE\n\nYou summarize {name}.\n\n# STEPS\n\n- Read the input\n"
+
+def write_pattern(root, name):
+    folder = root / name
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / 'system.md'
+    path.write_text(PATTERN.format(name=name), encoding='utf-8')
+    return path
+
+def test_result_is_only_returned_for_unchanged_files(tmp_path):
+    path = write_pattern(tmp_path / 'patterns', 'summarize')
+    with ScanManifest(tmp_path / 'manifest.sqlite3', parser_key='a') as manifest:
+        manifest.put(str(path), os.stat(path), {'filename': 'summarize'})
+    with ScanManifest(tmp_path / 'manifest.sqlite3', parser_key='a') as manifest:
+        assert manifest.get(str(path), os.stat(path)) == {'filename': 'summarize'}
+        path.write_text(PATTERN.format(name='a longer text'), encoding='utf-8')
+        assert manifest.get(str(path), os.stat(path)) is None
+
+def test_changed_parser_settings_clear_the_manifest(tmp_path):
+    path = write_pattern(tmp_path / 'patterns', 'summarize')
+    with ScanManifest(tmp_path / 'manifest.sqlite3', parser_key='a') as manifest:
+        manifest.put(str(path), os.stat(path), {'filename': 'summarize'})
+    with ScanManifest(tmp_path / 'manifest.sqlite3', parser_key='b') as manifest:
+        assert manifest.get(str(path), os.stat(path)) is None
+
+def test_prune_keeps_entries_outside_the_scanned_folder(tmp_path):
+    kept = write_pattern(tmp_path / 'patterns', 'summarize')
+    removed = write_pattern(tmp_path / 'patterns', 'analyze')
+    outside = write_pattern(tmp_path / 'other', 'explain')
+    with ScanManifest(tmp_path / 'manifest.sqlite3') as manifest:
+        for path in [kept, removed, outside]:
+            manifest.put(str(path), os.stat(path), {'filename': path.parent.name})
+        manifest.prune([str(kept)], root_dir=str(tmp_path / 'patterns'))
+        assert manifest.get(str(kept), os.stat(kept)) is not None
+        assert manifest.get(str(removed), os.stat(removed)) is None
+        assert manifest.get(str(outside), os.stat(outside)) is not None
+
+def test_unchanged_files_are_not_parsed_again(tmp_path, monkeypatch):
+    root = tmp_path / 'patterns'
+    write_pattern(root, 'summarize')
+    changed = write_pattern(root, 'analyze')
+    manifest_path = tmp_path / 'manifest.sqlite3'
+
+    parsed = []
+    parse_batch = file_processor.process_markdown_file_batch
+    def record(jobs, *args, **kwargs):
+        parsed.append(sorted(job[0].parent.name for job in jobs))
+        return parse_batch(jobs, *args, **kwargs)
+    monkeypatch.setattr(file_processor, 'process_markdown_file_batch', record)
+
+    first = file_processor.process_markdown_files(root, manifest_path=manifest_path, workers=None)
+    changed.write_text(PATTERN.format(name='a longer text'), encoding='utf-8')
+    second = file_processor.process_markdown_files(root, manifest_path=manifest_path, workers=None)
+
+    assert parsed == [['analyze', 'summarize'], ['analyze']]
+    first = {file['filename']: file for file in first}
+    second = {file['filename']: file for file in second}
+    assert sorted(second) == ['analyze', 'summarize']
+    assert second['summarize']['purpose'] == first['summarize']['purpose']
+    assert 'a longer text' in second['analyze']['content']
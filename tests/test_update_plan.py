@@ -0,0 +1,168 @@
+"""Tests for building and applying database update plans."""
+from datetime import datetime
+import uuid
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, SparseVectorParams, VectorParams
+
+from src.fabrics_processor.config import config
+from src.fabrics_processor.embedding import get_sparse_vector_name
+from src.fabrics_processor.exceptions import DatabaseError
+import src.fabrics_processor.update_plan as update_plan
+
+VECTOR_SIZE = config.embedding.vector_size
+
+def make_file(filename, purpose='Summarize a text', content='# IDENTITY\nSummarize a text'):
+    return {
+        'filename': filename, 'content': content, 'purpose': purpose,
+        'content_hash': f"content {content}", 'purpose_hash': f"purpose {purpose}",
+        'last_modified': datetime(2024, 1, 1), 'filesize': len(content), 'trigger': ';;fab',
+    }
+
+class FakeSparseEmbedding:
+    """Stands in for the BM25 model, counts how often it is used."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts, batch_size=None):
+        self.calls += 1
+        for _ in texts:
+            yield type('Embedding', (), {'indices': np.array([1, 2]), 'values': np.array([0.5, 0.5])})()
+
+@pytest.fixture
+def collection(monkeypatch):
+    """An in-memory collection with a dense and a sparse vector. Embeddings are constant."""
+    monkeypatch.setattr(update_plan, 'embed_texts', lambda texts, model=None: [[1.0] * VECTOR_SIZE for _ in texts])
+    def load_model():
+        raise AssertionError("the sparse model was loaded again")
+    monkeypatch.setattr(update_plan, 'create_sparse_embedding_model', load_model)
+    client = QdrantClient(":memory:")
+    collection_name = f"test_{uuid.uuid4().hex[:8]}"
+    client.create_collection(
+        collection_name,
+        vectors_config={'fast-bge-small-en': VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)},
+        sparse_vectors_config={get_sparse_vector_name(): SparseVectorParams()}
+    )
+    yield client, collection_name
+    client.close()
+
+def test_apply_uses_the_loaded_sparse_model(collection):
+    client, collection_name = collection
+    sparse_model = FakeSparseEmbedding()
+    update_plan.apply_update_plan(client, update_plan.UpdatePlan(collection_name, adds=[make_file('summarize')]),
+                                  sparse_model=sparse_model)
+    point_id = client.scroll(collection_name)[0][0].id
+    modified = make_file('summarize', content='# IDENTITY\nSummarize a long text')
+    update_plan.apply_update_plan(client, update_plan.UpdatePlan(collection_name, payload_updates=[(point_id, modified)]),
+                                  sparse_model=sparse_model)
+    assert sparse_model.calls == 2
+    assert client.retrieve(collection_name, [point_id])[0].payload['content'] == modified['content']
+
+class FailingClient:
+    """Passes calls to an in-memory client, but can't write the point of one file."""
+
+    def __init__(self, client, failing_filename):
+        self._client = client
+        self.failing_filename = failing_filename
+
+    def upsert(self, collection_name, points):
+        if any(point.payload['filename'] == self.failing_filename for point in points):
+            raise ConnectionError("connection reset")
+        return self._client.upsert(collection_name=collection_name, points=points)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+def test_caches_are_notified_of_points_written_before_a_failure(collection, monkeypatch, caplog):
+    client, collection_name = collection
+    monkeypatch.setattr(config.database, 'upsert_batch_size', 1)
+    caplog.set_level('INFO', logger='fabric_to_espanso')
+    notified = []
+    monkeypatch.setattr(update_plan, 'notify_collection_changed', notified.append)
+    plan = update_plan.UpdatePlan(collection_name, adds=[make_file('summarize'), make_file('broken')])
+    with pytest.raises(DatabaseError):
+        update_plan.apply_update_plan(FailingClient(client, 'broken'), plan, sparse_model=FakeSparseEmbedding())
+    assert client.count(collection_name).count == 1
+    assert notified == [collection_name]
+    # Nothing is reported as added before all writes are confirmed
+    assert "Added new file to database" not in caplog.text
+
+def test_added_files_are_logged_after_the_write(collection, monkeypatch, caplog):
+    client, collection_name = collection
+    notified = []
+    monkeypatch.setattr(update_plan, 'notify_collection_changed', notified.append)
+    caplog.set_level('INFO', logger='fabric_to_espanso')
+    plan = update_plan.UpdatePlan(collection_name, adds=[make_file('summarize')])
+    update_plan.apply_update_plan(client, plan, sparse_model=FakeSparseEmbedding())
+    assert "Added new file to database: summarize" in caplog.text
+    assert notified == [collection_name]
+
+def test_nothing_written_means_no_notification(collection, monkeypatch):
+    client, collection_name = collection
+    notified = []
+    monkeypatch.setattr(update_plan, 'notify_collection_changed', notified.append)
+    def fail(texts, model=None):
+        raise RuntimeError("model not available")
+    monkeypatch.setattr(update_plan, 'embed_texts', fail)
+    with pytest.raises(RuntimeError):
+        update_plan.apply_update_plan(client, update_plan.UpdatePlan(collection_name, adds=[make_file('summarize')]))
+    assert notified == []
+
+def test_plan_classifies_new_modified_and_deleted_files():
+    stored = {
+        'summarize': {'id': 'a', 'payload': make_file('summarize')},
+        'analyze': {'id': 'b', 'payload': make_file('analyze', purpose='Analyze a text')},
+        # Stored before the purpose hash was added, compared by the purpose itself
+        'explain': {'id': 'c', 'payload': {'filename': 'explain', 'purpose': 'Explain code'}},
+        'rate': {'id': 'd', 'payload': {'filename': 'rate', 'purpose': 'Rate content'}},
+    }
+    modified = [
+        make_file('summarize', content='# IDENTITY\nSummarize a text\n# STEPS\n- Read'),
+        make_file('analyze', purpose='Analyze a paper'),
+        make_file('explain', purpose='Explain code'),
+        make_file('rate', purpose='Rate a story'),
+        make_file('missing'),
+    ]
+    plan = update_plan.build_update_plan('patterns', [make_file('extract')], modified, ['old'], stored)
+    assert [file['filename'] for file in plan.adds] == ['extract']
+    assert [(point_id, file['filename']) for point_id, file in plan.updates] == [('b', 'analyze'), ('d', 'rate')]
+    assert [(point_id, file['filename']) for point_id, file in plan.payload_updates] == [('a', 'summarize'), ('c', 'explain')]
+    assert plan.deletes == ['old']
+    # Only new files and changed purposes need the model
+    assert plan.estimated_embeddings == 3
+    assert not plan.is_empty
+    assert update_plan.build_update_plan('patterns', [], [], [], {}).is_empty
+
+def test_apply_writes_every_kind_of_change(collection, monkeypatch):
+    client, collection_name = collection
+    sparse_model = FakeSparseEmbedding()
+    update_plan.apply_update_plan(client, update_plan.UpdatePlan(collection_name, adds=[
+        make_file('summarize'), make_file('analyze', purpose='Analyze a text'), make_file('old')
+    ]), sparse_model=sparse_model)
+    stored = update_plan.get_stored_files_by_name(client, collection_name, ['summarize', 'analyze'])
+
+    embedded = []
+    def embed(texts, model=None):
+        embedded.extend(texts)
+        return [[0.5] * VECTOR_SIZE for _ in texts]
+    monkeypatch.setattr(update_plan, 'embed_texts', embed)
+    plan = update_plan.build_update_plan(
+        collection_name,
+        [make_file('extract', purpose='Extract ideas')],
+        [make_file('summarize', content='# IDENTITY\nSummarize a long text'), make_file('analyze', purpose='Analyze a paper')],
+        ['old'],
+        stored
+    )
+    update_plan.apply_update_plan(client, plan, sparse_model=sparse_model)
+
+    # The payload-only update doesn't embed the purpose again
+    assert embedded == ['Extract ideas', 'Analyze a paper']
+    points = {point.payload['filename']: point for point in client.scroll(collection_name, with_vectors=True)[0]}
+    assert sorted(points) == ['analyze', 'extract', 'summarize']
+    assert points['summarize'].payload['content'] == '# IDENTITY\nSummarize a long text'
+    assert points['summarize'].id == stored['summarize']['id']
+    assert points['analyze'].payload['purpose'] == 'Analyze a paper'
+    assert points['analyze'].id == stored['analyze']['id']
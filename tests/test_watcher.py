@@ -0,0 +1,34 @@
+"""Tests for the folder watcher."""
+from pathlib import Path
+from types import SimpleNamespace
+import queue
+
+from src.fabrics_processor.watcher import _QueueEventHandler
+
+def test_watchdog_events_skip_ignored_paths(tmp_path):
+    events = queue.Queue()
+    handler = _QueueEventHandler(events, [tmp_path], ['.*'])
+    for path in [
+        tmp_path / '.obsidian' / 'workspace.json',
+        tmp_path / '.git' / 'objects' / 'ab',
+        tmp_path / '.Trash' / 'old.md',
+        tmp_path / 'extract_wisdom' / 'system.md',
+    ]:
+        handler.on_any_event(SimpleNamespace(event_type='modified', src_path=str(path)))
+    # A move out of an ignored folder reports only the destination
+    handler.on_any_event(SimpleNamespace(
+        event_type='moved', src_path=str(tmp_path / '.trash' / 'a.md'), dest_path=str(tmp_path / 'a' / 'system.md')
+    ))
+
+    queued = []
+    while not events.empty():
+        queued.append(events.get())
+    assert queued == [tmp_path / 'extract_wisdom' / 'system.md', tmp_path / 'a' / 'system.md']
+
+def test_watchdog_events_ignore_only_below_root(tmp_path):
+    # A hidden folder above the watched folder doesn't hide its files
+    root = tmp_path / '.config' / 'fabric' / 'patterns'
+    events = queue.Queue()
+    handler = _QueueEventHandler(events, [root], ['.*'])
+    handler.on_any_event(SimpleNamespace(event_type='created', src_path=str(root / 'summarize' / 'system.md')))
+    assert events.get_nowait() == Path(root / 'summarize' / 'system.md')